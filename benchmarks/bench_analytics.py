@@ -0,0 +1,61 @@
+"""
+Forecast over synthetic opportunities.
+
+Usage: python benchmarks/bench_analytics.py [count]
+"""
+import random
+import sys
+import time
+
+from prosperworks.analytics import OpportunityFrame
+
+PIPELINES = [
+    {'id': pipeline_id, 'stages': [
+        {'id': pipeline_id * 100 + rank, 'win_probability': rank * 20}
+        for rank in range(5)
+    ]}
+    for pipeline_id in range(1, 4)
+]
+
+
+def records(count):
+    random.seed(0)
+    for i in range(count):
+        pipeline_id = random.randint(1, 3)
+        yield {
+            'id': i,
+            'pipeline_id': pipeline_id,
+            'pipeline_stage_id': pipeline_id * 100 + random.randint(0, 4),
+            'monetary_value': random.randint(100, 100000),
+            'win_probability': random.choice((None, 10, 50, 90)),
+            'status': random.choice(('Open', 'Open', 'Won', 'Lost')),
+            'assignee_id': random.randint(1, 50),
+            'customer_source_id': random.randint(1, 10),
+            'close_date': '%d/%d/2017' % (
+                random.randint(1, 12), random.randint(1, 28)
+            ),
+            'date_stage_changed': random.randint(1400000000, 1500000000),
+        }
+
+
+def main(count=100000):
+    data = list(records(count))
+
+    start = time.time()
+    frame = OpportunityFrame.from_records(data, pipelines=PIPELINES)
+    loaded = time.time()
+    frame.forecast()
+    for by in ('pipeline', 'stage', 'assignee', 'source', 'close_quarter'):
+        frame.group_by(by)
+    for pipeline in PIPELINES:
+        frame.stage_conversion(pipeline['id'])
+    frame.stage_aging()
+    done = time.time()
+
+    print("%d opportunities" % count)
+    print("load:       %.3fs" % (loaded - start))
+    print("aggregates: %.3fs" % (done - loaded))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,82 @@
+"""
+Bandwidth versus CPU of compressing payloads: an update body (a wide company
+serialized in full) and a search page of 200 companies, or the recorded json
+payloads given as arguments (ex: responses saved with curl). For every
+encoding and level, the compressed size, the time to compress and decompress
+and the total time to send the payload over a few link speeds are shown.
+
+Usage: python benchmarks/bench_compression.py [payload.json ...]
+"""
+import json
+import sys
+import timeit
+import zlib
+
+from prosperworks import compression
+
+sys.path.insert(0, __file__.rsplit('/', 1)[0])
+from bench_serialize import record  # noqa: E402
+
+LEVELS = (1, 6, 9)
+LINKS = (('1 Mbit/s', 1e6 / 8), ('10 Mbit/s', 1e7 / 8),
+         ('100 Mbit/s', 1e8 / 8))
+
+DECODERS = {
+    compression.GZIP: lambda data: zlib.decompress(data, 16 + zlib.MAX_WBITS),
+    compression.DEFLATE: zlib.decompress,
+    compression.BROTLI: lambda data: compression.brotli.decompress(data),
+}
+
+
+def payloads(paths):
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                yield path, f.read()
+        return
+    yield 'update body', json.dumps(record(1)).encode('utf-8')
+    yield 'search page', json.dumps(
+        [record(i) for i in range(200)]
+    ).encode('utf-8')
+
+
+def best_time(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main(*paths):
+    for name, body in payloads(paths):
+        number = max(1, 2000000 // len(body))
+        print("%s: %d bytes" % (name, len(body)))
+        print("  %-13s %9s %9s %9s  %s" % (
+            'encoding', 'bytes', 'comp ms', 'decomp ms',
+            '  '.join('%10s' % link for link, _ in LINKS)
+        ))
+        print("  %-13s %9d %9s %9s  %s" % (
+            'identity', len(body), '-', '-', '  '.join(
+                '%8.1fms' % (len(body) / speed * 1000) for _, speed in LINKS
+            )
+        ))
+        for encoding in compression.available_encodings():
+            for level in LEVELS:
+                data = compression.compress(body, encoding, level)
+                compress_time = best_time(
+                    lambda: compression.compress(body, encoding, level),
+                    number,
+                )
+                decompress_time = best_time(
+                    lambda: DECODERS[encoding](data), number
+                )
+                print("  %-13s %9d %9.3f %9.3f  %s" % (
+                    '%s -%d' % (encoding, level), len(data),
+                    compress_time * 1000, decompress_time * 1000,
+                    '  '.join(
+                        '%8.1fms' % ((len(data) / speed + compress_time +
+                                      decompress_time) * 1000)
+                        for _, speed in LINKS
+                    )
+                ))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,41 @@
+"""
+Duplicate detection over synthetic companies, 1 in 10 duplicated with a
+variation of its name and website.
+
+Usage: python benchmarks/bench_dedupe.py [count]
+"""
+import random
+import sys
+import time
+
+from prosperworks.dedupe import DedupeIndex
+
+WORDS = [u'%s%s' % (a, b) for a in u'bcdfgklmnprstvz' for b in (
+    u'ara', u'elo', u'ixa', u'onu', u'umi', u'ate', u'oro', u'ila')]
+
+
+def records(count):
+    random.seed(0)
+    for i in range(count):
+        name = u' '.join(random.sample(WORDS, 3))
+        domain = name.replace(u' ', u'') + u'.com'
+        yield {'id': i, 'name': name, 'email_domain': domain,
+               'phone_numbers': [{'number': u'303%07d' % i}]}
+        if i % 10 == 0:
+            yield {'id': -i - 1, 'name': name.title() + u' Inc.',
+                   'websites': [{'url': u'http://www.' + domain}]}
+
+
+def main(count=100000):
+    start = time.time()
+    index = DedupeIndex().add_many(records(count))
+    indexed = time.time() - start
+    start = time.time()
+    clusters = sum(len(batch) for batch in index.clusters())
+    print("%d records: indexed in %.1fs, %d clusters in %.1fs" % (
+        len(index), indexed, clusters, time.time() - start
+    ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
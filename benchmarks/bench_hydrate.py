@@ -0,0 +1,97 @@
+"""
+Hydrating Company pages (as models and as flat export rows) with 4 threads
+versus a 4 process Hydrator, used by 4 threads and by a single one (which
+relies on the prefetched pages to keep the processes busy). Pages are served
+from memory so only decoding is measured. Besides wall time, the CPU time
+spent in this process is shown: it is bound to one core by the GIL, so it
+caps the throughput.
+
+Usage: python benchmarks/bench_hydrate.py [pages]
+"""
+import json
+import os
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+from prosperworks import api
+from prosperworks.export import flatten_record
+from prosperworks.hydrate import Hydrator
+from prosperworks.models import Company
+
+sys.path.insert(0, __file__.rsplit('/', 1)[0])
+from bench_serialize import record  # noqa: E402
+
+PAGE_SIZE = 200
+WORKERS = 4
+
+
+class FakeRequests(object):
+    def __init__(self, pages):
+        self.body = json.dumps([record(i) for i in range(PAGE_SIZE)])
+        self.pages = pages
+
+    def _page(self, body):
+        return self.body if body['page_number'] <= self.pages else '[]'
+
+    def post(self, endpoint, body=None):
+        return json.loads(self._page(body))
+
+    def post_raw(self, endpoint, body=None):
+        return self._page(body)
+
+
+def pull_models(start):
+    return sum(
+        len(Company.populate_list(list_data=records))
+        for _, records in Company.iter_pages(page_number=start)
+    )
+
+
+def pull_records(start):
+    return sum(
+        len([flatten_record(record) for record in records])
+        for _, records in Company.iter_pages(page_number=start)
+    )
+
+
+def run(pull, workers=WORKERS):
+    """Returns (records, wall seconds, cpu seconds of this process)."""
+    pool = ThreadPool(workers)
+    start, cpu = time.time(), sum(os.times()[:2])
+    try:
+        count = sum(pool.map(pull, [1] * workers))
+    finally:
+        pool.close()
+        pool.join()
+    return count, time.time() - start, sum(os.times()[:2]) - cpu
+
+
+def main(pages=25):
+    api.requests = FakeRequests(pages)
+    hydrator = Hydrator(WORKERS)
+    try:
+        for name, pull, hydrate in (
+            ('models', pull_models, hydrator.iter_models),
+            ('records', pull_records, hydrator.iter_records),
+        ):
+            def pull_hydrated(start):
+                return sum(
+                    len(rows)
+                    for _, rows in hydrate(Company, page_number=start)
+                )
+            count, wall, cpu = run(pull)
+            _, process_wall, process_cpu = run(pull_hydrated)
+            _, single_wall, single_cpu = run(pull_hydrated, workers=1)
+            print("%d %s: threads %.2fs (cpu %.2fs), processes %.2fs "
+                  "(cpu %.2fs), processes with a single caller %.2fs per "
+                  "pull (cpu %.2fs)" % (
+                      count, name, wall, cpu, process_wall, process_cpu,
+                      single_wall, single_cpu,
+                  ))
+    finally:
+        hydrator.close()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,73 @@
+"""
+Cold start of a fresh interpreter: importing the package, and the first
+reference data lookup with and without a warm start file (served from a
+local fake transport, so only the client side is measured).
+
+Usage: python benchmarks/bench_import.py [repeat]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT = """
+import time
+start = time.time()
+import prosperworks.api, prosperworks.models
+print(time.time() - start)
+"""
+
+FIRST_LOOKUP = """
+import time
+start = time.time()
+from prosperworks import api, models, warmstart
+
+class FakeRequests(object):
+    def get(self, endpoint, params=None):
+        import requests  # what the real transport pays for
+        return [{'id': 1, 'name': 'Customer'}]
+
+api.requests = FakeRequests()
+person = models.Person()
+person.populate(data={'id': 1, 'contact_type_id': 1})
+person.contact_type
+print(time.time() - start)
+"""
+
+
+def run(code, env=None):
+    output = subprocess.check_output(
+        [sys.executable, '-c', code], cwd=ROOT, env=env,
+    )
+    return float(output)
+
+
+def best(code, repeat, env=None):
+    return min(run(code, env) for _ in range(repeat))
+
+
+def main(repeat=10):
+    path = os.path.join(tempfile.mkdtemp(), 'reference.json')
+    with open(path, 'w') as f:
+        json.dump({'saved_at': 0, 'data': {
+            'contact_types': [{'id': 1, 'name': 'Customer'}],
+        }}, f)
+    warm = dict(os.environ, PROSPERWORKS_WARM_START=path)
+
+    print("import prosperworks.api, models: %.3fs" % best(IMPORT, repeat))
+    print("import requests: %.3fs" % best(
+        "import time; s = time.time(); import requests; "
+        "print(time.time() - s)", repeat
+    ))
+    print("import + first lookup, cold: %.3fs" % best(FIRST_LOOKUP, repeat))
+    print("import + first lookup, warm start: %.3fs" % best(
+        FIRST_LOOKUP, repeat, warm
+    ))
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
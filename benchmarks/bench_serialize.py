@@ -0,0 +1,78 @@
+"""
+Model.serialize on wide Company and Person objects, compared with the
+previous getattr/hasattr based implementation.
+
+Usage: python benchmarks/bench_serialize.py [count]
+"""
+import sys
+import timeit
+
+from prosperworks.models import Company, ObjectList, Person
+
+
+def legacy_serialize(obj, *fields):
+    if isinstance(obj, ObjectList):
+        return [legacy_serialize(item) for item in obj.objects]
+    if not hasattr(obj, '_lazy_props'):
+        return obj.serialize()
+    fields = fields or obj.get_fields()
+    return {
+        key: getattr(obj, key)
+        if not hasattr(getattr(obj, key), 'serialize')
+        else legacy_serialize(getattr(obj, key))
+        for key in fields
+        if key not in obj._lazy_props
+    }
+
+
+def record(i):
+    return {
+        'id': i,
+        'name': u'Record %d' % i,
+        'address': {'street': u'1 Main St', 'city': u'Denver',
+                    'state': u'CO', 'postal_code': u'80202',
+                    'country': u'US'},
+        'assignee_id': 1,
+        'company_id': 2,
+        'contact_type_id': 3,
+        'details': u'Some details',
+        'email_domain': u'example.com',
+        'emails': [{'email': u'a%d@example.com' % i, 'category': u'work'}],
+        'phone_numbers': [
+            {'number': u'555-000%d' % n, 'category': u'work'}
+            for n in range(3)
+        ],
+        'socials': [{'url': u'http://example.com/a', 'category': u'other'}],
+        'tags': [u'a', u'b', u'c'],
+        'title': u'CEO',
+        'websites': [{'url': u'http://example.com', 'category': u'work'}],
+        'date_created': 1480000000,
+        'date_modified': 1480000000,
+        'interaction_count': 12,
+        'custom_fields': [
+            {'custom_field_definition_id': n, 'value': n}
+            for n in range(30)
+        ],
+    }
+
+
+def main(count=2000):
+    for model in (Company, Person):
+        objects = [model().populate(data=record(i)) for i in range(count)]
+        assert legacy_serialize(objects[0]) == objects[0].serialize()
+
+        legacy = min(timeit.repeat(
+            lambda: [legacy_serialize(obj) for obj in objects],
+            number=1, repeat=5,
+        ))
+        planned = min(timeit.repeat(
+            lambda: [obj.serialize() for obj in objects],
+            number=1, repeat=5,
+        ))
+        print("%s x %d: legacy %.3fs, planned %.3fs (%.1fx)" % (
+            model.__name__, count, legacy, planned, legacy / planned
+        ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,74 @@
+"""
+Decoding a large search page with response.json() versus streaming it with
+iter_json_array, then building a model per record as the hydrator would.
+Each mode runs in its own process to report its peak memory, and the time
+until the first record is available is shown.
+
+Usage: python benchmarks/bench_stream.py [records]
+"""
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+from prosperworks.models import Company
+from prosperworks.stream import CHUNK_SIZE, iter_json_array
+
+sys.path.insert(0, __file__.rsplit('/', 1)[0])
+from bench_serialize import record  # noqa: E402
+
+
+def wide_record(i):
+    data = record(i)
+    data['custom_fields'] = [
+        {'custom_field_definition_id': field_id, 'value': u'value %d' % i}
+        for field_id in range(100)
+    ]
+    return data
+
+
+def chunks(body):
+    for i in range(0, len(body), CHUNK_SIZE):
+        yield body[i:i + CHUNK_SIZE]
+
+
+def decode_whole(body):
+    return iter(json.loads(b''.join(chunks(body))))
+
+
+def decode_stream(body):
+    return iter_json_array(chunks(body))
+
+
+def run(decode, body, results):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    records = decode(body)
+    count = 1
+    Company.from_simple_dict(next(records))
+    first = time.time() - start
+    for data in records:
+        Company.from_simple_dict(data)
+        count += 1
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    results.put((count, first, time.time() - start, peak / 1024.0))
+
+
+def main(count=20000):
+    body = json.dumps([wide_record(i) for i in range(count)]).encode('utf-8')
+    print("page of %d records, %.1f MB" % (count, len(body) / 1e6))
+    for name, decode in (('json', decode_whole), ('stream', decode_stream)):
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=run, args=(decode, body, results)
+        )
+        process.start()
+        records, first, total, peak = results.get()
+        process.join()
+        print("%s: %d records in %.2fs, first after %.3fs, peak memory "
+              "+%.0f MB" % (name, records, total, first, peak))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,298 @@
+"""
+Pipeline analytics over opportunities, backed by NumPy columns.
+
+Opportunities are loaded once from raw search pages into compact arrays
+joined with pipeline and stage reference data. Aggregations are then a single
+vectorized pass over those arrays instead of Python loops over models.
+
+Ex:
+>>> from prosperworks.analytics import OpportunityFrame
+>>> frame = OpportunityFrame.load()
+>>> frame.group_by('close_month')
+{201701: Aggregate(count=12, value=50000.0, weighted_value=21000.0), ...}
+>>> frame.stage_conversion(pipeline_id=1)
+"""
+import collections
+import time
+from datetime import datetime
+
+from . import exceptions
+from . import warmstart
+from .models import Opportunity, Pipeline
+from .utils import EPOCH, timestamp
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+Aggregate = collections.namedtuple(
+    'Aggregate', ('count', 'value', 'weighted_value')
+)
+StageAging = collections.namedtuple(
+    'StageAging', ('count', 'mean_days', 'median_days', 'max_days')
+)
+
+MISSING = -1
+SECONDS_PER_DAY = 60 * 60 * 24
+STATUSES = ('Open', 'Won', 'Lost', 'Abandoned')
+GROUP_COLUMNS = {
+    'pipeline': 'pipeline_id',
+    'stage': 'pipeline_stage_id',
+    'assignee': 'assignee_id',
+    'source': 'customer_source_id',
+    'status': 'status',
+    'close_month': 'close_month',
+    'close_quarter': 'close_quarter',
+    'close_year': 'close_year',
+}
+
+
+_close_dates = {}
+
+
+def _parse_close_date(value):
+    """
+    close_date comes back as "M/D/YYYY" (or epoch seconds), returns epoch
+    seconds. Dates repeat a lot so parsed strings are memoized.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    stamp = _close_dates.get(value)
+    if stamp is None:
+        stamp = _close_dates[value] = timestamp(
+            datetime.strptime(value, '%m/%d/%Y')
+        )
+    return stamp
+
+
+def reference_data():
+    """Pipelines (with their ordered stages), see warmstart.reference_data."""
+    return warmstart.reference_data(Pipeline._endpoint)
+
+
+class OpportunityFrame(object):
+    def __init__(self, columns, pipelines=()):
+        if np is None:
+            raise exceptions.ProsperWorksApplicationException(
+                u"numpy is required for analytics, "
+                u"install prosperworks[analytics]."
+            )
+        self.columns = columns
+        self.pipelines = {pipeline['id']: pipeline for pipeline in pipelines}
+        self.stages = {}
+        for pipeline in pipelines:
+            for rank, stage in enumerate(pipeline.get('stages') or ()):
+                self.stages[stage['id']] = dict(
+                    stage, pipeline_id=pipeline['id'], rank=rank
+                )
+        self._fill_win_probability()
+        self.columns['weighted_value'] = (
+            self.columns['monetary_value'] *
+            self.columns['win_probability'] / 100.0
+        )
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @classmethod
+    def from_records(cls, records, pipelines=None):
+        """Build a frame from raw opportunity dicts (ex: search pages)."""
+        if pipelines is None:
+            pipelines = reference_data()
+
+        ids, values, probabilities = [], [], []
+        pipeline_ids, stage_ids, assignee_ids, source_ids = [], [], [], []
+        statuses, close_dates, stage_changed = [], [], []
+        status_codes = {status: code for code, status in enumerate(STATUSES)}
+
+        for record in records:
+            ids.append(record['id'])
+            values.append(record.get('monetary_value') or 0)
+            probability = record.get('win_probability')
+            probabilities.append(
+                float('nan') if probability is None else probability
+            )
+            pipeline_ids.append(record.get('pipeline_id') or MISSING)
+            stage_ids.append(record.get('pipeline_stage_id') or MISSING)
+            assignee_ids.append(record.get('assignee_id') or MISSING)
+            source_ids.append(record.get('customer_source_id') or MISSING)
+            statuses.append(status_codes.get(record.get('status'), MISSING))
+            close_date = _parse_close_date(record.get('close_date'))
+            close_dates.append(MISSING if close_date is None else close_date)
+            changed = record.get('date_stage_changed')
+            if changed is None:
+                changed = record.get('date_created')
+            stage_changed.append(MISSING if changed is None else changed)
+
+        columns = {
+            'id': np.array(ids, dtype=np.int64),
+            'monetary_value': np.array(values, dtype=np.float64),
+            'win_probability': np.array(probabilities, dtype=np.float64),
+            'pipeline_id': np.array(pipeline_ids, dtype=np.int64),
+            'pipeline_stage_id': np.array(stage_ids, dtype=np.int64),
+            'assignee_id': np.array(assignee_ids, dtype=np.int64),
+            'customer_source_id': np.array(source_ids, dtype=np.int64),
+            'status': np.array(statuses, dtype=np.int8),
+            'close_date': np.array(close_dates, dtype=np.int64),
+            'date_stage_changed': np.array(stage_changed, dtype=np.int64),
+        }
+        columns.update(cls._close_buckets(columns['close_date']))
+        return cls(columns, pipelines)
+
+    @classmethod
+    def load(cls, pipelines=None, **query_fields):
+        """Load every opportunity matching the search query."""
+        records = []
+        for page_number, page in Opportunity.iter_pages(**query_fields):
+            records.extend(page)
+        return cls.from_records(records, pipelines=pipelines)
+
+    @staticmethod
+    def _close_buckets(close_dates):
+        missing = close_dates == MISSING
+        days = np.where(missing, 0, close_dates) // SECONDS_PER_DAY
+        dates = np.datetime64(EPOCH.date()) + days.astype('timedelta64[D]')
+        years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+        months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        return {
+            'close_year': np.where(missing, MISSING, years),
+            'close_month': np.where(missing, MISSING, years * 100 + months),
+            'close_quarter': np.where(
+                missing, MISSING, years * 10 + (months - 1) // 3 + 1
+            ),
+        }
+
+    def _fill_win_probability(self):
+        """Opportunities without a win probability use their stage's one."""
+        probabilities = self.columns['win_probability']
+        unknown = np.isnan(probabilities)
+        if not unknown.any():
+            return
+        stage_ids = self.columns['pipeline_stage_id']
+        for stage_id in np.unique(stage_ids[unknown]):
+            stage = self.stages.get(int(stage_id), {})
+            probabilities[unknown & (stage_ids == stage_id)] = (
+                stage.get('win_probability') or 0
+            )
+
+    def mask(self, status=None, pipeline_id=None):
+        selected = np.ones(len(self), dtype=bool)
+        if status is not None:
+            selected &= self.columns['status'] == STATUSES.index(status)
+        if pipeline_id is not None:
+            selected &= self.columns['pipeline_id'] == pipeline_id
+        return selected
+
+    def _label(self, by, key):
+        if by == 'status':
+            return STATUSES[key] if key != MISSING else None
+        return None if key == MISSING else key
+
+    def group_by(self, by, status='Open', pipeline_id=None):
+        """
+        Count, value and weighted value of opportunities grouped by one of
+        pipeline, stage, assignee, source, status, close_month (YYYYMM),
+        close_quarter (YYYYQ) or close_year. Missing keys are grouped under
+        None.
+        """
+        if by not in GROUP_COLUMNS:
+            raise exceptions.ProsperWorksApplicationException(
+                u"%s is not a valid group. Valid groups: %s" % (
+                    by, u', '.join(sorted(GROUP_COLUMNS))
+                )
+            )
+        selected = self.mask(status=status, pipeline_id=pipeline_id)
+        keys = self.columns[GROUP_COLUMNS[by]][selected]
+        if not len(keys):
+            return {}
+
+        labels, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse)
+        values = np.bincount(
+            inverse, weights=self.columns['monetary_value'][selected]
+        )
+        weighted = np.bincount(
+            inverse, weights=self.columns['weighted_value'][selected]
+        )
+        return {
+            self._label(by, int(label)): Aggregate(
+                int(counts[i]), float(values[i]), float(weighted[i])
+            )
+            for i, label in enumerate(labels)
+        }
+
+    def pipeline_value(self, status='Open', pipeline_id=None):
+        selected = self.mask(status=status, pipeline_id=pipeline_id)
+        return Aggregate(
+            int(selected.sum()),
+            float(self.columns['monetary_value'][selected].sum()),
+            float(self.columns['weighted_value'][selected].sum()),
+        )
+
+    def forecast(self, by='close_month', pipeline_id=None):
+        """Weighted value of open opportunities, by close date bucket."""
+        return {
+            key: aggregate.weighted_value
+            for key, aggregate in self.group_by(
+                by, status='Open', pipeline_id=pipeline_id
+            ).items()
+        }
+
+    def stage_conversion(self, pipeline_id):
+        """
+        Share of opportunities that reached each stage of the pipeline and
+        went on to the next one. Won opportunities count as having passed
+        every stage. Returns [(stage_id, reached, rate to next stage)].
+        """
+        stages = self.pipelines[pipeline_id].get('stages') or ()
+        if not stages:
+            return []
+        selected = self.mask(pipeline_id=pipeline_id)
+        stage_ids = self.columns['pipeline_stage_id'][selected]
+        won = self.columns['status'][selected] == STATUSES.index('Won')
+
+        rank_of = np.full(len(stage_ids), MISSING, dtype=np.int64)
+        for rank, stage in enumerate(stages):
+            rank_of[stage_ids == stage['id']] = rank
+        rank_of[won] = len(stages)
+        rank_of = rank_of[rank_of != MISSING]
+
+        at_rank = np.bincount(rank_of, minlength=len(stages) + 1)
+        reached = np.cumsum(at_rank[::-1])[::-1]
+        results = []
+        for rank, stage in enumerate(stages):
+            rate = (
+                float(reached[rank + 1]) / reached[rank]
+                if reached[rank] else 0.0
+            )
+            results.append((stage['id'], int(reached[rank]), rate))
+        return results
+
+    def stage_aging(self, now=None, pipeline_id=None):
+        """Days open opportunities have spent in their current stage."""
+        now = time.time() if now is None else now
+        selected = self.mask(status='Open', pipeline_id=pipeline_id)
+        selected &= self.columns['date_stage_changed'] != MISSING
+        stage_ids = self.columns['pipeline_stage_id'][selected]
+        days = (now - self.columns['date_stage_changed'][selected]) / float(
+            SECONDS_PER_DAY
+        )
+        results = {}
+        if not len(days):
+            return results
+
+        order = np.argsort(stage_ids, kind='mergesort')
+        stage_ids, days = stage_ids[order], days[order]
+        labels, starts = np.unique(stage_ids, return_index=True)
+        for label, group in zip(labels, np.split(days, starts[1:])):
+            results[self._label('stage', int(label))] = StageAging(
+                len(group), float(group.mean()), float(np.median(group)),
+                float(group.max()),
+            )
+        return results
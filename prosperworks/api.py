@@ -1,6 +1,13 @@
-from .cache import Cache
-from .constants import API_VERSIONS, CACHE_LIFE
+from .breaker import CircuitBreaker
+from .cache import Cache, LookupCache
+from .compression import Compression
+from .concurrency import AdaptiveConcurrency
+from .constants import API_VERSIONS, CACHE_LIFE, REQUEST_TIMEOUT
+from .metrics import Metrics
+from .ratelimit import RateLimiter
 from .request import Request
+from .scheduler import Scheduler
+from . import warmstart
 
 
 _key = None
@@ -8,14 +15,64 @@ _email = None
 _api_version = API_VERSIONS[0]
 _cache_life = CACHE_LIFE
 cache = Cache(max_life=_cache_life)
-requests = Request(_key, _email, _api_version)
+# reference data saved with prosperworks.warmstart, if PROSPERWORKS_WARM_START
+# is set
+warmstart.load_from_env(cache)
+email_cache = LookupCache(max_life=_cache_life)
+rate_limiter = RateLimiter()
+scheduler = Scheduler(rate_limiter)
+metrics = Metrics()
+concurrency = AdaptiveConcurrency(metrics=metrics)
+breaker = CircuitBreaker(metrics=metrics)
+requests = Request(_key, _email, _api_version, rate_limiter=rate_limiter,
+                   metrics=metrics, scheduler=scheduler,
+                   concurrency=concurrency, timeout=REQUEST_TIMEOUT,
+                   breaker=breaker)
+snapshot = None  # optional prosperworks.snapshot.Snapshot
+# When True, Model(id) (and so lazy properties like opportunity.company) only
+# sends its request when a field that isn't loaded is accessed.
+deferred = False
 
 
-def configure(key, email, api_version=API_VERSIONS[0], cache_life=CACHE_LIFE):
-    global _key, _email, _api_version, requests, _cache_life, cache
+def configure(key, email, api_version=API_VERSIONS[0], cache_life=CACHE_LIFE,
+              coalesce=False, micro_cache_window=0, shares=None,
+              adaptive=True, timeout=REQUEST_TIMEOUT, breaker_options=None,
+              serve_stale=False, compression_options=False):
+    """
+    coalesce and micro_cache_window let identical GETs share one request,
+    see prosperworks.request.Request.
+    shares: quota reserved per priority class, see prosperworks.scheduler.
+    adaptive: adapt the requests in flight per endpoint to latency and
+    errors, see prosperworks.concurrency.
+    timeout: seconds before giving up on a response.
+    breaker_options: CircuitBreaker arguments (ex: failure_threshold), or
+    False to disable it. With serve_stale, GETs are answered with their last
+    response while the circuit of their endpoint is open.
+    compression_options: Compression arguments (ex: threshold), or None for
+    the defaults, to compress large request bodies and ask for compressed
+    responses. Disabled (False) by default.
+    """
+    global _key, _email, _api_version, requests, _cache_life, cache, \
+        email_cache, rate_limiter, scheduler, concurrency, breaker
     _key = key
     _email = email
     _api_version = api_version
     _cache_life = cache_life
     cache = Cache(max_life=_cache_life)
-    requests = Request(_key, _email, _api_version)
+    warmstart.apply(cache)
+    email_cache = LookupCache(max_life=_cache_life)
+    rate_limiter = RateLimiter()
+    scheduler = Scheduler(rate_limiter, shares=shares)
+    concurrency = AdaptiveConcurrency(metrics=metrics) if adaptive else None
+    breaker = None
+    if breaker_options is not False:
+        breaker = CircuitBreaker(metrics=metrics, **(breaker_options or {}))
+    compression = None
+    if compression_options is not False:
+        compression = Compression(**(compression_options or {}))
+    requests = Request(_key, _email, _api_version, rate_limiter=rate_limiter,
+                       metrics=metrics, coalesce=coalesce,
+                       micro_cache_window=micro_cache_window,
+                       scheduler=scheduler, concurrency=concurrency,
+                       timeout=timeout, breaker=breaker,
+                       serve_stale=serve_stale, compression=compression)
@@ -0,0 +1,123 @@
+"""
+Per endpoint circuit breaker, failing fast while the api is degraded.
+
+After failure_threshold consecutive failures (5xx and 429 errors, timeouts,
+connection errors, or responses slower than latency_threshold if set) the
+circuit of the endpoint opens: requests raise ProsperWorksCircuitOpen right
+away instead of tying up a thread. After reset_timeout seconds the circuit is
+half open and lets trial requests through: a success closes it, a failure
+opens it again.
+"""
+import threading
+import time
+
+from . import exceptions
+from .concurrency import endpoint_key
+from .constants import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_GAUGES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def is_failure(error):
+    """Errors telling the api is degraded, as opposed to a bad request."""
+    if isinstance(error, exceptions.ProsperWorksServerException):
+        # 5xx (ex: 502, 503 and 504 of a gateway) and rate limiting
+        return error.error_code >= 500 or error.error_code == 429
+    if isinstance(error, exceptions.BaseProsperWorksException):
+        return False
+    # timeouts, connection errors...
+    return error is not None
+
+
+class _Circuit(object):
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.trials = 0
+
+
+class CircuitBreaker(object):
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT, latency_threshold=None,
+                 half_open_trials=1, metrics=None):
+        """
+        latency_threshold: seconds above which a response counts as a
+        failure (None to only count errors).
+        half_open_trials: requests let through at once when half open.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_threshold = latency_threshold
+        self.half_open_trials = half_open_trials
+        self.metrics = metrics
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _set_state(self, key, circuit, state):
+        circuit.state = state
+        if self.metrics is not None:
+            self.metrics.gauge('breaker.' + key, STATE_GAUGES[state])
+            if state == OPEN:
+                self.metrics.incr('breaker.opened')
+
+    def state(self, endpoint):
+        with self._lock:
+            circuit = self._circuits.get(endpoint_key(endpoint))
+            return circuit.state if circuit is not None else CLOSED
+
+    def before(self, endpoint):
+        """
+        Check a request to endpoint may be sent, raises
+        ProsperWorksCircuitOpen if not. Returns the key to pass to record.
+        """
+        key = endpoint_key(endpoint)
+        with self._lock:
+            circuit = self._circuits.setdefault(key, _Circuit())
+            if circuit.state == CLOSED:
+                return key
+            retry_after = circuit.opened_at + self.reset_timeout - time.time()
+            if circuit.state == OPEN and retry_after <= 0:
+                self._set_state(key, circuit, HALF_OPEN)
+                circuit.trials = 0
+            if circuit.state == HALF_OPEN and \
+                    circuit.trials < self.half_open_trials:
+                circuit.trials += 1
+                return key
+        if self.metrics is not None:
+            self.metrics.incr('breaker.rejected')
+        raise exceptions.ProsperWorksCircuitOpen(key, max(retry_after, 0))
+
+    def release(self, key):
+        """
+        Give back a request let through by before which got no response
+        (ex: cancelled while waiting for quota), recording no outcome.
+        """
+        with self._lock:
+            circuit = self._circuits[key]
+            if circuit.state == HALF_OPEN:
+                circuit.trials -= 1
+
+    def record(self, key, latency, error=None):
+        """Record the outcome of a request let through by before."""
+        failed = is_failure(error) or (
+            error is None and self.latency_threshold is not None and
+            latency > self.latency_threshold
+        )
+        with self._lock:
+            circuit = self._circuits[key]
+            if circuit.state == HALF_OPEN:
+                circuit.trials -= 1
+            if not failed:
+                circuit.failures = 0
+                if circuit.state != CLOSED:
+                    self._set_state(key, circuit, CLOSED)
+                return
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN or \
+                    circuit.failures >= self.failure_threshold:
+                circuit.opened_at = time.time()
+                self._set_state(key, circuit, OPEN)
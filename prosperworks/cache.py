@@ -1,6 +1,8 @@
+import collections
+import threading
 import time
 
-from .constants import CACHE_LIFE
+from .constants import CACHE_LIFE, NEGATIVE_CACHE_LIFE, STALE_CACHE_SIZE
 
 
 class Cache(object):
@@ -26,3 +28,129 @@ class Cache(object):
             value = func()
             self.set(key, value)
         return value
+
+
+NOT_FOUND = object()
+
+
+class LookupCache(object):
+    """
+    Cache of lookups (ex: person by email) remembering misses as well, with
+    a separate life for found and not found keys, and hit rate counters.
+    Safe to share between threads.
+    """
+    def __init__(self, max_life=CACHE_LIFE, negative_life=NEGATIVE_CACHE_LIFE):
+        self.max_life = max_life
+        self.negative_life = negative_life
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value, NOT_FOUND for a cached miss or default if
+        the key isn't cached.
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                value, expires = entry
+                if time.time() < expires:
+                    if value is NOT_FOUND:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return value
+                del self._cache[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._cache[key] = (value, time.time() + self.max_life)
+
+    def set_not_found(self, key):
+        with self._lock:
+            self._cache[key] = (NOT_FOUND, time.time() + self.negative_life)
+
+    def delete(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def delete_where(self, predicate):
+        """
+        Drop the entries whose value matches predicate (called with the
+        value or NOT_FOUND), returns how many were dropped.
+        """
+        with self._lock:
+            keys = [
+                key for key, (value, _) in self._cache.items()
+                if predicate(value)
+            ]
+            for key in keys:
+                del self._cache[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    @property
+    def hit_rate(self):
+        return self.stats['hit_rate']
+
+    @property
+    def stats(self):
+        with self._lock:
+            hits = self.hits + self.negative_hits
+            lookups = hits + self.misses
+            return {
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': float(hits) / lookups if lookups else 0.0,
+                'size': len(self._cache),
+            }
+
+
+class LRUCache(object):
+    """
+    Keeps the max_size most recently used entries, without expiry (ex: the
+    last responses served while the api is down).
+    """
+    def __init__(self, max_size=STALE_CACHE_SIZE):
+        self.max_size = max_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def keys(self):
+        with self._lock:
+            return list(self._cache)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._cache.pop(key, NOT_FOUND)
+            if value is NOT_FOUND:
+                return default
+            self._cache[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = value
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,121 @@
+"""
+Compression of request bodies and negotiation of compressed responses.
+
+Bodies at least threshold bytes long (ex: the full serialize() output sent by
+CRUDModel.update) are compressed with the request encoding and sent with a
+Content-Encoding header. Responses are requested with the accepted encodings
+and decompressed by requests as they are read. brotli ("br") is only used
+when the brotli module is installed, and only accepted for responses when the
+urllib3 used by requests can decode it.
+"""
+import zlib
+
+from . import exceptions
+from .constants import COMPRESSION_LEVEL, COMPRESSION_THRESHOLD
+from .request import transport
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+GZIP = 'gzip'
+DEFLATE = 'deflate'
+BROTLI = 'br'
+
+
+def _gzip(data, level):
+    # wbits 16 + MAX_WBITS writes a gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _deflate(data, level):
+    return zlib.compress(data, level)
+
+
+def _brotli(data, level):
+    # brotli qualities go from 0 to 11, zlib levels from 0 to 9
+    return brotli.compress(data, quality=min(level, 11))
+
+
+def available_encodings():
+    """The supported encodings, preferred first."""
+    encodings = [GZIP, DEFLATE]
+    if brotli is not None:
+        encodings.insert(0, BROTLI)
+    return encodings
+
+
+_decodable = None
+
+
+def decodable_encodings():
+    """
+    The available encodings responses can be decoded from, preferred first.
+    Imports requests (see request.transport) on first use.
+    """
+    global _decodable
+    if _decodable is None:
+        # older urllib3 versions (ex: the one of requests 2.11) only decode
+        # gzip and deflate
+        response = transport().packages.urllib3.response
+        _decodable = [
+            encoding for encoding in available_encodings()
+            if encoding != BROTLI or hasattr(response, 'BrotliDecoder')
+        ]
+    return _decodable
+
+
+ENCODERS = {GZIP: _gzip, DEFLATE: _deflate, BROTLI: _brotli}
+
+
+def compress(data, encoding, level=COMPRESSION_LEVEL):
+    if encoding not in available_encodings():
+        raise exceptions.ProsperWorksApplicationException(
+            u"%s is not an available encoding. Available encodings: %s" % (
+                encoding, u', '.join(available_encodings())
+            )
+        )
+    return ENCODERS[encoding](data, level)
+
+
+class Compression(object):
+    def __init__(self, request_encoding=GZIP, accept=None,
+                 threshold=COMPRESSION_THRESHOLD, level=COMPRESSION_LEVEL):
+        """
+        request_encoding: encoding of request bodies (None to send them
+        as is).
+        accept: encodings accepted for responses (all the decodable ones by
+        default, an empty list asks for uncompressed responses).
+        threshold: bodies shorter than this many bytes are sent as is.
+        level: compression level, from 1 (fastest) to 9 (smallest).
+        """
+        if request_encoding is not None:
+            compress(b'', request_encoding)
+        self.request_encoding = request_encoding
+        self._accept = accept
+        self.threshold = threshold
+        self.level = level
+
+    @property
+    def accept(self):
+        """The encodings accepted for responses, preferred first."""
+        if self._accept is None:
+            return list(decodable_encodings())
+        return [
+            encoding for encoding in self._accept
+            if encoding in decodable_encodings()
+        ]
+
+    @property
+    def accept_encoding(self):
+        """The Accept-Encoding header value."""
+        return ', '.join(self.accept) or 'identity'
+
+    def encode(self, body):
+        """(body to send, Content-Encoding or None) of an encoded body."""
+        if self.request_encoding is None or len(body) < self.threshold:
+            return body, None
+        return compress(body, self.request_encoding, self.level), \
+            self.request_encoding
@@ -0,0 +1,125 @@
+"""
+Adaptive limit of the requests in flight per endpoint.
+
+Limits follow AIMD (additive increase, multiplicative decrease): every fast
+successful response grows the limit of its endpoint by about one request per
+round trip, while a ProsperWorksRateLimitExceeded, a
+ProsperWorksInternalServerError or a response slower than latency_target
+halves it. Requests sent before the last decrease don't decrease it again,
+so a burst of failures only counts once.
+
+The current limits are published as the concurrency.<endpoint> gauges of
+api.metrics.
+"""
+import threading
+import time
+
+from . import deadline
+from . import exceptions
+from .constants import (
+    ADAPTIVE_INITIAL_LIMIT, ADAPTIVE_LATENCY_TARGET, ADAPTIVE_MAX_LIMIT,
+)
+
+OVERLOAD_EXCEPTIONS = (
+    exceptions.ProsperWorksRateLimitExceeded,
+    exceptions.ProsperWorksInternalServerError,
+)
+
+
+def endpoint_key(endpoint):
+    """Group endpoints by resource, ex: companies/12 -> companies."""
+    return '/'.join(
+        part for part in endpoint.split('?')[0].split('/')
+        if part and not part.isdigit()
+    )
+
+
+class _EndpointLimit(object):
+    def __init__(self, limit):
+        self.limit = float(limit)
+        self.in_flight = 0
+        self.last_decrease = 0
+        self.condition = None
+
+
+class AdaptiveConcurrency(object):
+    def __init__(self, initial=ADAPTIVE_INITIAL_LIMIT, minimum=1,
+                 maximum=ADAPTIVE_MAX_LIMIT,
+                 latency_target=ADAPTIVE_LATENCY_TARGET, backoff=0.5,
+                 metrics=None):
+        """
+        latency_target: seconds above which a response counts as overload.
+        backoff: factor applied to the limit on overload.
+        """
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.metrics = metrics
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        state = self._limits.get(key)
+        if state is None:
+            state = self._limits[key] = _EndpointLimit(self.initial)
+            state.condition = threading.Condition(self._lock)
+            self._publish(key, state)
+        return state
+
+    def _publish(self, key, state):
+        if self.metrics is not None:
+            self.metrics.gauge('concurrency.' + key, int(state.limit))
+
+    def limit(self, endpoint):
+        """The current in-flight limit of an endpoint."""
+        with self._lock:
+            return int(self._get(endpoint_key(endpoint)).limit)
+
+    def acquire(self, endpoint):
+        """
+        Block until a request to endpoint may be sent (or raise once the
+        deadline of the thread passes), returns a token to pass to release.
+        """
+        context = deadline.current()
+        key = endpoint_key(endpoint)
+        with self._lock:
+            state = self._get(key)
+            while state.in_flight >= int(state.limit):
+                context.check()
+                # woken up by releases, or to check the deadline again
+                state.condition.wait(context.timeout(1.0))
+            state.in_flight += 1
+        return key, time.time()
+
+    def started(self, token):
+        """
+        The token of a request about to be sent, so its latency leaves out
+        the time spent waiting (ex: for a rate limiter slot) since acquire.
+        """
+        return token[0], time.time()
+
+    def release(self, token, error=None):
+        """Record the outcome of a request, adapting the limit."""
+        key, sent_at = token
+        now = time.time()
+        overloaded = isinstance(error, OVERLOAD_EXCEPTIONS) or \
+            now - sent_at > self.latency_target
+        with self._lock:
+            state = self._limits[key]
+            state.in_flight -= 1
+            if overloaded:
+                if sent_at > state.last_decrease:
+                    state.limit = max(
+                        self.minimum, state.limit * self.backoff
+                    )
+                    state.last_decrease = now
+                    if self.metrics is not None:
+                        self.metrics.incr('concurrency.decreases')
+            elif error is None:
+                state.limit = min(
+                    self.maximum, state.limit + 1.0 / state.limit
+                )
+            self._publish(key, state)
+            state.condition.notify_all()
@@ -18,3 +18,38 @@ BASE_URL = "https://api.prosperworks.com/developer_api/{version}/"
 
 
 CACHE_LIFE = 60 * 60  # 1 hour
+
+# Rate limiting, the API allows 600 requests every 10 minutes
+RATE_LIMIT_REQUESTS = 600
+RATE_LIMIT_PERIOD = 60 * 10  # 10 minutes
+
+# Searching
+MAX_PAGE_SIZE = 200
+
+# Concurrency, requests in flight for batched operations
+DEFAULT_WORKERS = 4
+SHARED_POOL_SIZE = 8
+NEGATIVE_CACHE_LIFE = 60 * 10  # 10 minutes
+
+# Share of the rate limit reserved for each priority class, see
+# prosperworks.scheduler
+SCHEDULER_SHARES = {'interactive': 0.1}
+
+# Adaptive limit of the requests in flight per endpoint, see
+# prosperworks.concurrency
+ADAPTIVE_INITIAL_LIMIT = SHARED_POOL_SIZE
+ADAPTIVE_MAX_LIMIT = 64
+ADAPTIVE_LATENCY_TARGET = 5.0  # seconds
+
+# Requests
+REQUEST_TIMEOUT = 60  # seconds
+# request bodies shorter than this are not compressed, see compression
+COMPRESSION_THRESHOLD = 1024  # bytes
+COMPRESSION_LEVEL = 6
+
+# Circuit breaker, see prosperworks.breaker
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30  # seconds
+STALE_CACHE_SIZE = 1000
+# GET responses kept by the micro cache, see Request
+MICRO_CACHE_SIZE = 1000
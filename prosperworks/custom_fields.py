@@ -0,0 +1,173 @@
+"""
+Registry of custom field definitions with typed decoding of values.
+
+Records returned by the api only carry custom_field_definition_id and a raw
+value (epoch seconds for dates, option ids for dropdowns...). The registry
+indexes the definitions by id and name once and decodes whole pages of raw
+records in a single pass, without building CustomField objects.
+
+Ex:
+>>> from prosperworks.custom_fields import get_registry
+>>> registry = get_registry()
+>>> registry.decode_record(raw_company)
+{u'Size': u'Large', u'Renewal Date': datetime(2017, 1, 1, 0, 0)}
+"""
+import collections
+from datetime import datetime
+
+from . import api
+from . import exceptions
+from . import warmstart
+from .models import CustomField
+
+Money = collections.namedtuple('Money', ('amount', 'currency'))
+
+
+def _decode_date(definition, value):
+    return datetime.utcfromtimestamp(value)
+
+
+def _decode_float(definition, value):
+    return float(value)
+
+
+def _decode_checkbox(definition, value):
+    return bool(value)
+
+
+def _decode_currency(definition, value):
+    return Money(float(value), definition.get('currency'))
+
+
+def _decode_dropdown(definition, value):
+    return definition['_options'].get(value, value)
+
+
+def _decode_multi_select(definition, value):
+    options = definition['_options']
+    return [options.get(option, option) for option in value]
+
+
+DECODERS = {
+    'Date': _decode_date,
+    'Float': _decode_float,
+    'Percentage': _decode_float,
+    'Checkbox': _decode_checkbox,
+    'Currency': _decode_currency,
+    'Dropdown': _decode_dropdown,
+    'MultiSelect': _decode_multi_select,
+}
+
+
+class CustomFieldRegistry(object):
+    def __init__(self, definitions):
+        self.definitions = list(definitions)
+        self.by_id = {}
+        self.by_name = {}
+        # id -> (name, decode function), the only lookup done per value
+        self._plan = {}
+
+        for definition in self.definitions:
+            definition = dict(definition)
+            definition['_options'] = {
+                option['id']: option['name']
+                for option in definition.get('options') or ()
+            }
+            self.by_id[definition['id']] = definition
+            self.by_name[definition['name']] = definition
+            self._plan[definition['id']] = (
+                definition['name'],
+                self._decoder(definition),
+            )
+
+    @staticmethod
+    def _decoder(definition):
+        decode = DECODERS.get(definition.get('data_type'))
+        if decode is None:
+            return lambda value: value
+
+        def decoder(value):
+            if value is None:
+                return None
+            return decode(definition, value)
+        return decoder
+
+    @classmethod
+    def load(cls):
+        definitions = warmstart.reference_data(CustomField._endpoint)
+        return cls(definitions)
+
+    @property
+    def names(self):
+        return [definition['name'] for definition in self.definitions]
+
+    def id_for(self, name):
+        try:
+            return self.by_name[name]['id']
+        except KeyError:
+            raise exceptions.ProsperWorksApplicationException(
+                u"%s is not a valid custom field." % name
+            )
+
+    def name_for(self, field_id):
+        try:
+            return self.by_id[field_id]['name']
+        except KeyError:
+            raise exceptions.ProsperWorksApplicationException(
+                u"%s is not a valid custom field id." % field_id
+            )
+
+    def decode(self, field_id, value):
+        try:
+            name, decoder = self._plan[field_id]
+        except KeyError:
+            raise exceptions.ProsperWorksApplicationException(
+                u"%s is not a valid custom field id." % field_id
+            )
+        return decoder(value)
+
+    def decode_record(self, record):
+        """
+        Decode the custom_fields of a raw record (or a model) into a dict
+        keyed by field name.
+        """
+        if isinstance(record, dict):
+            custom_fields = record.get('custom_fields')
+        else:
+            custom_fields = [
+                field.__dict__ for field in record.custom_fields
+            ]
+
+        plan = self._plan
+        values = {}
+        for field in custom_fields or ():
+            entry = plan.get(field['custom_field_definition_id'])
+            if entry is not None:
+                values[entry[0]] = entry[1](field.get('value'))
+        return values
+
+    def decode_records(self, records, columnar=False):
+        """
+        Decode a page of raw records. Returns a list of name keyed dicts, or
+        with columnar=True a dict of name -> list of values aligned with
+        records (None where a record has no value).
+        """
+        if not columnar:
+            return [self.decode_record(record) for record in records]
+
+        plan = self._plan
+        columns = {name: [None] * len(records) for name in self.names}
+        for index, record in enumerate(records):
+            for field in record.get('custom_fields') or ():
+                entry = plan.get(field['custom_field_definition_id'])
+                if entry is not None:
+                    columns[entry[0]][index] = entry[1](field.get('value'))
+        return columns
+
+
+def get_registry():
+    """The registry of the current account, cached in api.cache."""
+    return api.cache.get_or_set(
+        "custom_field_registry",
+        CustomFieldRegistry.load
+    )
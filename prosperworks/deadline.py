@@ -0,0 +1,136 @@
+"""
+Deadlines and cancellation of everything sent through api.requests.
+
+A deadline applies to the requests of the current thread, including the ones
+sent by model methods, lazy properties, paginated iterators and bulk helpers
+(whose pool threads inherit it, see scheduler.bind). Nested deadlines get
+what is left of the outer budget at most. Requests check the deadline before
+being sent, waiting for quota stops when it expires, and socket timeouts are
+capped to the remaining time, so nothing blocks past it. Once expired (or
+cancelled) requests raise ProsperWorksDeadlineExceeded (or
+ProsperWorksCancelled), and bulk helpers put what they had done in the
+exception's partial attribute.
+
+Ex:
+>>> from prosperworks import deadline
+>>> with deadline.deadline(30):
+...     companies = Company.search(name='Acme')
+...     people = Person.fetch_by_emails(emails)  # whatever is left of 30s
+>>> with deadline.deadline() as context:  # no time limit, cancellable
+...     threading.Timer(60, context.cancel).start()
+...     Model.load_many(opportunities)
+
+shutdown() cancels every operation in flight, ex: when a worker is asked to
+stop, without affecting the ones started afterwards.
+"""
+import contextlib
+import threading
+import time
+
+from . import exceptions
+
+
+class Context(object):
+    def __init__(self, timeout=None, parent=None):
+        """
+        timeout: seconds from now the operation may take (None for no
+        limit), capped by the parent's deadline.
+        """
+        self.parent = parent
+        self.expires_at = None if timeout is None else time.time() + timeout
+        if parent is not None and parent.expires_at is not None and (
+            self.expires_at is None or parent.expires_at < self.expires_at
+        ):
+            self.expires_at = parent.expires_at
+        self._cancelled = False
+
+    def cancel(self):
+        """Cancel the operations of this context and of nested ones."""
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        context = self
+        while context is not None:
+            if context._cancelled:
+                return True
+            context = context.parent
+        return False
+
+    def remaining(self):
+        """Seconds left before the deadline, None if there is none."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.time()
+
+    def check(self):
+        """Raise if the context is cancelled or its deadline has passed."""
+        if self.cancelled:
+            raise exceptions.ProsperWorksCancelled()
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise exceptions.ProsperWorksDeadlineExceeded()
+
+    def timeout(self, seconds):
+        """seconds (None meaning no limit) capped to the remaining time."""
+        remaining = self.remaining()
+        if remaining is None:
+            return seconds
+        remaining = max(remaining, 0)
+        return remaining if seconds is None else min(seconds, remaining)
+
+
+# every context descends from the root of its time, so shutdown reaches the
+# ones in flight. A cancelled root is replaced by a new one.
+_root = Context()
+_local = threading.local()
+
+
+def current():
+    """The context of the current thread."""
+    return getattr(_local, 'context', None) or _root
+
+
+@contextlib.contextmanager
+def deadline(seconds=None):
+    """
+    Run the block within seconds (None for no time limit but the outer
+    ones), yields the Context, which can be cancelled from other threads.
+    """
+    previous = getattr(_local, 'context', None)
+    context = _local.context = Context(seconds, parent=current())
+    try:
+        yield context
+    finally:
+        _local.context = previous
+
+
+def bind(func):
+    """
+    Wrap func so it runs within the context of the calling thread, for work
+    handed to pool threads.
+    """
+    context = current()
+
+    def bound(*args, **kwargs):
+        previous = getattr(_local, 'context', None)
+        _local.context = context
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.context = previous
+    return bound
+
+
+def check():
+    current().check()
+
+
+def shutdown():
+    """
+    Cancel every operation in flight: the ones within a deadline block or
+    handed to pool threads. Later operations run as usual.
+    """
+    global _root
+    root, _root = _root, Context()
+    root.cancel()
@@ -0,0 +1,297 @@
+"""
+Duplicate detection over companies and people.
+
+Records are added to a DedupeIndex in one pass (ex: straight from
+SearchableModel.iter_pages). The index keeps a compact fingerprint per
+record and blocking keys: normalized emails, phone digits, domains (of
+email_domain, websites and non free email addresses) and minhash bands of
+the name trigrams. Only records sharing a key are compared, and keys shared
+by more than max_block_size records (ex: a switchboard number) are ignored,
+so the work stays close to linear in the number of records.
+
+Ex:
+>>> from prosperworks.dedupe import index_model
+>>> from prosperworks.models import Company
+>>> index = index_model(Company)
+>>> for batch in index.clusters():
+...     for cluster in batch:
+...         print cluster.ids, cluster.score
+"""
+import collections
+import re
+import zlib
+
+FREE_EMAIL_DOMAINS = frozenset([
+    'aol.com', 'gmail.com', 'googlemail.com', 'hotmail.com', 'icloud.com',
+    'live.com', 'mail.com', 'me.com', 'msn.com', 'outlook.com', 'yahoo.com',
+    'ymail.com', 'protonmail.com', 'gmx.com',
+])
+NAME_SUFFIXES = frozenset([
+    'inc', 'incorporated', 'llc', 'ltd', 'limited', 'co', 'corp',
+    'corporation', 'company', 'gmbh', 'sa', 'sarl', 'bv', 'plc', 'the',
+])
+# weight of each kind of match, combined as a noisy-or
+WEIGHTS = {'email': 1.0, 'phone': 0.7, 'domain': 0.5, 'name': 0.8}
+# share of the score lost when both records have emails (or phones) and
+# none are the same, ex: two people named John Smith
+PENALTIES = {'email': 0.5, 'phone': 0.3}
+
+_non_word = re.compile(r'[^\w]+', re.UNICODE)
+_non_digit = re.compile(r'\D+')
+
+Fingerprint = collections.namedtuple(
+    'Fingerprint', ['name', 'emails', 'phones', 'domains', 'signature']
+)
+Cluster = collections.namedtuple('Cluster', ['ids', 'score', 'pairs'])
+
+
+def normalize_name(name):
+    """Lower case words without punctuation or company suffixes."""
+    words = _non_word.sub(u' ', (name or u'').lower()).split()
+    return u' '.join(word for word in words if word not in NAME_SUFFIXES)
+
+
+def normalize_domain(value):
+    """Domain of a url, an email address or a domain."""
+    value = (value or u'').strip().lower()
+    value = value.rsplit(u'@', 1)[-1]
+    value = value.split(u'://', 1)[-1].split(u'/', 1)[0].split(u':', 1)[0]
+    if value.startswith(u'www.'):
+        value = value[4:]
+    return value if u'.' in value else None
+
+
+def phone_digits(number):
+    """The last 10 digits of a phone number, None if it is too short."""
+    digits = _non_digit.sub(u'', number or u'')
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def name_signature(name, bins=8):
+    """
+    One permutation minhash of the name trigrams: each trigram is hashed
+    once and the smallest hash of every bin is kept (None for empty bins).
+    """
+    padded = u' %s ' % name
+    signature = [None] * bins
+    for i in range(len(padded) - 2):
+        value = zlib.crc32(padded[i:i + 3].encode('utf-8')) & 0xffffffff
+        index, value = value % bins, value // bins
+        if signature[index] is None or value < signature[index]:
+            signature[index] = value
+    return tuple(signature)
+
+
+def fingerprint(record):
+    """The fingerprint of a raw company/person/lead record or model."""
+    if hasattr(record, 'serialize'):
+        record = record.serialize()
+    emails = record.get('emails') or []
+    if isinstance(record.get('email'), dict):
+        emails = emails + [record['email']]
+    emails = frozenset(
+        entry['email'].strip().lower() for entry in emails
+        if entry and entry.get('email')
+    )
+    phones = frozenset(
+        digits for digits in (
+            phone_digits(entry.get('number'))
+            for entry in record.get('phone_numbers') or () if entry
+        ) if digits
+    )
+    domains = set(
+        normalize_domain(entry.get('url'))
+        for entry in record.get('websites') or () if entry
+    )
+    domains.add(normalize_domain(record.get('email_domain')))
+    domains.update(normalize_domain(email) for email in emails)
+    domains.discard(None)
+    domains -= FREE_EMAIL_DOMAINS
+    name = normalize_name(record.get('name'))
+    return Fingerprint(
+        name, emails, phones, frozenset(domains),
+        name_signature(name) if name else None,
+    )
+
+
+def name_similarity(a, b):
+    """Estimated trigram Jaccard similarity of two name signatures."""
+    if a is None or b is None:
+        return 0.0
+    bins = [(x, y) for x, y in zip(a, b) if x is not None or y is not None]
+    if not bins:
+        return 0.0
+    return sum(1 for x, y in bins if x == y) / float(len(bins))
+
+
+class _UnionFind(object):
+    def __init__(self):
+        self.parents = {}
+
+    def find(self, item):
+        parent = self.parents.setdefault(item, item)
+        if parent != item:
+            parent = self.parents[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        self.parents[self.find(a)] = self.find(b)
+
+
+class DedupeIndex(object):
+    def __init__(self, threshold=0.7, max_block_size=50, rows_per_band=2):
+        """
+        threshold: minimum score of a duplicate pair (0 to 1).
+        max_block_size: blocking keys shared by more records are ignored.
+        rows_per_band: name signature bins per minhash band, more means
+        names have to be closer to be compared.
+        """
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+        self.rows_per_band = rows_per_band
+        self.fingerprints = {}
+        self.blocks = collections.defaultdict(list)
+        self.oversized = set()
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def _keys(self, print_):
+        for email in print_.emails:
+            yield ('email', email)
+        for phone in print_.phones:
+            yield ('phone', phone)
+        for domain in print_.domains:
+            yield ('domain', domain)
+        signature = print_.signature
+        if signature is not None:
+            rows = self.rows_per_band
+            for band in range(0, len(signature), rows):
+                values = signature[band:band + rows]
+                if None not in values:
+                    yield ('name', band) + values
+
+    def add(self, record):
+        """Index a raw record (or model), which must have an id."""
+        if hasattr(record, 'serialize'):
+            record = record.serialize()
+        id = record['id']
+        print_ = fingerprint(record)
+        self.fingerprints[id] = print_
+        for key in self._keys(print_):
+            if key in self.oversized:
+                continue
+            block = self.blocks[key]
+            block.append(id)
+            if len(block) > self.max_block_size:
+                self.oversized.add(key)
+                del self.blocks[key]
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+        return self
+
+    def conflicts(self, a, b):
+        """The kinds of keys both records a and b (ids) have, all different."""
+        a, b = self.fingerprints[a], self.fingerprints[b]
+        return [
+            reason for reason, x, y in (
+                ('email', a.emails, b.emails), ('phone', a.phones, b.phones),
+            ) if x and y and not x & y
+        ]
+
+    def score(self, a, b):
+        """(score, reasons) of the records a and b (ids)."""
+        conflicts = self.conflicts(a, b)
+        a, b = self.fingerprints[a], self.fingerprints[b]
+        matches = {}
+        if a.emails & b.emails:
+            matches['email'] = 1.0
+        if a.phones & b.phones:
+            matches['phone'] = 1.0
+        if a.domains & b.domains:
+            matches['domain'] = 1.0
+        if a.name and a.name == b.name:
+            matches['name'] = 1.0
+        else:
+            similarity = name_similarity(a.signature, b.signature)
+            if similarity:
+                matches['name'] = similarity
+        miss = 1.0
+        for reason, value in matches.items():
+            miss *= 1 - WEIGHTS[reason] * value
+        score = 1 - miss
+        for reason in conflicts:
+            score *= 1 - PENALTIES[reason]
+        return score, sorted(matches)
+
+    def candidate_pairs(self):
+        """Distinct pairs of ids sharing a blocking key."""
+        seen = set()
+        for ids in self.blocks.values():
+            if len(ids) < 2:
+                continue
+            for i, a in enumerate(ids):
+                for b in ids[i + 1:]:
+                    pair = (a, b) if a < b else (b, a)
+                    if a != b and pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+    def pairs(self):
+        """Yield (id_a, id_b, score, reasons) of likely duplicates."""
+        for a, b in self.candidate_pairs():
+            score, reasons = self.score(a, b)
+            if score >= self.threshold:
+                yield a, b, score, reasons
+
+    def clusters(self, batch_size=1000):
+        """
+        Yield lists of at most batch_size Clusters of duplicates, linked by
+        pairs above the threshold, strongest first. Pairs linking clusters
+        with conflicting records (see conflicts) are left out, so near names
+        don't chain distinct records together. A cluster score is the
+        average score of its pairs.
+        """
+        groups = _UnionFind()
+        group_ids = {}
+        cluster_pairs = collections.defaultdict(list)
+        for pair in sorted(self.pairs(), key=lambda pair: -pair[2]):
+            a, b = groups.find(pair[0]), groups.find(pair[1])
+            if a != b:
+                ids_a, ids_b = group_ids.get(a, [a]), group_ids.get(b, [b])
+                if any(self.conflicts(x, y) for x in ids_a for y in ids_b):
+                    continue
+                groups.union(a, b)
+                group_ids.pop(a, None)
+                group_ids[b] = ids_a + ids_b
+            cluster_pairs[pair[0]].append(pair)
+        edges = collections.defaultdict(list)
+        for id, pairs in cluster_pairs.items():
+            edges[groups.find(id)].extend(pairs)
+
+        batch = []
+        for root, ids in group_ids.items():
+            pairs = edges[root]
+            batch.append(Cluster(
+                sorted(ids),
+                sum(pair[2] for pair in pairs) / len(pairs),
+                pairs,
+            ))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def index_model(model, index=None, **query_fields):
+    """
+    Build (or extend) a DedupeIndex with every record of a searchable model
+    matching query_fields, page by page without building models.
+    """
+    index = index if index is not None else DedupeIndex()
+    for _, records in model.iter_pages(**query_fields):
+        index.add_many(records)
+    return index
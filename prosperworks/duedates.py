@@ -0,0 +1,348 @@
+"""
+Local index of open tasks by due and reminder date.
+
+A DueDateIndex is filled once with the open tasks, then kept in sync with
+incremental searches (tasks modified since the last sync) and webhook
+notifications, so questions like "what is next for each assignee" or "what
+is overdue in each pipeline" are answered locally instead of with repeated
+Task.search windows. Tasks are kept in lists sorted by due date (overall and
+per assignee) and in a heap of reminder dates, which a ReminderDispatcher
+waits on without polling the api.
+
+Ex:
+>>> from prosperworks.duedates import DueDateIndex, ReminderDispatcher
+>>> from prosperworks.webhooks import WebhookReceiver
+>>> index = DueDateIndex()
+>>> index.sync()
+>>> receiver = WebhookReceiver(secret={'secret': 'shared-secret'},
+...                            listeners=[index.handle_event])
+>>> index.next_due(assignee_id=12, n=5)
+>>> dispatcher = ReminderDispatcher(index, send_reminder)
+"""
+import bisect
+import collections
+import heapq
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from . import api
+from . import exceptions
+from . import scheduler
+from .constants import DEFAULT_WORKERS, MAX_PAGE_SIZE
+from .models import Opportunity, Task
+from .pool import shared_pool
+
+OPEN = 'Open'
+
+TaskEntry = collections.namedtuple('TaskEntry', [
+    'id', 'name', 'assignee_id', 'due_date', 'reminder_date', 'status',
+    'priority', 'related_type', 'related_id', 'date_modified',
+])
+
+
+def task_entry(record):
+    """The TaskEntry of a raw task record or Task."""
+    if isinstance(record, Task):
+        record = record.serialize()
+    related = record.get('related_resource') or {}
+    return TaskEntry(
+        record['id'], record.get('name'), record.get('assignee_id'),
+        record.get('due_date'), record.get('reminder_date'),
+        record.get('status'), record.get('priority'), related.get('type'),
+        related.get('id'), record.get('date_modified'),
+    )
+
+
+def _remove(sorted_list, item):
+    i = bisect.bisect_left(sorted_list, item)
+    if i < len(sorted_list) and sorted_list[i] == item:
+        del sorted_list[i]
+
+
+class DueDateIndex(object):
+    def __init__(self, pool=None):
+        """
+        pool: where the tasks notified by webhooks are fetched (the shared
+        pool by default).
+        """
+        self.tasks = {}
+        # opportunity id -> pipeline id (None once deleted), for tasks
+        # related to opportunities
+        self.pipelines = {}
+        self.synced_at = None
+        self.pool = pool
+        # (task id, error) of the last failed fetches of notified tasks, the
+        # next sync picks them up
+        self.errors = collections.deque(maxlen=100)
+        # task id -> token of the last notification, see _refresh
+        self._notified = {}
+        # notified whenever tasks change, see ReminderDispatcher
+        self.changed = threading.Condition(threading.RLock())
+        self._due = []
+        self._assignee_due = collections.defaultdict(list)
+        self._reminders = []
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __contains__(self, id):
+        return id in self.tasks
+
+    def _unlink(self, entry):
+        if entry.due_date is not None:
+            item = (entry.due_date, entry.id)
+            _remove(self._due, item)
+            _remove(self._assignee_due[entry.assignee_id], item)
+        # reminders are dropped lazily, see _valid_reminder
+
+    def add(self, record):
+        """
+        Index (or update) a raw task record or Task. Tasks which are not
+        open are dropped. Returns whether the task is indexed.
+        """
+        entry = task_entry(record)
+        with self.changed:
+            old = self.tasks.pop(entry.id, None)
+            if old is not None:
+                self._unlink(old)
+            if entry.status != OPEN:
+                return False
+            self.tasks[entry.id] = entry
+            if entry.due_date is not None:
+                item = (entry.due_date, entry.id)
+                bisect.insort(self._due, item)
+                bisect.insort(self._assignee_due[entry.assignee_id], item)
+            if entry.reminder_date is not None and (
+                old is None or old.reminder_date != entry.reminder_date
+            ):
+                heapq.heappush(
+                    self._reminders, (entry.reminder_date, entry.id)
+                )
+                self.changed.notify_all()
+            return True
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+        return self
+
+    def discard(self, id):
+        with self.changed:
+            entry = self.tasks.pop(id, None)
+            if entry is not None:
+                self._unlink(entry)
+
+    def _entries(self, items):
+        return [self.tasks[id] for _, id in items]
+
+    def next_due(self, assignee_id=None, n=10, after=None):
+        """
+        The n next tasks by due date (of an assignee if given), only those
+        due at or after the after timestamp if given.
+        """
+        with self.changed:
+            items = self._due if assignee_id is None else \
+                self._assignee_due.get(assignee_id, [])
+            start = 0 if after is None else \
+                bisect.bisect_left(items, (after,))
+            return self._entries(items[start:start + n])
+
+    def next_due_by_assignee(self, n=5, after=None):
+        """Dict of assignee id: the n next tasks of the assignee."""
+        with self.changed:
+            return {
+                assignee_id: self.next_due(assignee_id, n, after)
+                for assignee_id, items in self._assignee_due.items() if items
+            }
+
+    def overdue(self, now=None, assignee_id=None):
+        """Tasks due before now (of an assignee if given), oldest first."""
+        now = time.time() if now is None else now
+        with self.changed:
+            items = self._due if assignee_id is None else \
+                self._assignee_due.get(assignee_id, [])
+            return self._entries(items[:bisect.bisect_left(items, (now,))])
+
+    def resolve_pipelines(self, opportunity_ids, workers=DEFAULT_WORKERS):
+        """
+        Fetch the pipeline of the opportunities not known yet, deleted ones
+        have no pipeline (None).
+        """
+        missing = list(set(opportunity_ids) - set(self.pipelines))
+        if not missing:
+            return self.pipelines
+
+        def fetch(id):
+            try:
+                return id, api.requests.get(
+                    "{}/{}".format(Opportunity._endpoint, id)
+                ).get('pipeline_id')
+            except exceptions.ProsperWorksNotFoundRequest:
+                return id, None
+
+        pool = ThreadPool(min(workers, len(missing)))
+        try:
+            self.pipelines.update(pool.map(scheduler.bind(fetch), missing))
+        finally:
+            pool.close()
+            pool.join()
+        return self.pipelines
+
+    def overdue_by_pipeline(self, now=None):
+        """
+        Dict of pipeline id: overdue tasks related to opportunities of the
+        pipeline. Other overdue tasks are left out.
+        """
+        tasks = [
+            entry for entry in self.overdue(now)
+            if entry.related_type == 'opportunity'
+        ]
+        pipelines = self.resolve_pipelines(
+            entry.related_id for entry in tasks
+        )
+        by_pipeline = collections.defaultdict(list)
+        for entry in tasks:
+            by_pipeline[pipelines.get(entry.related_id)].append(entry)
+        return dict(by_pipeline)
+
+    def _valid_reminder(self, date, id):
+        entry = self.tasks.get(id)
+        return entry is not None and entry.reminder_date == date
+
+    def next_reminder(self):
+        """The date of the next reminder, None if there is none."""
+        with self.changed:
+            while self._reminders and \
+                    not self._valid_reminder(*self._reminders[0]):
+                heapq.heappop(self._reminders)
+            return self._reminders[0][0] if self._reminders else None
+
+    def pop_reminders(self, now=None, since=None):
+        """
+        The tasks whose reminder date is before now, each one only once.
+        Reminders older than since are dropped without being returned.
+        """
+        now = time.time() if now is None else now
+        due = collections.OrderedDict()
+        with self.changed:
+            while self._reminders and self._reminders[0][0] <= now:
+                date, id = heapq.heappop(self._reminders)
+                if self._valid_reminder(date, id) and (
+                    since is None or date >= since
+                ):
+                    due[id] = self.tasks[id]
+        return list(due.values())
+
+    def sync(self, page_size=MAX_PAGE_SIZE):
+        """
+        Pull the tasks modified since the last sync (the open tasks on the
+        first one), returns the number of tasks read.
+        """
+        query = {'page_size': page_size, 'sort_by': 'date_modified'}
+        if self.synced_at is None:
+            query['statuses'] = [OPEN]
+        else:
+            query['minimum_modified_date'] = self.synced_at
+        started = int(time.time())
+        latest, count = self.synced_at, 0
+        for _, records in Task.iter_pages(stream=True, **query):
+            for record in records:
+                self.add(record)
+                latest = max(latest, record.get('date_modified'))
+                count += 1
+        self.synced_at = latest if latest is not None else started
+        return count
+
+    def _refresh(self, id, token):
+        try:
+            record = api.requests.get("{}/{}".format(Task._endpoint, id))
+        except exceptions.ProsperWorksNotFoundRequest:
+            record = None
+        except Exception as e:
+            record = e
+        with self.changed:
+            if self._notified.get(id) is not token:
+                # a later notification wins
+                return
+            del self._notified[id]
+            if isinstance(record, Exception):
+                self.errors.append((id, record))
+            elif record is None:
+                self.discard(id)
+            else:
+                self.add(record)
+
+    def handle_event(self, event):
+        """
+        WebhookReceiver listener keeping the index up to date. New and
+        updated tasks are fetched in the background, on pool.
+        """
+        if event.type == 'opportunity':
+            for id in event.ids:
+                self.pipelines.pop(id, None)
+            return
+        if event.type != 'task':
+            return
+        pool = self.pool or shared_pool()
+        with scheduler.priority(scheduler.BATCH):
+            refresh = scheduler.bind(self._refresh)
+        for id in event.ids:
+            with self.changed:
+                if event.event == 'delete':
+                    # fetches in flight are ignored
+                    self._notified.pop(id, None)
+                    self.discard(id)
+                    continue
+                token = self._notified[id] = object()
+            pool.apply_async(refresh, (id, token))
+
+
+class ReminderDispatcher(object):
+    def __init__(self, index, callback, since=None):
+        """
+        Call callback with the TaskEntry of every task of index once its
+        reminder date is reached, from a background thread sleeping until
+        the next reminder (or a change of the index).
+        since: reminders older than this timestamp are skipped (by default
+        the ones which were due before the dispatcher started).
+        """
+        self.index = index
+        self.callback = callback
+        self.since = time.time() if since is None else since
+        self.sent = 0
+        self.errors = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _wait(self):
+        """Wait for due reminders, returns False once closed."""
+        with self.index.changed:
+            while not self._closed:
+                next_reminder = self.index.next_reminder()
+                if next_reminder is None:
+                    self.index.changed.wait()
+                    continue
+                delay = next_reminder - time.time()
+                if delay <= 0:
+                    return True
+                self.index.changed.wait(delay)
+            return False
+
+    def _run(self):
+        while self._wait():
+            for entry in self.index.pop_reminders(since=self.since):
+                try:
+                    self.callback(entry)
+                    self.sent += 1
+                except Exception as e:
+                    self.errors.append((entry.id, e))
+
+    def close(self):
+        """Stop the background thread."""
+        with self.index.changed:
+            self._closed = True
+            self.index.changed.notify_all()
+        self._thread.join()
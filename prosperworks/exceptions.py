@@ -18,6 +18,43 @@ class ProsperWorksBadJson(ProsperWorksApplicationException):
     pass
 
 
+class ProsperWorksValidationError(ProsperWorksApplicationException):
+    def __init__(self, errors):
+        super(ProsperWorksValidationError, self).__init__(u' '.join(errors))
+        self.errors = errors
+
+
+class ProsperWorksCircuitOpen(BaseProsperWorksException):
+    def __init__(self, endpoint, retry_after):
+        super(ProsperWorksCircuitOpen, self).__init__(
+            u"Requests to %s keep failing, none are sent for %.0f seconds." % (
+                endpoint, retry_after
+            )
+        )
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class ProsperWorksCancelled(BaseProsperWorksException):
+    """
+    The operation was cancelled (see prosperworks.deadline). Bulk helpers
+    set partial to what was done before.
+    """
+    def __init__(self, message=None, partial=None):
+        super(ProsperWorksCancelled, self).__init__(
+            message or u"The operation was cancelled."
+        )
+        self.partial = partial
+
+
+class ProsperWorksDeadlineExceeded(ProsperWorksCancelled):
+    def __init__(self, message=None, partial=None):
+        super(ProsperWorksDeadlineExceeded, self).__init__(
+            message or u"The deadline of the operation was exceeded.",
+            partial,
+        )
+
+
 class ProsperWorksServerException(BaseProsperWorksException):
     def __init__(self, message, error_code):
         super(ProsperWorksServerException, self).__init__(message)
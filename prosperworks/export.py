@@ -0,0 +1,468 @@
+"""
+Full table export of searchable models to NDJSON, CSV or Parquet files.
+
+Pages are pulled straight from the search endpoints and written as flat rows
+without building model objects. Every model is exported by its own worker and
+all of them share the api rate limiter, so the whole export stays within the
+account quota.
+
+Ex:
+>>> from prosperworks import api, export
+>>> api.configure('key', 'your.name@example.com')
+>>> stats = export.export_all('/tmp/dump', format='csv',
+...                           checkpoint='/tmp/dump/checkpoint.json')
+>>> print stats['companies'].rows_per_second
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from . import api
+from . import exceptions
+from . import scheduler
+from . import utils
+from .constants import MAX_PAGE_SIZE
+from .custom_fields import get_registry
+from .hydrate import Hydrator
+from .models import (
+    Company, Lead, Model, Opportunity, Person, SearchableModel,
+)
+
+text_type = type(u'')
+
+EXPORT_MODELS = (
+    Company,
+    Person,
+    Lead,
+    Opportunity,
+)
+CUSTOM_FIELD_COLUMN = "custom_field_{}"
+PARQUET_ROWS_PER_FILE = 10000
+
+
+def flatten_record(record, custom_field_columns=None):
+    """
+    Turn a raw api record into a flat row. Custom fields become one column
+    per definition and nested objects (ex: address) become prefixed columns.
+    custom_field_columns optionally maps definition ids to column names.
+    """
+    custom_field_columns = custom_field_columns or {}
+    row = {}
+    for key, value in record.items():
+        if key == 'custom_fields':
+            for field in value or ():
+                field_id = field['custom_field_definition_id']
+                column = custom_field_columns.get(field_id)
+                if column is None:
+                    column = CUSTOM_FIELD_COLUMN.format(field_id)
+                row[column] = field.get('value')
+        elif isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                row[u"%s_%s" % (key, sub_key)] = sub_value
+        else:
+            row[key] = value
+    return row
+
+
+def model_columns(model, custom_field_columns=None):
+    """
+    The stable column list of a model, used as the header of tabular formats.
+    custom_field_columns maps definition ids to column names.
+    """
+    custom_field_columns = custom_field_columns or {}
+    fields = utils.class_fields(model)
+    columns = [model._id_field] if model._id_field in fields else []
+    for key in sorted(fields):
+        value = fields[key]
+        if key == model._id_field or key in model._lazy_props:
+            continue
+        if key == 'custom_fields':
+            columns.extend(
+                custom_field_columns[field_id]
+                for field_id in sorted(custom_field_columns)
+            )
+        elif isinstance(value, Model):
+            columns.extend(
+                u"%s_%s" % (key, sub_key)
+                for sub_key in sorted(utils.class_fields(type(value)))
+            )
+        else:
+            columns.append(key)
+    return columns
+
+
+def _scalar(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+class NDJSONWriter(object):
+    extension = 'ndjson'
+    commit_every_page = True
+    full = False
+
+    def __init__(self, path, columns, offset=0):
+        self.path = path + '.' + self.extension
+        self.columns = columns
+        self._file = open(self.path, 'ab')
+        self._file.seek(0, os.SEEK_END)
+        if offset or self._file.tell():
+            self._file.truncate(offset)
+            self._file.seek(offset)
+
+    def write(self, rows):
+        """Write an iterable of rows, returns how many were written."""
+        count = 0
+        for row in rows:
+            self._file.write(json.dumps(row).encode('utf-8') + b'\n')
+            count += 1
+        return count
+
+    def commit(self):
+        """Flush buffered rows, returns the offset to resume from."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class CSVWriter(NDJSONWriter):
+    extension = 'csv'
+
+    def __init__(self, path, columns, offset=0):
+        super(CSVWriter, self).__init__(path, columns, offset=offset)
+        self._writer = csv.DictWriter(
+            self._file, columns, extrasaction='ignore'
+        )
+        if not offset:
+            self._writer.writeheader()
+
+    def write(self, rows):
+        count = 0
+        for row in rows:
+            self._writer.writerow({
+                key: self._encode(_scalar(value))
+                for key, value in row.items()
+            })
+            count += 1
+        return count
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, text_type):
+            return value.encode('utf-8')
+        return value
+
+
+class ParquetWriter(object):
+    """
+    Parquet files can't be appended to, so rows are buffered and written as
+    numbered part files inside a directory named after the model (whose
+    parts are removed when starting over). Values are stored as strings so
+    every part shares the same schema.
+    """
+    extension = 'parquet'
+    commit_every_page = False
+
+    def __init__(self, path, columns, offset=0):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise exceptions.ProsperWorksApplicationException(
+                u"pyarrow is required to export to parquet."
+            )
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        self.columns = columns
+        self.part = offset
+        self._rows = []
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        elif not offset:
+            # parts of an earlier export, which may have had more of them
+            for name in glob.glob(os.path.join(self.path, 'part-*.parquet')):
+                os.remove(name)
+
+    def write(self, rows):
+        count = len(self._rows)
+        self._rows.extend(rows)
+        return len(self._rows) - count
+
+    @property
+    def full(self):
+        return len(self._rows) >= PARQUET_ROWS_PER_FILE
+
+    def commit(self):
+        if self._rows:
+            table = self._pa.Table.from_arrays([
+                self._pa.array([
+                    None if row.get(column) is None
+                    else text_type(_scalar(row[column]))
+                    for row in self._rows
+                ], type=self._pa.string())
+                for column in self.columns
+            ], names=self.columns)
+            name = os.path.join(self.path, 'part-%05d.parquet' % self.part)
+            self._pq.write_table(table, name + '.tmp')
+            os.rename(name + '.tmp', name)
+            self.part += 1
+            self._rows = []
+        return self.part
+
+    def close(self):
+        pass
+
+
+WRITERS = {
+    writer.extension: writer
+    for writer in (NDJSONWriter, CSVWriter, ParquetWriter)
+}
+
+
+class Checkpoint(object):
+    """
+    Progress of an export, saved after every committed page so an
+    interrupted export can pick up where it stopped. Cleared once the export
+    completes, so the next one starts over.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.state = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def get(self, name):
+        return self.state.get(name, {'page': 1, 'offset': 0, 'rows': 0,
+                                     'done': False})
+
+    def save(self, name, **progress):
+        with self._lock:
+            self.state[name] = progress
+            if not self.path:
+                return
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self.state, f)
+            os.rename(self.path + '.tmp', self.path)
+
+    def clear(self):
+        with self._lock:
+            self.state = {}
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class ExportStats(utils.QuickRepr):
+    def __init__(self, name, rows=0, pages=0, seconds=0.0):
+        self.name = name
+        self.rows = rows
+        self.pages = pages
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class Exporter(object):
+    def __init__(self, directory, format='ndjson', models=EXPORT_MODELS,
+                 page_size=MAX_PAGE_SIZE, workers=None, checkpoint=None,
+                 progress=None, custom_field_names=False, processes=None,
+                 stream=False):
+        """
+        processes: decode and flatten pages in a pool of that many processes
+        (see prosperworks.hydrate) instead of the export threads.
+        stream: write records as they are parsed from the responses instead
+        of decoding whole pages, keeping the memory use flat with large pages.
+        """
+        if format not in WRITERS:
+            raise exceptions.ProsperWorksApplicationException(
+                u"%s is not a valid export format." % format
+            )
+        if processes and stream:
+            raise exceptions.ProsperWorksApplicationException(
+                u"Pages can't be both streamed and decoded by processes."
+            )
+        for model in models:
+            if not issubclass(model, SearchableModel):
+                raise exceptions.ProsperWorksApplicationException(
+                    u"%s is not a searchable model." % model.__name__
+                )
+        self.directory = directory
+        self.writer_class = WRITERS[format]
+        self.models = models
+        self.page_size = page_size
+        self.workers = workers or len(models)
+        self.checkpoint = Checkpoint(checkpoint)
+        self.progress = progress
+        self.custom_field_names = custom_field_names
+        self.processes = processes
+        self.stream = stream
+        self.hydrator = None
+
+    def custom_field_columns(self):
+        registry = get_registry()
+        if self.custom_field_names:
+            return {
+                field_id: definition['name']
+                for field_id, definition in registry.by_id.items()
+            }
+        return {
+            field_id: CUSTOM_FIELD_COLUMN.format(field_id)
+            for field_id in registry.by_id
+        }
+
+    def export_model(self, model, custom_field_columns):
+        name = model._endpoint
+        state = self.checkpoint.get(name)
+        stats = ExportStats(name)
+        if state['done']:
+            return stats
+
+        writer = self.writer_class(
+            os.path.join(self.directory, name),
+            model_columns(model, custom_field_columns),
+            offset=state['offset'],
+        )
+        rows = state['rows']
+        next_page = state['page']
+        start = time.time()
+        try:
+            if self.hydrator is not None:
+                pages = self.hydrator.iter_records(
+                    model, custom_field_columns,
+                    page_size=self.page_size, page_number=state['page'],
+                )
+            else:
+                pages = (
+                    (page_number, (
+                        flatten_record(record, custom_field_columns)
+                        for record in records
+                    ))
+                    for page_number, records in model.iter_pages(
+                        page_size=self.page_size, page_number=state['page'],
+                        stream=self.stream,
+                    )
+                )
+            for page_number, page_rows in pages:
+                stats.rows += writer.write(page_rows)
+                stats.pages += 1
+                next_page = page_number + 1
+                if writer.commit_every_page or writer.full:
+                    self.checkpoint.save(
+                        name, page=next_page, offset=writer.commit(),
+                        rows=rows + stats.rows, done=False,
+                    )
+                if self.progress is not None:
+                    stats.seconds = time.time() - start
+                    self.progress(stats)
+            self.checkpoint.save(
+                name, page=next_page, offset=writer.commit(),
+                rows=rows + stats.rows, done=True,
+            )
+        except exceptions.ProsperWorksCancelled as e:
+            # pages up to the last checkpoint are kept, see Checkpoint
+            e.partial = stats
+            raise
+        finally:
+            writer.close()
+            stats.seconds = time.time() - start
+        return stats
+
+    def run(self):
+        """
+        Export every model, returns a dict of ExportStats keyed by endpoint
+        name. If cancelled (see prosperworks.deadline), the raised
+        exception's partial is that dict, with the stats of the rows
+        exported so far, and the checkpoint is kept to resume from.
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        custom_field_columns = self.custom_field_columns()
+        if self.processes:
+            self.hydrator = Hydrator(self.processes)
+
+        def export(model):
+            try:
+                return self.export_model(model, custom_field_columns)
+            except exceptions.ProsperWorksCancelled as e:
+                return e
+
+        pool = ThreadPool(self.workers)
+        try:
+            results = pool.map(scheduler.bind(export), self.models)
+        finally:
+            pool.close()
+            pool.join()
+            if self.hydrator is not None:
+                self.hydrator.close()
+                self.hydrator = None
+        stats, cancelled = {}, None
+        for result in results:
+            if isinstance(result, exceptions.ProsperWorksCancelled):
+                cancelled, result = result, result.partial
+            stats[result.name] = result
+        if cancelled is not None:
+            cancelled.partial = stats
+            raise cancelled
+        self.checkpoint.clear()
+        return stats
+
+
+def export_all(directory, format='ndjson', models=EXPORT_MODELS, **kwargs):
+    """
+    Export every record of the given models, returns a dict of
+    ExportStats keyed by endpoint name.
+    """
+    return Exporter(directory, format=format, models=models, **kwargs).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export ProsperWorks records to files."
+    )
+    parser.add_argument('directory')
+    parser.add_argument('--key', required=True)
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--format', default='ndjson', choices=sorted(WRITERS))
+    parser.add_argument('--page-size', type=int, default=MAX_PAGE_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--checkpoint', default=None)
+    parser.add_argument('--custom-field-names', action='store_true')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--stream', action='store_true')
+    args = parser.parse_args(argv)
+
+    api.configure(args.key, args.email)
+
+    def progress(stats):
+        print(u"%s: %d rows (%.1f rows/s)" % (
+            stats.name, stats.rows, stats.rows_per_second
+        ))
+
+    with scheduler.priority(scheduler.BATCH):
+        results = export_all(
+            args.directory, format=args.format, page_size=args.page_size,
+            workers=args.workers, checkpoint=args.checkpoint,
+            progress=progress, custom_field_names=args.custom_field_names,
+            processes=args.processes, stream=args.stream,
+        )
+    for stats in results.values():
+        print(u"%s: %d rows in %.1fs (%.1f rows/s)" % (
+            stats.name, stats.rows, stats.seconds, stats.rows_per_second
+        ))
+
+
+if __name__ == '__main__':
+    main()
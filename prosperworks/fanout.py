@@ -0,0 +1,100 @@
+"""
+Run searches on several models concurrently and merge the results.
+
+Ex:
+>>> from prosperworks.fanout import search_many
+>>> from prosperworks.models import Company, Lead, Person
+>>> result = search_many({
+...     'people': (Person, {'tags': ['vip']}),
+...     'companies': (Company, {'city': 'Denver'}),
+...     'leads': (Lead, {'city': 'Denver'}, 2),  # 2s timeout for this query
+... }, timeout=5)
+>>> result['people']  # [<Person: ...>, ...]
+>>> result.complete  # False if a query failed or timed out
+"""
+import time
+from multiprocessing import TimeoutError
+
+from . import deadline
+from . import exceptions
+from . import scheduler
+from . import utils
+from .models import SearchableModel
+from .pool import shared_pool
+
+
+class FanoutResult(utils.QuickRepr):
+    """
+    Partial results: queries that failed are in errors, the ones that didn't
+    answer in time are in timed_out and both are missing from results.
+    """
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.timed_out = set()
+
+    @property
+    def complete(self):
+        return not self.errors and not self.timed_out
+
+    def __getitem__(self, name):
+        return self.results.get(name, [])
+
+    def merged(self):
+        """Every result as (query name, model) pairs."""
+        return [
+            (name, obj)
+            for name, objects in self.results.items()
+            for obj in objects
+        ]
+
+
+def _parse_queries(queries, timeout):
+    if not isinstance(queries, dict):
+        queries = {query[0]._endpoint: query for query in queries}
+    parsed = {}
+    for name, query in queries.items():
+        model, query_fields = query[0], query[1] if len(query) > 1 else {}
+        if not issubclass(model, SearchableModel):
+            raise exceptions.ProsperWorksApplicationException(
+                u"%s is not a searchable model." % model.__name__
+            )
+        parsed[name] = (
+            model, model._search_schema.build(query_fields),
+            query[2] if len(query) > 2 else timeout,
+        )
+    return parsed
+
+
+def search_many(queries, timeout=None, pool=None):
+    """
+    queries is a dict of name -> (Model, query_fields[, timeout]) or a list
+    of such tuples (named after the model endpoint). Searches run at the same
+    time on the shared pool, so the call takes as long as the slowest one
+    (or its timeout). Queries still running when the deadline of the calling
+    thread passes are timed out.
+    """
+    queries = _parse_queries(queries, timeout)
+    pool = pool or shared_pool()
+    start = time.time()
+    pending = {
+        name: (
+            pool.apply_async(scheduler.bind(model.search), (), query_fields),
+            timeout,
+        )
+        for name, (model, query_fields, timeout) in queries.items()
+    }
+
+    result = FanoutResult()
+    for name, (async_result, timeout) in pending.items():
+        remaining = None
+        if timeout is not None:
+            remaining = max(start + timeout - time.time(), 0)
+        remaining = deadline.current().timeout(remaining)
+        try:
+            result.results[name] = async_result.get(remaining)
+        except TimeoutError:
+            result.timed_out.add(name)
+        except Exception as e:
+            result.errors[name] = e
+    return result
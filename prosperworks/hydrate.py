@@ -0,0 +1,163 @@
+"""
+Process pool hydration of large search results.
+
+Decoding pages and building models (or flat export rows) is pure Python and
+holds the GIL, so threads don't help on big full table pulls. A Hydrator
+sends the undecoded page bodies to a pool of processes which decode them and
+return the results in a compact format: the field names of a page are sent
+once and every record as a tuple of values.
+
+Ex:
+>>> from prosperworks.hydrate import Hydrator
+>>> from prosperworks.models import Company
+>>> with Hydrator(processes=4) as hydrator:
+...     for page_number, companies in hydrator.iter_models(Company):
+...         ...
+"""
+import collections
+import json
+import multiprocessing
+
+from . import api
+from .constants import MAX_PAGE_SIZE
+from .models import CRUDModel
+
+
+def pack(dicts):
+    """
+    Pack a list of dicts as (shapes, rows): shapes are the distinct key
+    tuples and rows (shape index, values tuple) pairs.
+    """
+    shapes = []
+    shape_index = {}
+    rows = []
+    for data in dicts:
+        keys = tuple(data)
+        index = shape_index.get(keys)
+        if index is None:
+            index = shape_index[keys] = len(shapes)
+            shapes.append(keys)
+        rows.append((index, tuple(data.values())))
+    return shapes, rows
+
+
+def unpack(packed):
+    shapes, rows = packed
+    return [dict(zip(shapes[index], values)) for index, values in rows]
+
+
+def _decode_models(args):
+    model, body = args
+    objects = model.populate_list(list_data=json.loads(body))
+    return pack(obj.__dict__ for obj in objects)
+
+
+def _decode_records(args):
+    from .export import flatten_record
+    body, custom_field_columns = args
+    return pack(
+        flatten_record(record, custom_field_columns)
+        for record in json.loads(body)
+    )
+
+
+def search_body(model, page_size, query_fields):
+    """
+    The body of a paginated search, page_size capped to the largest pages
+    the api returns (a shorter page is the last one).
+    """
+    body = model._search_schema.build(dict(query_fields, page_size=page_size))
+    body['page_size'] = min(body['page_size'], MAX_PAGE_SIZE)
+    return body
+
+
+def iter_raw_pages(model, page_size=MAX_PAGE_SIZE, page_number=1,
+                   **query_fields):
+    """Yield (page_number, undecoded body) for every page of a search."""
+    body = search_body(model, page_size, query_fields)
+    while True:
+        body['page_number'] = page_number
+        yield page_number, api.requests.post_raw(model.search_endpoint(), body)
+        page_number += 1
+
+
+class Hydrator(object):
+    def __init__(self, processes=None, prefetch=None):
+        """
+        processes defaults to the number of cores.
+        prefetch: pages of a search fetched ahead and decoded at once
+        (the number of processes by default), so a single caller keeps
+        several processes busy. Up to one page past the last one may be
+        fetched.
+        """
+        processes = processes or multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(processes)
+        self.prefetch = prefetch or processes
+
+    def _iter(self, model, decode, args, page_size, page_number,
+              query_fields):
+        pages = iter_raw_pages(
+            model, page_size=page_size, page_number=page_number,
+            **query_fields
+        )
+        page_size = search_body(model, page_size, query_fields)['page_size']
+        # (page number, pending decode) of the pages fetched ahead
+        window = collections.deque()
+        fetching = True
+        while True:
+            while fetching and len(window) < self.prefetch:
+                page_number, body = next(pages)
+                # pages after an empty one are empty too
+                fetching = body.strip() != b'[]'
+                window.append((page_number, self.pool.apply_async(
+                    decode, (args(body),)
+                )))
+            page_number, result = window.popleft()
+            # waiting on the pool releases the GIL for the other threads
+            rows = result.get()
+            if rows[1]:
+                yield page_number, rows
+            if len(rows[1]) < page_size:
+                break
+
+    def iter_models(self, model, page_size=MAX_PAGE_SIZE, page_number=1,
+                    **query_fields):
+        """Like model.iter_pages, but yields (page_number, models)."""
+        snapshot = api.snapshot if issubclass(model, CRUDModel) else None
+        pages = self._iter(
+            model, _decode_models, lambda body: (model, body),
+            page_size, page_number, query_fields,
+        )
+        for page_number, packed in pages:
+            objects = []
+            for data in unpack(packed):
+                obj = model.__new__(model)
+                obj.__dict__ = data
+                if snapshot is not None:
+                    snapshot.add_model(obj)
+                objects.append(obj)
+            yield page_number, objects
+
+    def iter_records(self, model, custom_field_columns=None,
+                     page_size=MAX_PAGE_SIZE, page_number=1, **query_fields):
+        """
+        Like model.iter_pages, but yields (page_number, rows) where rows are
+        flattened with export.flatten_record.
+        """
+        pages = self._iter(
+            model, _decode_records,
+            lambda body: (body, custom_field_columns),
+            page_size, page_number, query_fields,
+        )
+        for page_number, packed in pages:
+            yield page_number, unpack(packed)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,38 @@
+import collections
+import threading
+
+
+class Metrics(object):
+    """
+    Thread safe counters (ex: requests sent, cache hits) and gauges (ex:
+    current concurrency limit) reported by the client, see api.metrics.
+    """
+    def __init__(self):
+        self._counters = collections.defaultdict(int)
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name, default=0):
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            return self._counters.get(name, default)
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._counters)
+            values.update(self._gauges)
+            return values
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
@@ -1,17 +1,180 @@
+import collections
+import time
+from multiprocessing.pool import ThreadPool
+
 from . import api
+from . import deadline
+from . import exceptions
+from . import scheduler
 from . import utils
+from . import warmstart
+from .cache import NOT_FOUND
+from .constants import DEFAULT_WORKERS, MAX_PAGE_SIZE
+from .schema import Schema
+
+
+def _deferred_getattribute(self, key):
+    if key in object.__getattribute__(self, '_deferred_fields') and \
+            key not in object.__getattribute__(self, '__dict__'):
+        object.__getattribute__(self, 'load')()
+    return object.__getattribute__(self, key)
+
+
+def _deferred_getattr(self, key):
+    # fields returned by the api but not declared on the model
+    if key.startswith('_'):
+        raise AttributeError(key)
+    self.load()
+    return getattr(self, key)
+
+
+# values that are serialized as is, anything else is checked for .serialize()
+PLAIN_TYPES = frozenset([
+    type(None), bool, int, long, float, str, unicode, list, dict,
+])
+
+
+class SerializePlan(object):
+    """
+    What Model.serialize needs to know about a class, computed once when the
+    class is defined: the declared fields holding nested objects and the lazy
+    properties to skip.
+    """
+    __slots__ = ('nested', 'skip')
+
+    def __init__(self, cls):
+        declared = utils.class_fields(cls)
+        self.skip = frozenset(cls._lazy_props) | frozenset(
+            key for klass in cls.__mro__
+            for key, value in vars(klass).items()
+            if isinstance(value, utils.lazy_property)
+        )
+        self.nested = frozenset(
+            key for key, value in declared.items()
+            if key not in self.skip and hasattr(value, 'serialize')
+        )
+
+
+def _serialize_items(items, plan, skip_private=False):
+    skip, nested = plan.skip, plan.nested
+    data = {}
+    for key, value in items:
+        if skip_private and (key[0] == '_' or key in skip):
+            continue
+        if key in nested or type(value) not in PLAIN_TYPES:
+            serialize = getattr(value, 'serialize', None)
+            if serialize is not None:
+                value = serialize()
+        data[key] = value
+    return data
+
+
+class ModelMeta(type):
+    def __init__(cls, name, bases, attrs):
+        super(ModelMeta, cls).__init__(name, bases, attrs)
+        cls._serialize_plan = SerializePlan(cls)
+        field_types = getattr(cls, '_field_types', None)
+        cls._create_schema = Schema.for_fields(
+            getattr(cls, '_create_fields', ()), field_types, 'create'
+        )
+        cls._search_schema = Schema.for_fields(
+            getattr(cls, '_search_fields', ()), field_types, 'search'
+        )
 
 
 class Model(utils.QuickRepr):
+    __metaclass__ = ModelMeta
+
     _endpoint = None
     _id_field = 'id'
     _lazy_props = tuple()
+    # field name -> schema.FieldType, overriding the name based types
+    _field_types = {}
+    _deferred = False
 
-    def __init__(self, id=None):
+    def __init__(self, id=None, deferred=None):
+        """
+        With deferred=True (or api.deferred), no request is sent until a
+        field that isn't set yet is accessed, see Model.load.
+        """
         setattr(self, self._id_field, id)
 
         if id is not None:
+            if deferred is None:
+                deferred = api.deferred
+            if deferred and self._endpoint is not None:
+                self.__class__ = self._deferred_class()
+            else:
+                self.populate()
+
+    @classmethod
+    def _deferred_class(cls):
+        if '_deferred_stub' not in cls.__dict__:
+            cls._deferred_stub = type(cls.__name__, (cls,), {
+                '__module__': cls.__module__,
+                '__getattribute__': _deferred_getattribute,
+                '__getattr__': _deferred_getattr,
+                '_deferred': True,
+                '_deferred_model': cls,
+                '_deferred_fields': frozenset(
+                    utils.class_fields(cls)
+                ) - frozenset([cls._id_field]),
+            })
+        return cls._deferred_stub
+
+    def _undefer(self):
+        if self._deferred:
+            self.__class__ = self._deferred_model
+
+    def load(self):
+        """Fetch the fields of a deferred model, does nothing if loaded."""
+        if self._deferred:
             self.populate()
+        return self
+
+    def refresh(self):
+        """Fetch the fields again, replacing the current values."""
+        self._undefer()
+        for key in list(self.__dict__):
+            if key != self._id_field:
+                del self.__dict__[key]
+        return self.populate()
+
+    @staticmethod
+    def load_many(objects, workers=DEFAULT_WORKERS):
+        """
+        Load many deferred models with at most `workers` requests in flight.
+        Models referencing the same record share a single request.
+
+        If the deadline passes (see prosperworks.deadline), the raised
+        exception's partial is the list of the models loaded.
+        """
+        pending = {}
+        for obj in objects:
+            if obj._deferred:
+                pending.setdefault(obj.id_url, []).append(obj)
+        if not pending:
+            return objects
+
+        def load(group):
+            data = api.requests.get(group[0].id_url)
+            for obj in group:
+                obj.populate(data=data)
+
+        pool = ThreadPool(min(workers, len(pending)))
+        cancelled = None
+        try:
+            pool.map(scheduler.bind(load), pending.values())
+        except exceptions.ProsperWorksCancelled as e:
+            cancelled = e
+        finally:
+            pool.close()
+            pool.join()
+        if cancelled is not None:
+            # map raises at the first error, the other loads end in join
+            cancelled.partial = [obj for obj in objects if not obj._deferred]
+            raise cancelled
+        return objects
 
     @property
     def id_url(self):
@@ -24,6 +187,7 @@ class Model(utils.QuickRepr):
         if self._endpoint is None and data is None:
             return data
         data = data or api.requests.get(self.id_url)
+        self._undefer()
         for key, value in data.items():
             current_value = getattr(self, key, None)
             if current_value is None:
@@ -56,14 +220,16 @@ class Model(utils.QuickRepr):
         return obj
 
     def serialize(self, *fields):
-        fields = fields or self.get_fields()
-        return {
-            key: getattr(self, key)
-            if not hasattr(getattr(self, key), 'serialize')
-            else getattr(self, key).serialize()
-            for key in fields
-            if key not in self._lazy_props
-        }
+        if fields:
+            skip = self._serialize_plan.skip
+            return _serialize_items(
+                ((key, getattr(self, key)) for key in fields
+                 if key not in skip),
+                self._serialize_plan,
+            )
+        return _serialize_items(
+            self.__dict__.iteritems(), self._serialize_plan, skip_private=True
+        )
 
 
 class CRUDModel(Model):
@@ -73,18 +239,38 @@ class CRUDModel(Model):
     """
     _create_fields = tuple()
 
+    def populate(self, data=None):
+        populated = super(CRUDModel, self).populate(data)
+        if api.snapshot is not None:
+            api.snapshot.add_model(self)
+        return populated
+
     def delete(self):
         response = api.requests.delete(self.id_url)
-        return utils.Data(**response)
+        if api.snapshot is not None:
+            api.snapshot.discard(self, getattr(self, self._id_field))
+        return utils.DataView(response)
 
     @classmethod
     def create(cls, **create_fields):
-        utils.validate_fields(create_fields, cls._create_fields)
-        response = api.requests.post(cls._endpoint, json=create_fields)
+        """
+        Fields are checked and coerced against cls._create_schema (ex:
+        datetimes become timestamps) before anything is sent.
+        """
+        body = cls._create_schema.build(create_fields)
+        response = api.requests.post(cls._endpoint, json=body)
         return cls().populate(data=response)
 
     def update(self, *fields):
+        """
+        Note: If api.snapshot is set and the content matches the one last
+        seen from the api, no request is sent.
+        """
         data = self.serialize(*fields)
+        if api.snapshot is not None and api.snapshot.is_unchanged(
+            self, getattr(self, self._id_field), data
+        ):
+            return
         response = api.requests.put(self.id_url, json=data)
         self.populate(data=response)
 
@@ -113,15 +299,95 @@ class SearchableModel(ListableModel):
 
     @classmethod
     def search(cls, **query_fields):
-        utils.validate_fields(query_fields, cls._search_fields, 'search')
-        results = api.requests.post(cls.search_endpoint(), query_fields)
+        body = cls._search_schema.build(query_fields)
+        results = api.requests.post(cls.search_endpoint(), body)
         return cls.populate_list(list_data=results)
 
+    @classmethod
+    def iter_pages(cls, page_size=MAX_PAGE_SIZE, page_number=1, stream=False,
+                   **query_fields):
+        """
+        Yield (page_number, records) for every page of a search, where
+        records is the raw list of dicts returned by the api. No models are
+        built, which keeps full table pulls cheap.
+
+        With stream=True records is a StreamedPage, yielding each record as
+        it is parsed from the response so a page is never held in memory.
+        """
+        query_fields['page_size'] = page_size
+        body = cls._search_schema.build(query_fields)
+        # the api returns MAX_PAGE_SIZE records at most, a shorter page is
+        # the last one
+        page_size = body['page_size'] = min(body['page_size'], MAX_PAGE_SIZE)
+        while True:
+            body['page_number'] = page_number
+            if stream:
+                records = StreamedPage(
+                    api.requests.post_stream(cls.search_endpoint(), body)
+                )
+                if records.empty:
+                    break
+                yield page_number, records
+                # whatever was not read still tells if there are more pages
+                records.drain()
+                count = records.count
+            else:
+                records = api.requests.post(cls.search_endpoint(), body)
+                if records:
+                    yield page_number, records
+                count = len(records)
+            if count < page_size:
+                break
+            page_number += 1
+
+    @classmethod
+    def search_iter(cls, page_size=MAX_PAGE_SIZE, **query_fields):
+        """
+        Yield a model for every record matching query_fields, across pages,
+        streaming responses so only one record is decoded at a time.
+        """
+        for _, records in cls.iter_pages(page_size=page_size, stream=True,
+                                         **query_fields):
+            for record in records:
+                yield cls.from_simple_dict(record)
+
     @classmethod
     def list(cls):
         return cls.search()
 
 
+class StreamedPage(object):
+    """
+    Records of a streamed search page, counting the records read so far.
+    Iterating it a second time continues where the first iteration stopped.
+    """
+    _END = object()
+
+    def __init__(self, records):
+        self._records = iter(records)
+        self._first = next(self._records, self._END)
+        self.count = 0
+
+    @property
+    def empty(self):
+        return self._first is self._END and not self.count
+
+    def __iter__(self):
+        if self._first is not self._END:
+            first, self._first = self._first, self._END
+            self.count += 1
+            yield first
+        for record in self._records:
+            self.count += 1
+            yield record
+
+    def drain(self):
+        """Read the records left, returns the number of records."""
+        for _ in self:
+            pass
+        return self.count
+
+
 class ObjectList(utils.QuickRepr, utils.AbstractMixin):
     def __init__(self, model, objects=None):
         self.model = model
@@ -134,7 +400,12 @@ class ObjectList(utils.QuickRepr, utils.AbstractMixin):
         return self
 
     def serialize(self):
-        return [obj.serialize() for obj in self.objects]
+        # objects are all of the same model, so its plan is looked up once
+        plan = self.model._serialize_plan
+        return [
+            _serialize_items(obj.__dict__.iteritems(), plan, skip_private=True)
+            for obj in self.objects
+        ]
 
     def __iter__(self):
         return self.objects.__iter__()
@@ -158,19 +429,10 @@ class SimpleList(utils.QuickRepr, utils.AbstractMixin):
         return self.objects.__iter__()
 
 
-class SimpleObject(utils.Data, utils.AbstractMixin):
-    _raw = {}
-
-    def __init__(self, **kwargs):
-        super(SimpleObject, self).__init__(**kwargs)
-        self._raw = kwargs
-
+class SimpleObject(utils.DataView, utils.AbstractMixin):
     def populate(self, data=None):
-        self._raw = data or {}
-        return super(SimpleObject, self).populate(data)
-
-    def serialize(self):
-        return self._raw
+        utils.DataView.__init__(self, data)
+        return self
 
 
 class Account(Model):
@@ -288,7 +550,9 @@ class Company(CRUDModel, SearchableModel):
         if self.contact_type_id:
             contact_types = api.cache.get_or_set(
                 "contact_types",
-                lambda: ContactType.list()
+                lambda: ContactType.populate_list(
+                    list_data=warmstart.reference_data('contact_types')
+                )
             )
             results = filter(
                 lambda x: x.id == self.contact_type_id,
@@ -299,6 +563,16 @@ class Company(CRUDModel, SearchableModel):
         return None
 
 
+ConversionResult = collections.namedtuple('ConversionResult', (
+    'lead_id', 'person_id', 'company_id', 'opportunity_id', 'error',
+))
+# errors a conversion is known not to have happened after. A server error
+# may come after the lead was converted, so retrying could convert it twice.
+RETRYABLE_EXCEPTIONS = (
+    exceptions.ProsperWorksRateLimitExceeded,
+)
+
+
 class Lead(CRUDModel, SearchableModel):
     _endpoint = "leads"
     _search_fields = (
@@ -365,19 +639,44 @@ class Lead(CRUDModel, SearchableModel):
     custom_fields = ObjectList(CustomField)
 
     def convert(self, person=None, company=None, opportunity=None):
+        """
+        person, company and opportunity can be models or plain dicts of the
+        conversion details, company can also be a company id.
+        """
+        response = api.requests.post(
+            self.id_url + "/convert",
+            json={'details': self._convert_details(
+                person, company, opportunity
+            )}
+        )
+
+        return utils.DataView(response)
+
+    @staticmethod
+    def _convert_details(person=None, company=None, opportunity=None):
         details = {}
 
-        if person:
+        if isinstance(person, dict):
+            details['person'] = person
+        elif person:
             details['person'] = {
                 'name': person.name,
                 'contact_type_id': person.contact_type_id,
                 'assignee_id': person.assignee_id,
             }
-        if company:
+        if isinstance(company, dict):
+            details['company'] = company
+        elif isinstance(company, Model):
             details['company'] = {
                 'id': company.id,
             }
-        if opportunity:
+        elif company:
+            details['company'] = {
+                'id': company,
+            }
+        if isinstance(opportunity, dict):
+            details['opportunity'] = opportunity
+        elif opportunity:
             details['opportunity'] = {
                 'name': opportunity.name,
                 'pipeline_id': opportunity.pipeline_id,
@@ -385,12 +684,70 @@ class Lead(CRUDModel, SearchableModel):
                 'assignee_id': opportunity.assignee_id,
             }
 
-        response = api.requests.post(
-            self.id_url + "/convert",
-            json={'details': details}
-        )
+        return details
 
-        return utils.Data(**response)
+    @classmethod
+    def convert_many(cls, leads, person=None, company=None, opportunity=None,
+                     workers=DEFAULT_WORKERS, retries=3, retry_delay=1.0):
+        """
+        Convert many leads concurrently without fetching them. leads are lead
+        ids or dicts with an 'id' and optional 'person', 'company' and
+        'opportunity' details overriding the ones given for every lead.
+        Rate limited conversions are retried with exponential backoff, other
+        errors (ex: server errors, after which the lead may have been
+        converted) are returned in the result of the lead.
+
+        Returns a list of ConversionResult, in the order of leads.
+        """
+        specs = [
+            dict(lead) if isinstance(lead, dict) else {'id': lead}
+            for lead in leads
+        ]
+
+        def convert(spec):
+            details = cls._convert_details(
+                spec.get('person', person),
+                spec.get('company', company),
+                spec.get('opportunity', opportunity),
+            )
+            attempt = 0
+            while True:
+                try:
+                    response = api.requests.post(
+                        "{}/{}/convert".format(cls._endpoint, spec['id']),
+                        json={'details': details}
+                    )
+                    break
+                except RETRYABLE_EXCEPTIONS as e:
+                    if attempt >= retries:
+                        return ConversionResult(
+                            spec['id'], None, None, None, e
+                        )
+                    time.sleep(
+                        deadline.current().timeout(retry_delay * 2 ** attempt)
+                    )
+                    attempt += 1
+                except Exception as e:
+                    # ex: connection errors, kept per lead so the others'
+                    # results are not lost
+                    return ConversionResult(spec['id'], None, None, None, e)
+
+            return ConversionResult(
+                spec['id'],
+                (response.get('person') or {}).get('id'),
+                (response.get('company') or {}).get('id'),
+                (response.get('opportunity') or {}).get('id'),
+                None,
+            )
+
+        if not specs:
+            return []
+        pool = ThreadPool(min(workers, len(specs)))
+        try:
+            return pool.map(scheduler.bind(convert), specs)
+        finally:
+            pool.close()
+            pool.join()
 
     @utils.lazy_property
     def assignee(self):
@@ -561,7 +918,9 @@ class Person(CRUDModel, SearchableModel):
         if self.contact_type_id:
             contact_types = api.cache.get_or_set(
                 "contact_types",
-                lambda: ContactType.list()
+                lambda: ContactType.populate_list(
+                    list_data=warmstart.reference_data('contact_types')
+                )
             )
             results = filter(
                 lambda x: x.id == self.contact_type_id,
@@ -577,13 +936,77 @@ class Person(CRUDModel, SearchableModel):
         Note: If a Person with the email is not found, this endpoint will
         return a 404 and thus this api wrapper will raise
         prosperworks.exceptions.ProsperWorksNotFoundRequest
+
+        Results, including misses, are cached in api.email_cache.
         """
-        data = api.requests.post(cls._endpoint + "/fetch_by_email", json={
-            'email': email
-        })
+        data = cls._fetch_data_by_email(email)
+        if data is None:
+            raise exceptions.ProsperWorksNotFoundRequest()
         person = cls()
         return person.populate(data=data)
 
+    @classmethod
+    def fetch_by_emails(cls, emails, workers=DEFAULT_WORKERS):
+        """
+        Look up many emails at once, returns a dict of email -> Person (or
+        None if not found). Duplicates are looked up once and cached results
+        are used without sending requests.
+
+        If the deadline passes (see prosperworks.deadline), the raised
+        exception's partial is the dict of the emails looked up.
+        """
+        emails = list(emails)
+        keys = {email: email.strip().lower() for email in emails}
+        unique = list(set(keys.values()))
+        found = {}
+
+        def fetch(email):
+            try:
+                return cls._fetch_data_by_email(email)
+            except exceptions.ProsperWorksCancelled as e:
+                return e
+
+        if unique:
+            pool = ThreadPool(min(workers, len(unique)))
+            try:
+                found = dict(zip(
+                    unique, pool.map(scheduler.bind(fetch), unique)
+                ))
+            finally:
+                pool.close()
+                pool.join()
+
+        people = {}
+        cancelled = None
+        for email in emails:
+            data = found[keys[email]]
+            if isinstance(data, exceptions.ProsperWorksCancelled):
+                cancelled = data
+            else:
+                people[email] = None if data is None \
+                    else cls().populate(data=data)
+        if cancelled is not None:
+            cancelled.partial = people
+            raise cancelled
+        return people
+
+    @classmethod
+    def _fetch_data_by_email(cls, email):
+        key = email.strip().lower()
+        data = api.email_cache.get(key)
+        if data is NOT_FOUND:
+            return None
+        if data is None:
+            try:
+                data = api.requests.post(
+                    cls._endpoint + "/fetch_by_email", json={'email': email}
+                )
+            except exceptions.ProsperWorksNotFoundRequest:
+                api.email_cache.set_not_found(key)
+                return None
+            api.email_cache.set(key, data)
+        return data
+
 
 class User(SearchableModel):
     _endpoint = "users"
@@ -733,7 +1156,9 @@ class PipelineStage(ListableModel):
         if self.pipeline_id:
             pipelines = api.cache.get_or_set(
                 "pipelines",
-                lambda: Pipeline.list()
+                lambda: Pipeline.populate_list(
+                    list_data=warmstart.reference_data('pipelines')
+                )
             )
             results = filter(lambda x: x.id == self.pipeline_id, pipelines)
             if len(results) == 1:
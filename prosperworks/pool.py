@@ -0,0 +1,44 @@
+"""
+Thread pool shared by the concurrent helpers (fan out searches, batched
+lookups...). All requests still go through api.requests and its rate limiter,
+the pool only bounds how many are in flight.
+
+Note: jobs running in the shared pool must not wait on other jobs of the
+shared pool, pass a dedicated pool instead.
+"""
+import threading
+from multiprocessing.pool import ThreadPool
+
+from . import deadline
+from .constants import SHARED_POOL_SIZE
+
+_pool = None
+_lock = threading.Lock()
+
+
+def shared_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPool(SHARED_POOL_SIZE)
+        return _pool
+
+
+def shutdown(wait=True, cancel=False):
+    """
+    Stop the shared pool, a new one is created on next use. With cancel,
+    every operation in flight is cancelled first (see deadline.shutdown), so
+    waiting for the pool's jobs doesn't take longer than their next request.
+    Operations started afterwards are not cancelled.
+    """
+    global _pool
+    if cancel:
+        deadline.shutdown()
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        if wait:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
@@ -0,0 +1,55 @@
+import collections
+import threading
+import time
+
+from . import deadline
+from .constants import RATE_LIMIT_PERIOD, RATE_LIMIT_REQUESTS
+
+
+class RateLimiter(object):
+    """
+    Sliding window limiter shared by every thread sending requests, so
+    concurrent work stays within the account quota instead of running into
+    ProsperWorksRateLimitExceeded.
+    """
+    def __init__(self, max_requests=RATE_LIMIT_REQUESTS,
+                 period=RATE_LIMIT_PERIOD):
+        self.max_requests = max_requests
+        self.period = period
+        self._sent = collections.deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._sent and now - self._sent[0] >= self.period:
+            self._sent.popleft()
+
+    def try_acquire(self):
+        """Take a slot without blocking, returns False if none are free."""
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if len(self._sent) < self.max_requests:
+                self._sent.append(now)
+                return True
+            return False
+
+    def wait_time(self):
+        """Seconds until the next slot frees up (0 if one is free now)."""
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if len(self._sent) < self.max_requests:
+                return 0
+            return self._sent[0] + self.period - now
+
+    def acquire(self):
+        context = deadline.current()
+        while not self.try_acquire():
+            context.check()
+            time.sleep(context.timeout(max(self.wait_time(), 0.01)))
+
+    @property
+    def remaining(self):
+        with self._lock:
+            self._expire(time.time())
+            return self.max_requests - len(self._sent)
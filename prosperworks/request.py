@@ -1,21 +1,99 @@
-import requests
+import copy
+import json
+import threading
+import time
 
 from . import constants
+from . import deadline
 from . import exceptions
+from .cache import LRUCache
+from .metrics import Metrics
+from .stream import ResponseIterator
+
+# the requests module, only imported when the first request is sent as it is
+# slow to import (short lived workers often never send one)
+requests = None
+
+
+def transport():
+    """The requests module, imported on first use."""
+    global requests
+    if requests is None:
+        import requests as requests_module
+        requests = requests_module
+    return requests
+
+
+class _InFlight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
 
 
 class Request(object):
     _headers = None
+    _session = None
+
+    def __init__(self, access_token, email, api_version, rate_limiter=None,
+                 metrics=None, coalesce=False, micro_cache_window=0,
+                 scheduler=None, concurrency=None, timeout=None, breaker=None,
+                 serve_stale=False, compression=None):
+        """
+        compression: a prosperworks.compression.Compression compressing
+        large request bodies and negotiating compressed responses.
+        timeout: seconds before giving up on a response (None waits
+        forever).
+        breaker: a prosperworks.breaker.CircuitBreaker failing fast while an
+        endpoint keeps failing.
+        serve_stale: while a circuit is open, answer GETs with the last
+        response seen for them instead of raising ProsperWorksCircuitOpen.
+        scheduler: a prosperworks.scheduler.Scheduler handing out the rate
+        limiter slots by priority (used instead of rate_limiter).
+        concurrency: a prosperworks.concurrency.AdaptiveConcurrency bounding
+        the requests in flight per endpoint.
+        coalesce: identical GETs sent at the same time from several threads
+        share a single request and response.
+        micro_cache_window: seconds a GET response is reused for identical
+        GETs (0 disables it), for the last MICRO_CACHE_SIZE GETs. PUT/DELETE
+        on an endpoint drop its entries.
 
-    def __init__(self, access_token, email, api_version):
+        Coalesced and micro cached responses are copies, so callers can't see
+        each other's changes.
+        """
         self.access_token = access_token
         self.email = email
         self.api_version = api_version
+        self.rate_limiter = rate_limiter
+        self.scheduler = scheduler
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.breaker = breaker
+        self.stale = LRUCache() if serve_stale else None
+        self.compression = compression
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.coalesce = coalesce
+        self.micro_cache_window = micro_cache_window
+        self._in_flight = {}
+        self._micro_cache = LRUCache(constants.MICRO_CACHE_SIZE)
+        self._lock = threading.Lock()
 
     @property
     def base_url(self):
         return constants.BASE_URL.format(version=self.api_version)
 
+    @property
+    def session(self):
+        """
+        The requests Session connections are kept alive in, created with the
+        first request.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = transport().Session()
+        return self._session
+
     @property
     def headers(self):
         if not self._headers:
@@ -25,10 +103,25 @@ class Request(object):
                 constants.APPLICATION_HEADER: constants.APPLICATION,
                 constants.EMAIL_HEADER: self.email,
             }
+            if self.compression is not None:
+                self._headers['Accept-Encoding'] = \
+                    self.compression.accept_encoding
         return self._headers
 
-    def _check_response(self, response):
-        if not response.status_code == requests.codes.ok:
+    def _received(self, response, size):
+        """
+        Count the body bytes of a response: as received (compressed) and
+        once decoded.
+        """
+        try:
+            received = response.raw.tell()
+        except AttributeError:
+            received = None
+        self.metrics.incr('bytes.received', received or size)
+        self.metrics.incr('bytes.received_decoded', size)
+
+    def _check_response(self, response, raw=False, stream=False, done=None):
+        if not response.status_code == transport().codes.ok:
             exc_class = exceptions.ERROR_CODE_TO_EXCEPTION.get(
                 response.status_code, exceptions.ProsperWorksServerException(
                     u"Unknown error", response.status_code,
@@ -39,6 +132,16 @@ class Request(object):
                 raise exc_class(message=data['message'])
             except ValueError:
                 raise exc_class
+        elif raw:
+            return response.content
+        elif stream:
+            def finished(size, error):
+                self._received(response, size)
+                if done is not None:
+                    done(error)
+            return ResponseIterator(
+                response, done=finished, check=deadline.current().check,
+            )
         else:
             try:
                 return response.json()
@@ -49,7 +152,113 @@ class Request(object):
         if not self.access_token or not self.email:
             raise exceptions.NotConfiguredException()
 
-    def _request(self, endpoint, method, data_kw_name, data=None):
+    @staticmethod
+    def _key(url, kw):
+        return url, json.dumps(kw, sort_keys=True, default=str)
+
+    def _send(self, url, method, kw, raw=False, stream=False):
+        deadline.check()
+        endpoint = url[len(self.base_url):]
+        circuit = None
+        if self.breaker is not None:
+            try:
+                circuit = self.breaker.before(endpoint)
+            except exceptions.ProsperWorksCircuitOpen:
+                if method == 'get' and self.stale is not None:
+                    response = self.stale.get(self._key(url, kw))
+                    if response is not None:
+                        self.metrics.incr('breaker.stale')
+                        return response
+                raise
+
+        start = time.time()
+        token = None
+        error = None
+        sent = False
+        streaming = False
+        try:
+            # the in-flight slot first: a rate slot taken while waiting for
+            # one would be spent, and break the priority order
+            if self.concurrency is not None:
+                token = self.concurrency.acquire(endpoint)
+            if self.scheduler is not None:
+                self.scheduler.acquire()
+            elif self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if token is not None:
+                token = self.concurrency.started(token)
+            start = time.time()
+            sent = True
+            # a streamed body is still to be read: the request only ends
+            # once it is (or once reading it failed)
+            response = self._transmit(
+                url, method, kw, raw, stream, done=lambda error: self._finish(
+                    circuit, token, start, True, error
+                ),
+            )
+            streaming = stream
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if not streaming:
+                self._finish(circuit, token, start, sent, error)
+
+        if method == 'get' and self.stale is not None:
+            self.stale.set(self._key(url, kw), response)
+        return response
+
+    def _finish(self, circuit, token, start, sent, error):
+        """Record the outcome of a request with the limiter and breaker."""
+        if token is not None:
+            self.concurrency.release(token, error)
+        if circuit is None:
+            return
+        if sent and not isinstance(error, exceptions.ProsperWorksCancelled):
+            self.breaker.record(circuit, time.time() - start, error)
+        else:
+            # cancelled, or the deadline passed before a response: the api
+            # is not to blame
+            self.breaker.release(circuit)
+
+    def _transmit(self, url, method, kw, raw, stream=False, done=None):
+        context = deadline.current()
+        # the deadline may have passed while waiting for quota
+        context.check()
+        self.metrics.incr('requests')
+        self.metrics.incr('requests.' + method)
+        timeout = context.timeout(self.timeout)
+        if timeout is not None:
+            kw = dict(kw, timeout=timeout)
+        if stream:
+            kw = dict(kw, stream=True)
+        headers = self.headers
+        if 'json' in kw:
+            # bodies are encoded here so they can be compressed and counted
+            kw = dict(kw)
+            body = json.dumps(kw.pop('json')).encode('utf-8')
+            self.metrics.incr('bytes.sent_decoded', len(body))
+            if self.compression is not None:
+                body, encoding = self.compression.encode(body)
+                if encoding is not None:
+                    headers = dict(headers, **{'Content-Encoding': encoding})
+                    self.metrics.incr('requests.compressed')
+            self.metrics.incr('bytes.sent', len(body))
+            kw['data'] = body
+        try:
+            response = getattr(self.session, method)(
+                url, headers=headers, **kw
+            )
+        except Exception:
+            # a timeout (or any error) once the deadline passed
+            context.check()
+            raise
+        if not stream or response.status_code != transport().codes.ok:
+            self._received(response, len(response.content))
+        return self._check_response(response, raw, stream, done)
+
+    def _request(self, endpoint, method, data_kw_name, data=None, raw=False,
+                 stream=False):
         self._check_token_and_email()
         if data is None:
             data = {}
@@ -60,8 +269,82 @@ class Request(object):
         else:
             kw = {data_kw_name: data}
 
-        response = getattr(requests, method)(url, headers=self.headers, **kw)
-        return self._check_response(response)
+        if method != 'get':
+            if self._micro_cache:
+                self.invalidate(endpoint)
+            return self._send(url, method, kw, raw, stream)
+        if not self.coalesce and not self.micro_cache_window:
+            return self._send(url, method, kw)
+        return self._shared_get(url, kw)
+
+    def _shared_get(self, url, kw):
+        key = self._key(url, kw)
+        while True:
+            with self._lock:
+                cached = self._micro_cache.get(key)
+                if cached is not None:
+                    if time.time() < cached[1]:
+                        self.metrics.incr('micro_cache_hits')
+                        return copy.deepcopy(cached[0])
+                    self._micro_cache.delete(key)
+
+                call = self._in_flight.get(key) if self.coalesce else None
+                leader = call is None
+                if leader:
+                    call = _InFlight()
+                    if self.coalesce:
+                        self._in_flight[key] = call
+            if leader:
+                break
+
+            self.metrics.incr('coalesced')
+            context = deadline.current()
+            while not call.done.wait(context.timeout(None)):
+                context.check()
+            if isinstance(call.error, exceptions.ProsperWorksCancelled):
+                # the leader's deadline or cancellation, not ours: send the
+                # request again (or follow whoever does)
+                continue
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.response)
+
+        try:
+            response = self._send(url, 'get', kw)
+            # the leader gets the response, others a copy of this one
+            call.response = copy.deepcopy(response)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if call.error is None and self.micro_cache_window:
+                    self._micro_cache.set(key, (
+                        call.response, time.time() + self.micro_cache_window
+                    ))
+            call.done.set()
+        return response
+
+    def invalidate(self, endpoint=None):
+        """
+        Drop micro cached and stale responses of an endpoint (ex:
+        "companies/1"), or all of them.
+        """
+        with self._lock:
+            if endpoint is None:
+                self._micro_cache.clear()
+                if self.stale is not None:
+                    self.stale.clear()
+                return
+            url = self.base_url + endpoint
+            for key in self._micro_cache.keys():
+                if key[0] == url:
+                    self._micro_cache.delete(key)
+        if self.stale is not None:
+            for key in self.stale.keys():
+                if key[0] == url:
+                    self.stale.delete(key)
 
     def get(self, endpoint, params=None):
         return self._request(endpoint, 'get', 'params', data=params)
@@ -69,6 +352,25 @@ class Request(object):
     def post(self, endpoint, json=None):
         return self._request(endpoint, 'post', 'json', data=json)
 
+    def post_raw(self, endpoint, json=None):
+        """
+        Like post, but returns the undecoded response body so it can be
+        decoded somewhere else (ex: in another process).
+        """
+        return self._request(endpoint, 'post', 'json', data=json, raw=True)
+
+    def post_stream(self, endpoint, json=None):
+        """
+        Like post for endpoints returning a json array (ex: searches), but
+        returns an iterator yielding every element as soon as it has been
+        received, without loading the whole body. The request (its
+        connection and in-flight slot) ends once the iterator is exhausted or
+        closed.
+        """
+        return self._request(
+            endpoint, 'post', 'json', data=json, stream=True,
+        )
+
     def delete(self, endpoint, kwargs=None):
         return self._request(endpoint, 'delete', 'kwargs', data=kwargs)
 
@@ -0,0 +1,191 @@
+"""
+Priority aware scheduling of requests within the account quota.
+
+Every request sent by api.requests takes a slot from the scheduler, which
+hands out the rate limiter slots by priority class:
+- interactive requests (ex: lookups for a user waiting on a screen) jump
+  ahead of everything else,
+- normal requests (the default) come next,
+- batch requests only get the capacity nobody else asks for.
+Each class can also have a reserved share of the quota, which the other
+classes can't use, so a long sync can't use up the whole window. Within a
+class, flows (by default the sending thread) are served round robin.
+
+Ex:
+>>> from prosperworks.scheduler import priority, BATCH, INTERACTIVE
+>>> with priority(BATCH, flow='nightly-sync'):
+...     sync_everything()
+>>> with priority(INTERACTIVE):
+...     Person.fetch_by_email(email)
+"""
+import collections
+import contextlib
+import threading
+import time
+
+from . import deadline
+from . import exceptions
+from .constants import SCHEDULER_SHARES
+
+INTERACTIVE = 'interactive'
+NORMAL = 'normal'
+BATCH = 'batch'
+# highest priority first
+PRIORITIES = (INTERACTIVE, NORMAL, BATCH)
+
+_context = threading.local()
+
+
+def current_priority():
+    """The (priority, flow) requests of the current thread are sent with."""
+    return (
+        getattr(_context, 'priority', NORMAL), getattr(_context, 'flow', None)
+    )
+
+
+@contextlib.contextmanager
+def priority(name, flow=None):
+    """
+    Send the requests of the current thread with the priority name. flow
+    names the work for round robin within the class (defaults to the
+    thread).
+    """
+    if name not in PRIORITIES:
+        raise exceptions.ProsperWorksApplicationException(
+            u"%s is not a valid priority." % name
+        )
+    previous = current_priority()
+    _context.priority, _context.flow = name, flow
+    try:
+        yield
+    finally:
+        _context.priority, _context.flow = previous
+
+
+def bind(func, with_deadline=True):
+    """
+    Wrap func so it runs with the priority (and the deadline, see
+    prosperworks.deadline) of the calling thread, for work handed to pool
+    threads. with_deadline=False only keeps the priority, for long lived
+    bindings outliving the deadline.
+    """
+    name, flow = current_priority()
+    if flow is None:
+        flow = threading.current_thread().ident
+    if with_deadline:
+        func = deadline.bind(func)
+
+    def bound(*args, **kwargs):
+        with priority(name, flow):
+            return func(*args, **kwargs)
+    return bound
+
+
+class Scheduler(object):
+    def __init__(self, rate_limiter, shares=None):
+        """
+        shares maps priority classes to the fraction of the quota reserved
+        for them (ex: {'interactive': 0.1}).
+        """
+        shares = SCHEDULER_SHARES if shares is None else shares
+        if set(shares) - set(PRIORITIES) or sum(shares.values()) > 1:
+            raise exceptions.ProsperWorksApplicationException(
+                u"Invalid scheduler shares %r." % (shares,)
+            )
+        self.rate_limiter = rate_limiter
+        self.reserved = {
+            name: int(shares.get(name, 0) * rate_limiter.max_requests)
+            for name in PRIORITIES
+        }
+        self._sent = {name: collections.deque() for name in PRIORITIES}
+        # priority -> flow -> tickets, flows are kept in round robin order
+        self._queues = {
+            name: collections.OrderedDict() for name in PRIORITIES
+        }
+        self._condition = threading.Condition()
+
+    def _expire(self, now):
+        period = self.rate_limiter.period
+        for sent in self._sent.values():
+            while sent and now - sent[0] >= period:
+                sent.popleft()
+
+    def _allowed(self, name):
+        """Whether name can send without using another class' reserve."""
+        free = self.rate_limiter.max_requests - sum(
+            len(sent) for sent in self._sent.values()
+        )
+        held = sum(
+            max(0, self.reserved[other] - len(self._sent[other]))
+            for other in PRIORITIES if other != name
+        )
+        return free - held > 0
+
+    def _next(self):
+        """The ticket to serve next: first flow of the best allowed class."""
+        for name in PRIORITIES:
+            queue = self._queues[name]
+            if queue and self._allowed(name):
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _dequeue(self, name, flow, ticket):
+        queue = self._queues[name]
+        tickets = queue.pop(flow)
+        tickets.remove(ticket)
+        if tickets:
+            # back of the round robin
+            queue[flow] = tickets
+
+    def _wait_time(self, now):
+        oldest = [sent[0] for sent in self._sent.values() if sent]
+        wait = self.rate_limiter.wait_time()
+        if oldest:
+            wait = max(wait, min(oldest) + self.rate_limiter.period - now)
+        return min(max(wait, 0.01), 1.0)
+
+    def acquire(self):
+        """
+        Block until the current thread may send a request, or raise once its
+        deadline passes.
+        """
+        context = deadline.current()
+        name, flow = current_priority()
+        if flow is None:
+            flow = threading.current_thread().ident
+        ticket = object()
+        with self._condition:
+            self._queues[name].setdefault(flow, collections.deque()).append(
+                ticket
+            )
+            try:
+                while True:
+                    context.check()
+                    now = time.time()
+                    self._expire(now)
+                    if self._next() is ticket and \
+                            self.rate_limiter.try_acquire():
+                        self._sent[name].append(now)
+                        return
+                    self._condition.wait(
+                        context.timeout(self._wait_time(now))
+                    )
+            finally:
+                self._dequeue(name, flow, ticket)
+                self._condition.notify_all()
+
+    @property
+    def waiting(self):
+        """Number of requests waiting, by priority."""
+        with self._condition:
+            return {
+                name: sum(len(tickets) for tickets in queue.values())
+                for name, queue in self._queues.items()
+            }
+
+    @property
+    def sent(self):
+        """Requests sent within the rate limit period, by priority."""
+        with self._condition:
+            self._expire(time.time())
+            return {name: len(sent) for name, sent in self._sent.items()}
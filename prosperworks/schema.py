@@ -0,0 +1,256 @@
+"""
+Declarative schemas validating and coercing create/search payloads locally,
+so bad requests are rejected before any network I/O instead of coming back
+as 422 responses.
+
+Every model gets a _create_schema and a _search_schema built from its
+_create_fields and _search_fields. Field types are derived from the field
+names (ex: *_ids are lists of integers, *_date are timestamps) and can be
+overridden per model with _field_types.
+"""
+from datetime import date, datetime
+
+from . import exceptions
+from . import utils
+
+integer_types = (int, long)
+number_types = (int, long, float)
+string_types = (str, unicode)
+
+
+class Invalid(ValueError):
+    pass
+
+
+class FieldType(object):
+    description = u"a value"
+
+    def coerce(self, value):
+        return value
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        try:
+            return self.coerce(value)
+        except (TypeError, ValueError):
+            raise Invalid(self.description)
+
+
+class Integer(FieldType):
+    description = u"an integer"
+
+    def coerce(self, value):
+        if isinstance(value, bool):
+            raise ValueError(value)
+        if isinstance(value, integer_types):
+            return value
+        if isinstance(value, string_types) and value.strip().isdigit():
+            return int(value)
+        raise ValueError(value)
+
+
+class Number(FieldType):
+    description = u"a number"
+
+    def coerce(self, value):
+        if isinstance(value, bool):
+            raise ValueError(value)
+        if isinstance(value, number_types):
+            return value
+        if isinstance(value, string_types):
+            return float(value)
+        raise ValueError(value)
+
+
+class String(FieldType):
+    description = u"a string"
+
+    def coerce(self, value):
+        if not isinstance(value, string_types):
+            raise ValueError(value)
+        return value
+
+
+class Boolean(FieldType):
+    description = u"a boolean"
+
+    def coerce(self, value):
+        if not isinstance(value, bool):
+            raise ValueError(value)
+        return value
+
+
+class Timestamp(FieldType):
+    """Epoch seconds, datetimes and dates are converted."""
+    description = u"a timestamp or a datetime"
+
+    def coerce(self, value):
+        if isinstance(value, datetime):
+            return utils.timestamp(value)
+        if isinstance(value, date):
+            return utils.timestamp(
+                datetime(value.year, value.month, value.day)
+            )
+        return Integer().coerce(
+            int(value) if isinstance(value, float) else value
+        )
+
+
+class DateString(FieldType):
+    """Dates sent as "MM/DD/YYYY" (ex: Opportunity.close_date)."""
+    description = u"a date or a MM/DD/YYYY string"
+
+    def coerce(self, value):
+        if isinstance(value, (date, datetime)):
+            return value.strftime('%m/%d/%Y')
+        if isinstance(value, string_types):
+            datetime.strptime(value, '%m/%d/%Y')
+            return value
+        raise ValueError(value)
+
+
+class Choice(FieldType):
+    def __init__(self, *choices):
+        self.choices = frozenset(choices)
+        self.description = u"one of %s" % u', '.join(sorted(choices))
+
+    def coerce(self, value):
+        if value not in self.choices:
+            raise ValueError(value)
+        return value
+
+
+class ListOf(FieldType):
+    def __init__(self, item_type):
+        self.item_type = item_type
+        self.description = u"a list of %ss" % (
+            item_type.description.split(u' ', 1)[-1]
+        )
+
+    def coerce(self, value):
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            raise ValueError(value)
+        coerce = self.item_type.coerce
+        return [coerce(item) for item in value]
+
+
+class Nested(FieldType):
+    """Dicts or lists sent as is, models (ex: an Address) are serialized."""
+    description = u"a dict, a list or a model"
+
+    def coerce(self, value):
+        if hasattr(value, 'serialize'):
+            return value.serialize()
+        if isinstance(value, list):
+            return [
+                item.serialize() if hasattr(item, 'serialize') else item
+                for item in value
+            ]
+        if not isinstance(value, dict):
+            raise ValueError(value)
+        return value
+
+
+class Any(FieldType):
+    pass
+
+
+INTEGER = Integer()
+TIMESTAMP = Timestamp()
+STRING = String()
+NUMBER = Number()
+NESTED = Nested()
+ANY = Any()
+
+FIELD_TYPES = {
+    'page_number': INTEGER,
+    'page_size': INTEGER,
+    'age': INTEGER,
+    'sort_by': STRING,
+    'sort_direction': Choice('asc', 'desc'),
+    'tags': ListOf(STRING),
+    'statuses': ListOf(STRING),
+    'priorities': ListOf(STRING),
+    'name': STRING,
+    'title': STRING,
+    'details': STRING,
+    'city': STRING,
+    'state': STRING,
+    'postal_code': STRING,
+    'country': STRING,
+    'company_name': STRING,
+    'email_domain': STRING,
+    'status': STRING,
+    'priority': STRING,
+    'close_date': DateString(),
+    'monetary_value': NUMBER,
+    'minimum_monetary_value': NUMBER,
+    'maximum_monetary_value': NUMBER,
+    'win_probability': NUMBER,
+    'address': NESTED,
+    'email': NESTED,
+    'emails': NESTED,
+    'phone_numbers': NESTED,
+    'socials': NESTED,
+    'websites': NESTED,
+    'custom_fields': NESTED,
+    'related_resource': NESTED,
+}
+
+
+def field_type(name):
+    """The type of a field, from FIELD_TYPES or its name."""
+    if name in FIELD_TYPES:
+        return FIELD_TYPES[name]
+    if name.endswith('_ids'):
+        return ListOf(INTEGER)
+    if name.endswith('_id') or name.endswith('_count'):
+        return INTEGER
+    if name.endswith('_date') or name.startswith('date_'):
+        return TIMESTAMP
+    return ANY
+
+
+class Schema(object):
+    def __init__(self, fields, field_name=''):
+        """
+        fields maps field names to FieldType instances, field_name names the
+        kind of payload in error messages (ex: 'search').
+        """
+        self.fields = dict(fields)
+        self.field_name = field_name
+
+    @classmethod
+    def for_fields(cls, names, field_types=None, field_name=''):
+        field_types = field_types or {}
+        return cls({
+            name: field_types.get(name) or field_type(name)
+            for name in names
+        }, field_name=field_name)
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def build(self, payload):
+        """
+        Validate and coerce payload in one pass, returning the json body.
+        Raises ProsperWorksValidationError listing every invalid field.
+        """
+        fields = self.fields
+        body = {}
+        errors = []
+        for key, value in payload.items():
+            coerce = fields.get(key)
+            if coerce is None:
+                errors.append(
+                    u"%s is not a valid %s field." % (key, self.field_name)
+                )
+                continue
+            try:
+                body[key] = coerce(value)
+            except Invalid as e:
+                errors.append(u"%s must be %s, got %r." % (key, e, value))
+        if errors:
+            raise exceptions.ProsperWorksValidationError(errors)
+        return body
@@ -0,0 +1,157 @@
+"""
+Content hash snapshots of records, used to find what changed between syncs
+and to skip updates that would not change anything.
+
+Ex:
+>>> from prosperworks import api
+>>> from prosperworks.snapshot import Snapshot
+>>> from prosperworks.models import Company
+>>> before = Snapshot.load('/tmp/companies.snapshot')
+>>> after = Snapshot()
+>>> for page_number, records in Company.iter_pages():
+...     after.add_records(Company, records)
+>>> diff = before.diff(after)
+>>> print diff.changed, diff.added, diff.removed
+>>> after.save('/tmp/companies.snapshot')
+
+Setting api.snapshot makes every populated model record its hash, and
+CRUDModel.update then skips the PUT when the content is unchanged:
+>>> api.snapshot = Snapshot()
+"""
+import collections
+import hashlib
+import json
+
+string_types = (str, type(u''))
+
+SnapshotDiff = collections.namedtuple(
+    'SnapshotDiff', ('added', 'changed', 'removed')
+)
+
+
+def content_hash(data):
+    """Stable hash of a json serializable value, independent of key order."""
+    return hashlib.sha1(json.dumps(
+        data, sort_keys=True, separators=(',', ':'), default=str
+    ).encode('utf-8')).hexdigest()
+
+
+def _name(model):
+    return model if isinstance(model, string_types) else model._endpoint
+
+
+class Snapshot(object):
+    def __init__(self, field_groups=None):
+        """
+        field_groups optionally maps a group name to a tuple of fields, a
+        hash is then also kept per group (ex: {'address': ('address',),
+        'contact': ('emails', 'phone_numbers')}).
+        """
+        self.field_groups = field_groups or {}
+        self.hashes = {}
+        self.group_hashes = {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, key):
+        return key in self.hashes
+
+    def _group_hashes(self, data):
+        return {
+            group: content_hash([data.get(field) for field in fields])
+            for group, fields in self.field_groups.items()
+        }
+
+    def add(self, model, id, data):
+        key = (_name(model), id)
+        self.hashes[key] = content_hash(data)
+        if self.field_groups:
+            self.group_hashes[key] = self._group_hashes(data)
+
+    def add_records(self, model, records):
+        id_field = model._id_field
+        for record in records:
+            self.add(model, record[id_field], record)
+
+    def add_model(self, obj):
+        self.add(obj, getattr(obj, obj._id_field), obj.serialize())
+
+    def discard(self, model, id):
+        key = (_name(model), id)
+        self.hashes.pop(key, None)
+        self.group_hashes.pop(key, None)
+
+    def is_unchanged(self, model, id, data):
+        """
+        True if data matches the recorded content. A partial payload can only
+        be matched through field groups it fully covers.
+        """
+        key = (_name(model), id)
+        if key not in self.hashes:
+            return False
+        if content_hash(data) == self.hashes[key]:
+            return True
+
+        recorded = self.group_hashes.get(key)
+        if not recorded:
+            return False
+        fields = set(data)
+        covered = set()
+        for group, group_fields in self.field_groups.items():
+            if not fields.issuperset(group_fields):
+                continue
+            if content_hash([data[field] for field in group_fields]) != \
+                    recorded[group]:
+                return False
+            covered.update(group_fields)
+        return bool(covered) and covered >= fields
+
+    def diff(self, other):
+        """Keys added, changed and removed going from self to other."""
+        previous = self.hashes
+        added, changed = set(), set()
+        for key, value in other.hashes.items():
+            old_value = previous.get(key)
+            if old_value is None:
+                added.add(key)
+            elif old_value != value:
+                changed.add(key)
+        removed = set(
+            key for key in previous if key not in other.hashes
+        )
+        return SnapshotDiff(added, changed, removed)
+
+    def changed_groups(self, other, key):
+        """Names of the field groups that differ for key between snapshots."""
+        old_groups = self.group_hashes.get(key, {})
+        new_groups = other.group_hashes.get(key, {})
+        return set(
+            group for group in self.field_groups
+            if old_groups.get(group) != new_groups.get(group)
+        )
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'field_groups': self.field_groups,
+                'records': [
+                    [name, id, value, self.group_hashes.get((name, id))]
+                    for (name, id), value in self.hashes.items()
+                ],
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        snapshot = cls(field_groups={
+            group: tuple(fields)
+            for group, fields in data['field_groups'].items()
+        })
+        for name, id, value, groups in data['records']:
+            key = (name, id)
+            snapshot.hashes[key] = value
+            if groups:
+                snapshot.group_hashes[key] = groups
+        return snapshot
@@ -0,0 +1,148 @@
+"""
+Incremental parsing of json arrays, yielding every element as soon as it has
+been received instead of decoding the whole body at once. Search pages are
+read this way by Request.post_stream, so at most one record (plus the read
+buffer) is held in memory.
+"""
+import codecs
+import json
+
+from . import exceptions
+
+WHITESPACE = u' \t\n\r'
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+def _skip(buffer, position, characters=WHITESPACE):
+    while position < len(buffer) and buffer[position] in characters:
+        position += 1
+    return position
+
+
+def iter_json_array(chunks):
+    """
+    Yield the elements of the json array whose utf-8 encoded text is split
+    in chunks (ex: response.iter_content()). Raises ProsperWorksBadJson if
+    the text is not a json array.
+    """
+    decode = codecs.getincrementaldecoder('utf-8')().decode
+    chunks = iter(chunks)
+    buffer = u''
+    position = 0
+    eof = False
+    started = False
+    # whether an element must come next (after a separator), as opposed to
+    # an element or the end of the array (after the opening bracket)
+    required = False
+    # how much the buffer must grow before retrying an incomplete element,
+    # doubled on every retry so large elements are not parsed over and over
+    needed = 0
+
+    while True:
+        position = _skip(buffer, position)
+        if position < len(buffer) and (
+                eof or len(buffer) - position >= needed):
+            if not started:
+                if buffer[position] != u'[':
+                    raise exceptions.ProsperWorksBadJson()
+                started = True
+                position += 1
+                continue
+            if buffer[position] == u',' or (
+                    required and buffer[position] == u']'):
+                raise exceptions.ProsperWorksBadJson()
+            if buffer[position] == u']':
+                return
+            try:
+                element, end = _decoder.raw_decode(buffer, position)
+                end = _skip(buffer, end)
+            except ValueError:
+                end = None
+            # only a separator tells an element is complete: the end of a
+            # buffer may cut a number (ex: "1." is decoded as 1)
+            if end is not None and end < len(buffer) and \
+                    buffer[end] in u',]':
+                yield element
+                if buffer[end] == u']':
+                    return
+                position, needed, required = end + 1, 0, True
+                continue
+            if eof:
+                raise exceptions.ProsperWorksBadJson()
+            needed = max(needed * 2, len(buffer) - position + 1)
+        elif eof:
+            raise exceptions.ProsperWorksBadJson()
+
+        chunk = next(chunks, None)
+        # the parsed elements are only dropped when reading, not after each
+        # element, so a chunk holding many records is not copied many times
+        buffer, position = buffer[position:], 0
+        if chunk is None:
+            eof = True
+            buffer += decode(b'', True)
+        else:
+            buffer += decode(chunk)
+
+
+def _counted_chunks(response, chunk_size, check, size):
+    for chunk in response.iter_content(chunk_size):
+        if check is not None:
+            check()
+        size[0] += len(chunk)
+        yield chunk
+
+
+class ResponseIterator(object):
+    """
+    Iterator over the elements of the json array body of a response sent
+    with stream=True. The connection is released once the iterator is
+    exhausted, closed or garbage collected, even if it was never started,
+    then done (if given) is called with the number of body bytes read and
+    the error which stopped reading (None if there was none). check (if
+    given) is called before reading every chunk, ex: to stop at a deadline.
+    """
+    def __init__(self, response, chunk_size=CHUNK_SIZE, done=None,
+                 check=None):
+        self._response = response
+        self._done = done
+        # a list shared with the chunks generator, which must not reference
+        # the iterator (__del__ would keep the cycle from being collected)
+        self._size = [0]
+        self._elements = iter_json_array(
+            _counted_chunks(response, chunk_size, check, self._size)
+        )
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self._released:
+            raise StopIteration
+        try:
+            return next(self._elements)
+        except StopIteration:
+            self._release(None)
+            raise
+        except Exception as e:
+            self._release(e)
+            raise
+
+    __next__ = next
+
+    def close(self):
+        self._release(None)
+
+    def __del__(self):
+        self._release(None)
+
+    def _release(self, error):
+        if self._released:
+            return
+        self._released = True
+        self._elements.close()
+        self._response.close()
+        if self._done is not None:
+            self._done(self._size[0], error)
@@ -1,3 +1,4 @@
+import types
 from datetime import datetime
 
 import exceptions
@@ -19,6 +20,24 @@ def timestamp(dt, convert_to_int=True):
     return int(stamp) if convert_to_int else stamp
 
 
+def class_fields(cls):
+    """
+    The public data fields declared on a class and its bases, as a dict of
+    name -> class level default. Methods and properties are left out.
+    """
+    fields = {}
+    for klass in reversed(cls.__mro__):
+        for key, value in vars(klass).items():
+            if key.startswith('_'):
+                continue
+            if isinstance(value, (staticmethod, classmethod, property,
+                                  lazy_property, types.FunctionType)):
+                fields.pop(key, None)
+            else:
+                fields[key] = value
+    return fields
+
+
 class QuickRepr(object):
     def get_fields(self):
         return [
@@ -54,6 +73,82 @@ class Data(QuickRepr):
         return self
 
 
+class DataView(object):
+    """
+    Read only view to access a dict as an object. Unlike Data, nothing is
+    copied: attributes resolve against the wrapped dict on access and nested
+    dicts are only wrapped when they are touched.
+    """
+    __slots__ = ('_data', '_children')
+
+    def __init__(self, data=None):
+        object.__setattr__(self, '_data', {} if data is None else data)
+        object.__setattr__(self, '_children', None)
+
+    def __getattr__(self, key):
+        if key.startswith('_'):
+            raise AttributeError(key)
+        try:
+            value = self._data[key]
+        except KeyError:
+            raise AttributeError(key)
+        if isinstance(value, dict):
+            if self._children is None:
+                object.__setattr__(self, '_children', {})
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = DataView(value)
+            return child
+        return value
+
+    def __setattr__(self, key, value):
+        raise AttributeError(u"%s is read only." % self.__class__.__name__)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, DataView):
+            return self._data == other._data
+        return NotImplemented
+
+    def __ne__(self, other):
+        return not self == other
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def keys(self):
+        return self._data.keys()
+
+    def serialize(self):
+        return self._data
+
+    def __getstate__(self):
+        return self._data
+
+    def __setstate__(self, data):
+        DataView.__init__(self, data)
+
+    def __unicode__(self):
+        return repr(self)
+
+    def __repr__(self):
+        return u"<%s: %s>" % (
+            self.__class__.__name__,
+            u', '.join(
+                u"%s=%s" % (key, str(value))
+                for key, value in self._data.items()
+            )
+        )
+
+
 class lazy_property(object):
     """
     Decorator to lazy load FK-like attributes. This means the request won't be
@@ -0,0 +1,119 @@
+"""
+Warm-start snapshots of reference data for short lived workers.
+
+Pipelines, stages, contact types, users and custom field definitions rarely
+change. They can be saved to a JSON file once (ex: at deploy time) and put
+in api.cache when prosperworks.api is imported, instead of being fetched
+again by every invocation. The file is read when the PROSPERWORKS_WARM_START
+environment variable points to it, or with load().
+
+$ python -m prosperworks.warmstart /var/lib/app/reference.json \
+    --key KEY --email EMAIL
+"""
+import json
+import os
+import time
+
+ENV_VAR = 'PROSPERWORKS_WARM_START'
+REFERENCE_ENDPOINTS = (
+    'pipelines',
+    'pipeline_stages',
+    'contact_types',
+    'users',
+    'custom_field_definitions',
+)
+
+# raw reference data loaded from the warm start file, name -> list of dicts
+data = {}
+
+
+def cache_key(name):
+    return "%s_raw" % name
+
+
+def _fetch(name):
+    from . import api
+    if name == 'users':
+        # users are only listed through a (paginated) search
+        from .models import User
+        return [
+            record for _, records in User.iter_pages() for record in records
+        ]
+    return api.requests.get(name)
+
+
+def reference_data(name):
+    """
+    The raw list of a reference endpoint (ex: 'pipelines'), from api.cache
+    (where warm start data is put) or the api.
+    """
+    from . import api
+    return api.cache.get_or_set(cache_key(name), lambda: _fetch(name))
+
+
+def apply(cache):
+    """Put the loaded warm start data in cache."""
+    for name, records in data.items():
+        cache.set(cache_key(name), records)
+
+
+def load(path, max_age=None, cache=None):
+    """
+    Load a warm start file into cache (api.cache by default). Files older
+    than max_age seconds are ignored. Returns whether the file was used.
+    """
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (IOError, ValueError):
+        return False
+    if max_age is not None and time.time() - snapshot['saved_at'] > max_age:
+        return False
+
+    data.clear()
+    data.update(snapshot['data'])
+    if cache is None:
+        from . import api
+        cache = api.cache
+    apply(cache)
+    return True
+
+
+def save(path, names=REFERENCE_ENDPOINTS):
+    """Fetch the reference endpoints and write them to a warm start file."""
+    snapshot = {
+        'saved_at': int(time.time()),
+        'data': {name: _fetch(name) for name in names},
+    }
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot, f)
+    os.rename(path + '.tmp', path)
+    return snapshot
+
+
+def load_from_env(cache):
+    path = os.environ.get(ENV_VAR)
+    if path:
+        load(path, cache=cache)
+
+
+def main(argv=None):
+    import argparse
+    from . import api
+
+    parser = argparse.ArgumentParser(
+        description="Save ProsperWorks reference data for warm starts."
+    )
+    parser.add_argument('path')
+    parser.add_argument('--key', required=True)
+    parser.add_argument('--email', required=True)
+    args = parser.parse_args(argv)
+
+    api.configure(args.key, args.email)
+    snapshot = save(args.path)
+    for name, records in sorted(snapshot['data'].items()):
+        print(u"%s: %d records" % (name, len(records)))
+
+
+if __name__ == '__main__':
+    main()
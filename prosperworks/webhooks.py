@@ -0,0 +1,213 @@
+"""
+WSGI app receiving ProsperWorks webhook notifications, keeping local caches
+fresh without polling searches.
+
+Every new/update/delete notification of a company, person, lead, opportunity
+or task drops what is cached about the record: micro cached and stale GET
+responses (api.requests), its api.snapshot entry and, for people, the
+api.email_cache lookups (including the cached misses of the emails a new or
+updated person notification carries, or of every email for a new person
+whose notification carries none). Listeners are called with each event
+(ex: to update a local mirror) and with refetch=True updated records are
+fetched again in the background, then handed to the refetched listeners.
+
+Ex:
+>>> from wsgiref.simple_server import make_server
+>>> from prosperworks.webhooks import WebhookReceiver
+>>> app = WebhookReceiver(secret={'secret': 'shared-secret'})
+>>> make_server('', 8080, app).serve_forever()
+
+The subscriptions are created with POST /webhooks, pointing at the app and
+passing the same secret.
+"""
+import collections
+import hmac
+import json
+
+from . import api
+from . import exceptions
+from . import scheduler
+from .cache import NOT_FOUND
+from .models import Company, Lead, Opportunity, Person, Task
+from .pool import shared_pool
+
+MODELS = {
+    'company': Company,
+    'person': Person,
+    'lead': Lead,
+    'opportunity': Opportunity,
+    'task': Task,
+}
+EVENTS = frozenset(['new', 'update', 'delete'])
+string_types = (str, type(u''))
+
+WebhookEvent = collections.namedtuple(
+    'WebhookEvent', ['event', 'type', 'model', 'ids', 'attributes']
+)
+
+
+class InvalidNotification(ValueError):
+    pass
+
+
+def _digestible(value):
+    """value as bytes, for hmac.compare_digest."""
+    if not isinstance(value, string_types):
+        value = json.dumps(value)
+    if isinstance(value, type(u'')):
+        value = value.encode('utf-8')
+    return value
+
+
+def parse_notification(payload):
+    """Turn a decoded notification into a WebhookEvent."""
+    if not isinstance(payload, dict):
+        raise InvalidNotification(u"The notification is not an object.")
+    event, type = payload.get('event'), payload.get('type')
+    if event not in EVENTS:
+        raise InvalidNotification(u"%s is not a known event." % event)
+    if type not in MODELS:
+        raise InvalidNotification(u"%s is not a supported type." % type)
+    ids = payload.get('ids') or [payload.get('id')]
+    if not all(isinstance(id, (int, long)) for id in ids):
+        raise InvalidNotification(u"The notification has no valid ids.")
+    return WebhookEvent(
+        event, type, MODELS[type], ids, payload.get('updated_attributes'),
+    )
+
+
+def invalidate(event):
+    """Drop what is cached about the records of event."""
+    model = event.model
+    for id in event.ids:
+        api.requests.invalidate("{}/{}".format(model._endpoint, id))
+        if api.snapshot is not None:
+            api.snapshot.discard(model, id)
+    if model is Person:
+        ids = frozenset(event.ids)
+        api.email_cache.delete_where(
+            lambda data: data is not NOT_FOUND and data.get('id') in ids
+        )
+        if event.event == 'delete':
+            return
+        # the person may now have an email a cached miss looked for
+        emails = notified_emails(event)
+        if emails is None and event.event == 'new':
+            api.email_cache.delete_where(lambda data: data is NOT_FOUND)
+        for email in emails or ():
+            api.email_cache.delete(email.strip().lower())
+
+
+def notified_emails(event):
+    """
+    The emails in the updated_attributes of a notification, or None if it
+    doesn't carry them.
+    """
+    emails = (event.attributes or {}).get('emails')
+    if not isinstance(emails, list):
+        return None
+    if emails and all(isinstance(value, list) for value in emails):
+        # [old emails, new emails] of an update
+        emails = emails[-1]
+    return [
+        entry['email'] for entry in emails
+        if isinstance(entry, dict) and
+        isinstance(entry.get('email'), string_types)
+    ]
+
+
+class WebhookReceiver(object):
+    def __init__(self, secret=None, listeners=(), refetch=False, pool=None,
+                 refetched=()):
+        """
+        secret: dict of fields every notification must carry (the secret
+        given when subscribing), notifications without them are refused.
+        Required, so anyone reaching the app can't drop the caches.
+        listeners: callables called with each WebhookEvent.
+        refetch: fetch new and updated records again in the background, with
+        batch priority, on pool (the shared pool by default).
+        refetched: callables called with each refetched model (which is
+        also recorded in api.snapshot if set).
+        """
+        if not secret:
+            raise exceptions.ProsperWorksApplicationException(
+                u"A webhook secret is required."
+            )
+        self.secret = secret
+        self.listeners = list(listeners)
+        self.refetch = refetch
+        self.pool = pool
+        self.refetched = list(refetched)
+        self.received = 0
+
+    def _authorized(self, payload):
+        # constant time comparisons, not telling how much of a guess matched
+        return all(
+            key in payload and hmac.compare_digest(
+                _digestible(payload[key]), _digestible(value)
+            ) for key, value in self.secret.items()
+        )
+
+    def _fetch(self, model, id):
+        obj = model(id, deferred=False)
+        for listener in self.refetched:
+            listener(obj)
+        return obj
+
+    def _refetch(self, event):
+        if event.event == 'delete':
+            return
+        pool = self.pool or shared_pool()
+        with scheduler.priority(scheduler.BATCH):
+            fetch = scheduler.bind(self._fetch)
+            for id in event.ids:
+                pool.apply_async(fetch, (event.model, id))
+
+    def handle(self, payload):
+        """Process a decoded notification, returns its WebhookEvent."""
+        event = parse_notification(payload)
+        invalidate(event)
+        for listener in self.listeners:
+            listener(event)
+        if self.refetch:
+            self._refetch(event)
+        self.received += 1
+        return event
+
+    @staticmethod
+    def _respond(start_response, status, body):
+        body = json.dumps(body).encode('utf-8')
+        start_response(status, [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+        ])
+        return [body]
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] != 'POST':
+            return self._respond(
+                start_response, '405 Method Not Allowed',
+                {'error': u"Notifications are POSTed."},
+            )
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            payload = json.loads(environ['wsgi.input'].read(length))
+        except ValueError:
+            return self._respond(
+                start_response, '400 Bad Request',
+                {'error': u"The body is not valid json."},
+            )
+        if not isinstance(payload, dict) or not self._authorized(payload):
+            return self._respond(
+                start_response, '403 Forbidden',
+                {'error': u"Invalid secret."},
+            )
+        try:
+            event = self.handle(payload)
+        except InvalidNotification as e:
+            return self._respond(
+                start_response, '400 Bad Request', {'error': e.args[0]},
+            )
+        return self._respond(start_response, '200 OK', {
+            'event': event.event, 'type': event.type, 'ids': event.ids,
+        })
@@ -0,0 +1,167 @@
+"""
+Per assignee workload across companies, people, leads, opportunities, tasks
+and projects, backed by NumPy columns.
+
+Each model is pulled once with streamed search pages (all of them at the same
+time, sharing the rate limiter) and only the columns needed are kept. Counts,
+open value and task load of every assignee are then computed in one
+vectorized pass, instead of one search per user and model. Assignee names
+come from the users reference data (see warmstart.reference_data).
+
+Ex:
+>>> from prosperworks.workload import WorkloadFrame
+>>> frame = WorkloadFrame.load()
+>>> frame.by_assignee()[12]
+Workload(name=u'Jane', companies=120, people=340, leads=12, ...)
+"""
+import collections
+import time
+from multiprocessing.pool import ThreadPool
+
+from . import exceptions
+from . import scheduler
+from . import warmstart
+from .analytics import MISSING
+from .models import Company, Lead, Opportunity, Person, Project, Task, User
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+WORKLOAD_MODELS = (Company, Person, Lead, Opportunity, Task, Project)
+OPEN = 'Open'
+
+Workload = collections.namedtuple('Workload', (
+    'name', 'companies', 'people', 'leads', 'opportunities', 'tasks',
+    'projects', 'open_opportunities', 'open_value', 'open_tasks',
+    'overdue_tasks', 'open_projects',
+))
+
+
+def _columns(endpoint, records):
+    """The columns of a model kept from its raw records."""
+    assignee_ids, open_flags, values, due_dates = [], [], [], []
+    for record in records:
+        assignee_ids.append(record.get('assignee_id') or MISSING)
+        open_flags.append(record.get('status') == OPEN)
+        values.append(record.get('monetary_value') or 0)
+        due_date = record.get('due_date')
+        due_dates.append(MISSING if due_date is None else due_date)
+    columns = {
+        'assignee_id': np.array(assignee_ids, dtype=np.int64),
+        'open': np.array(open_flags, dtype=bool),
+    }
+    if endpoint == Opportunity._endpoint:
+        columns['value'] = np.array(values, dtype=np.float64)
+    if endpoint == Task._endpoint:
+        columns['due_date'] = np.array(due_dates, dtype=np.int64)
+    return columns
+
+
+class WorkloadFrame(object):
+    def __init__(self, columns, users=()):
+        """
+        columns: dict of model endpoint: dict of column arrays.
+        users: raw user records, used to name assignees.
+        """
+        if np is None:
+            raise exceptions.ProsperWorksApplicationException(
+                u"numpy is required for workload aggregates, "
+                u"install prosperworks[analytics]."
+            )
+        self.columns = columns
+        self.users = {user['id']: user.get('name') for user in users}
+
+    @classmethod
+    def from_records(cls, records, users=None):
+        """
+        Build a frame from a dict of model endpoint: raw records (ex: search
+        pages).
+        """
+        if users is None:
+            users = warmstart.reference_data(User._endpoint)
+        return cls({
+            endpoint: _columns(endpoint, model_records)
+            for endpoint, model_records in records.items()
+        }, users)
+
+    @classmethod
+    def load(cls, models=WORKLOAD_MODELS, users=None, workers=None,
+             **query_fields):
+        """
+        Pull every record of models matching query_fields, each model in its
+        own thread.
+        """
+        def pull(model):
+            records = (
+                record for _, page in model.iter_pages(
+                    stream=True, **dict(query_fields)
+                ) for record in page
+            )
+            return model._endpoint, _columns(model._endpoint, records)
+
+        if users is None:
+            users = warmstart.reference_data(User._endpoint)
+        pool = ThreadPool(workers or len(models))
+        try:
+            columns = dict(pool.map(scheduler.bind(pull), models))
+        finally:
+            pool.close()
+            pool.join()
+        return cls(columns, users)
+
+    def by_assignee(self, now=None):
+        """
+        Dict of assignee id: Workload, unassigned records are grouped under
+        None. Tasks due before now (default: the current time) are overdue.
+        """
+        now = time.time() if now is None else now
+        if not self.columns:
+            return {}
+        labels = np.unique(np.concatenate([
+            columns['assignee_id'] for columns in self.columns.values()
+        ]))
+
+        def total(endpoint, selected=None, weights=None):
+            """Per label count (or sum of the weights column)."""
+            columns = self.columns.get(endpoint)
+            if columns is None:
+                return np.zeros(len(labels))
+            index = np.searchsorted(labels, columns['assignee_id'])
+            mask = selected(columns) if selected else slice(None)
+            return np.bincount(
+                index[mask], minlength=len(labels),
+                weights=columns[weights][mask] if weights else None,
+            )
+
+        def is_open(columns):
+            return columns['open']
+
+        def is_overdue(columns):
+            due_dates = columns['due_date']
+            return columns['open'] & (due_dates != MISSING) & (due_dates < now)
+
+        aggregates = {
+            model._endpoint: total(model._endpoint)
+            for model in WORKLOAD_MODELS
+        }
+        aggregates.update(
+            open_opportunities=total(Opportunity._endpoint, is_open),
+            open_value=total(Opportunity._endpoint, is_open, 'value'),
+            open_tasks=total(Task._endpoint, is_open),
+            overdue_tasks=total(Task._endpoint, is_overdue),
+            open_projects=total(Project._endpoint, is_open),
+        )
+
+        workloads = {}
+        for i, label in enumerate(labels):
+            assignee_id = None if label == MISSING else int(label)
+            workloads[assignee_id] = Workload(
+                name=self.users.get(assignee_id), **{
+                    field: float(values[i]) if field == 'open_value'
+                    else int(values[i])
+                    for field, values in aggregates.items()
+                }
+            )
+        return workloads
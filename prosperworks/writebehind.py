@@ -0,0 +1,253 @@
+"""
+Write-behind buffer for frequent updates of the same records.
+
+Updates are queued per record, successive field changes are merged and the
+merged payloads are sent in the background once enough records are pending
+or the flush interval elapsed. Pending writes are appended to a journal file
+first, so they are sent on the next start if the process dies.
+
+Ex:
+>>> from prosperworks.writebehind import WriteBehindQueue
+>>> queue = WriteBehindQueue(journal='/var/lib/app/writes.journal')
+>>> queue.update(opportunity, pipeline_stage_id=12)
+>>> queue.update(Opportunity, 123, monetary_value=1000)
+>>> queue.close()  # flushes what is left
+"""
+import collections
+import json
+import os
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from . import api
+from . import exceptions
+from . import scheduler
+from .constants import DEFAULT_WORKERS
+from .models import CRUDModel
+
+string_types = (str, type(u''))
+
+
+class WriteBehindQueue(object):
+    def __init__(self, journal=None, max_pending=100, flush_interval=5.0,
+                 workers=DEFAULT_WORKERS, fsync=False, max_attempts=5,
+                 max_errors=100):
+        """
+        journal: path of the file pending writes are kept in (optional).
+        max_pending: number of pending records triggering a flush.
+        flush_interval: max seconds a write stays pending.
+        fsync: also fsync the journal on every write, surviving OS crashes.
+        max_attempts: sends of a write failing with server errors before it
+        is dropped. Writes rejected by the api (ex: 422) are dropped at once.
+        max_errors: number of the last errors kept in errors.
+        """
+        self.journal = journal
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_attempts = max_attempts
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        # (record key, error) of the last failed sends
+        self.errors = collections.deque(maxlen=max_errors)
+
+        self._pending = collections.OrderedDict()
+        self._attempts = {}
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pool = ThreadPool(workers)
+        # writes are sent with the priority of the thread creating the queue,
+        # not its deadline: the queue outlives it
+        self._send = scheduler.bind(self._send, with_deadline=False)
+        self._closed = False
+        self._journal_file = None
+
+        if journal:
+            if self._replay():
+                # appending after a torn line would corrupt the next entry
+                self._rewrite()
+            self._journal_file = open(journal, 'a')
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._pending)
+
+    @staticmethod
+    def _endpoint(model):
+        if isinstance(model, string_types):
+            return model
+        if not (isinstance(model, CRUDModel) or (
+            isinstance(model, type) and issubclass(model, CRUDModel)
+        )):
+            raise exceptions.ProsperWorksApplicationException(
+                u"%s is not an updatable model." % model
+            )
+        return model._endpoint
+
+    def _merge(self, key, fields):
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = dict(fields)
+        else:
+            pending.update(fields)
+            self.merged += 1
+
+    def _replay(self):
+        """Merge the journaled writes, returns whether a line was torn."""
+        if not os.path.exists(self.journal):
+            return False
+        torn = False
+        with open(self.journal) as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    torn = True
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # partially written last line
+                    torn = True
+                    continue
+                self._merge((entry['model'], entry['id']), entry['fields'])
+        return torn
+
+    def _write_journal(self, entries):
+        for endpoint, id, fields in entries:
+            self._journal_file.write(json.dumps({
+                'model': endpoint, 'id': id, 'fields': fields,
+            }) + '\n')
+        self._journal_file.flush()
+        if self.fsync:
+            os.fsync(self._journal_file.fileno())
+
+    def update(self, model, id=None, **fields):
+        """
+        Queue an update of model (an instance, a CRUDModel class or an
+        endpoint name) with the given fields. When an instance is given its
+        attributes are set right away.
+        """
+        if self._closed:
+            raise exceptions.ProsperWorksApplicationException(
+                u"The write-behind queue is closed."
+            )
+        if not isinstance(model, string_types):
+            fields = model._create_schema.build(fields)
+        if isinstance(model, CRUDModel):
+            id = getattr(model, model._id_field)
+            for key, value in fields.items():
+                setattr(model, key, value)
+        endpoint = self._endpoint(model)
+
+        with self._condition:
+            if self._journal_file is not None:
+                self._write_journal([(endpoint, id, fields)])
+            self._merge((endpoint, id), fields)
+            if len(self._pending) >= self.max_pending:
+                self._condition.notify()
+
+    def _send(self, item):
+        (endpoint, id), fields = item
+        try:
+            api.requests.put("{}/{}".format(endpoint, id), json=fields)
+            return None
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def _retryable(error):
+        """Errors a write may succeed after, as opposed to a rejection."""
+        if isinstance(error, exceptions.ProsperWorksServerException):
+            return error.error_code >= 500 or error.error_code == 429
+        # rate limiting, deadlines, open circuits, connection errors...
+        return not isinstance(
+            error, exceptions.ProsperWorksApplicationException
+        )
+
+    def flush(self):
+        """
+        Send every pending write now. Writes failing with server errors stay
+        pending (up to max_attempts sends), rejected ones are dropped.
+        Returns the number of writes sent.
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch = list(self._pending.items())
+                self._pending = collections.OrderedDict()
+            if not batch:
+                return 0
+
+            sent, failed = 0, []
+            for item, error in zip(batch, self._pool.map(self._send, batch)):
+                key = item[0]
+                if error is None:
+                    sent += 1
+                    self._attempts.pop(key, None)
+                    continue
+                self.errors.append((key, error))
+                attempts = self._attempts.get(key, 0) + 1
+                if self._retryable(error) and attempts < self.max_attempts:
+                    self._attempts[key] = attempts
+                    failed.append(item)
+                else:
+                    self._attempts.pop(key, None)
+                    self.dropped += 1
+
+            with self._condition:
+                # writes queued during the flush win over the failed ones
+                for key, fields in failed:
+                    fields = dict(fields)
+                    fields.update(self._pending.pop(key, {}))
+                    self._pending[key] = fields
+                self._compact()
+            self.sent += sent
+            return sent
+
+    def _compact(self):
+        """Rewrite the journal with only the pending writes."""
+        if self._journal_file is None:
+            return
+        self._journal_file.close()
+        self._rewrite()
+        self._journal_file = open(self.journal, 'a')
+
+    def _rewrite(self):
+        with open(self.journal + '.tmp', 'w') as f:
+            for (endpoint, id), fields in self._pending.items():
+                f.write(json.dumps({
+                    'model': endpoint, 'id': id, 'fields': fields,
+                }) + '\n')
+        os.rename(self.journal + '.tmp', self.journal)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.time() + self.flush_interval
+                while not self._closed and \
+                        len(self._pending) < self.max_pending and \
+                        time.time() < deadline:
+                    self._condition.wait(deadline - time.time())
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def close(self):
+        """Flush pending writes and stop the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._pool.close()
+        self._pool.join()
+        if self._journal_file is not None:
+            self._journal_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -40,5 +40,10 @@ setup(
     ],
     install_requires=[
         'requests',
-    ]
+    ],
+    extras_require={
+        'analytics': ['numpy'],
+        'parquet': ['pyarrow'],
+        'brotli': ['brotli'],
+    },
 )
@@ -0,0 +1,107 @@
+import unittest
+
+from prosperworks import exceptions
+
+try:
+    import numpy
+    from prosperworks.analytics import Aggregate, OpportunityFrame
+except ImportError:
+    numpy = None
+
+PIPELINES = [
+    {'id': 1, 'name': 'Sales', 'stages': [
+        {'id': 10, 'name': 'Qualified', 'win_probability': 10},
+        {'id': 11, 'name': 'Proposal', 'win_probability': 50},
+        {'id': 12, 'name': 'Negotiation', 'win_probability': 80},
+    ]},
+    {'id': 2, 'name': 'Renewals', 'stages': [
+        {'id': 20, 'name': 'Due', 'win_probability': 90},
+    ]},
+]
+
+DAY = 60 * 60 * 24
+
+
+def opportunity(id, stage, value, status='Open', probability=None,
+                close_date=None, assignee_id=None, stage_changed=None):
+    return {
+        'id': id,
+        'pipeline_id': 1 if stage < 20 else 2,
+        'pipeline_stage_id': stage,
+        'monetary_value': value,
+        'win_probability': probability,
+        'status': status,
+        'close_date': close_date,
+        'assignee_id': assignee_id,
+        'date_stage_changed': stage_changed,
+    }
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestOpportunityFrame(unittest.TestCase):
+    def setUp(self):
+        self.frame = OpportunityFrame.from_records([
+            opportunity(1, 10, 1000, close_date='1/15/2017', assignee_id=5,
+                        stage_changed=0),
+            opportunity(2, 11, 2000, probability=25, close_date='2/1/2017',
+                        assignee_id=5, stage_changed=DAY * 2),
+            opportunity(3, 12, 4000, close_date='2/20/2017', assignee_id=6,
+                        stage_changed=DAY * 4),
+            opportunity(4, 12, 500, status='Won'),
+            opportunity(5, 10, 300, status='Lost'),
+            opportunity(6, 20, 100, close_date='5/5/2017'),
+        ], pipelines=PIPELINES)
+
+    def test_weighted_value(self):
+        self.assertEqual(
+            list(self.frame['weighted_value']),
+            [100.0, 500.0, 3200.0, 400.0, 30.0, 90.0],
+        )
+
+    def test_pipeline_value(self):
+        self.assertEqual(
+            self.frame.pipeline_value(pipeline_id=1),
+            Aggregate(3, 7000.0, 3800.0),
+        )
+
+    def test_group_by(self):
+        by_assignee = self.frame.group_by('assignee')
+        self.assertEqual(by_assignee[5], Aggregate(2, 3000.0, 600.0))
+        self.assertEqual(by_assignee[6], Aggregate(1, 4000.0, 3200.0))
+        self.assertEqual(by_assignee[None], Aggregate(1, 100.0, 90.0))
+
+        by_status = self.frame.group_by('status', status=None)
+        self.assertEqual(by_status['Won'].count, 1)
+        self.assertEqual(by_status['Open'].count, 4)
+
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            self.frame.group_by('color')
+
+    def test_forecast(self):
+        self.assertDictEqual(self.frame.forecast(), {
+            201701: 100.0,
+            201702: 3700.0,
+            201705: 90.0,
+        })
+        self.assertDictEqual(self.frame.forecast(by='close_quarter'), {
+            20171: 3800.0,
+            20172: 90.0,
+        })
+
+    def test_stage_conversion(self):
+        conversion = self.frame.stage_conversion(pipeline_id=1)
+        self.assertEqual([row[0] for row in conversion], [10, 11, 12])
+        self.assertEqual([row[1] for row in conversion], [5, 3, 2])
+        self.assertAlmostEqual(conversion[0][2], 3 / 5.0)
+        self.assertAlmostEqual(conversion[2][2], 1 / 2.0)
+
+    def test_stage_aging(self):
+        aging = self.frame.stage_aging(now=DAY * 10, pipeline_id=1)
+        self.assertEqual(aging[10].mean_days, 10.0)
+        self.assertEqual(aging[11].max_days, 8.0)
+        self.assertEqual(aging[12].count, 1)
+
+    def test_empty(self):
+        frame = OpportunityFrame.from_records([], pipelines=PIPELINES)
+        self.assertEqual(len(frame), 0)
+        self.assertDictEqual(frame.group_by('stage'), {})
@@ -0,0 +1,71 @@
+import time
+import unittest
+
+from prosperworks import breaker
+from prosperworks import exceptions
+from prosperworks.metrics import Metrics
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.breaker = breaker.CircuitBreaker(
+            failure_threshold=2, reset_timeout=0.1, latency_threshold=1,
+            metrics=self.metrics,
+        )
+
+    def fail(self, endpoint='companies/1', error=IOError('timed out')):
+        self.breaker.record(self.breaker.before(endpoint), 0.01, error)
+
+    def test_opens_after_failures(self):
+        self.fail()
+        self.assertEqual(self.breaker.state('companies'), breaker.CLOSED)
+        self.fail()
+        self.assertEqual(self.breaker.state('companies'), breaker.OPEN)
+        with self.assertRaises(exceptions.ProsperWorksCircuitOpen) as ctx:
+            self.breaker.before('companies/2')
+        self.assertEqual(ctx.exception.endpoint, 'companies')
+        self.assertEqual(self.metrics.get('breaker.rejected'), 1)
+        self.assertEqual(self.metrics.get('breaker.companies'), 2)
+        # other endpoints are not affected
+        self.breaker.before('people/1')
+
+    def test_client_errors_dont_count(self):
+        for _ in range(3):
+            self.fail(error=exceptions.ProsperWorksNotFoundRequest())
+        self.assertEqual(self.breaker.state('companies'), breaker.CLOSED)
+
+    def test_gateway_errors_count(self):
+        for error in (
+            exceptions.ProsperWorksServerException(u"Unknown error", 503),
+            exceptions.ProsperWorksRateLimitExceeded(),
+        ):
+            self.assertTrue(breaker.is_failure(error))
+        self.fail(error=exceptions.ProsperWorksServerException(
+            u"Unknown error", 502
+        ))
+        self.fail(error=exceptions.ProsperWorksServerException(
+            u"Unknown error", 504
+        ))
+        self.assertEqual(self.breaker.state('companies'), breaker.OPEN)
+
+    def test_slow_responses_count(self):
+        for _ in range(2):
+            self.breaker.record(self.breaker.before('companies'), 2)
+        self.assertEqual(self.breaker.state('companies'), breaker.OPEN)
+
+    def test_half_open(self):
+        self.fail()
+        self.fail()
+        time.sleep(0.15)
+        trial = self.breaker.before('companies')
+        self.assertEqual(self.breaker.state('companies'), breaker.HALF_OPEN)
+        with self.assertRaises(exceptions.ProsperWorksCircuitOpen):
+            self.breaker.before('companies')
+        self.breaker.record(trial, 0.01, IOError())
+        self.assertEqual(self.breaker.state('companies'), breaker.OPEN)
+
+        time.sleep(0.15)
+        self.breaker.record(self.breaker.before('companies'), 0.01)
+        self.assertEqual(self.breaker.state('companies'), breaker.CLOSED)
+        self.breaker.before('companies')
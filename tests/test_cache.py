@@ -1,3 +1,4 @@
+import threading
 import time
 import unittest
 
@@ -29,3 +30,49 @@ class TestCacheClass(unittest.TestCase):
         self.assertEqual(self.long_cache.get_or_set("key2", func), "abc")
         time.sleep(1.1)
         self.assertEqual(self.long_cache.get("key2"), "abc")
+
+
+class TestLookupCacheClass(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.LookupCache(max_life=60, negative_life=1)
+
+    def test_found_and_not_found(self):
+        self.cache.set("a@example.com", {'id': 1})
+        self.cache.set_not_found("b@example.com")
+
+        self.assertEqual(self.cache.get("a@example.com"), {'id': 1})
+        self.assertIs(self.cache.get("b@example.com"), cache.NOT_FOUND)
+        self.assertIsNone(self.cache.get("c@example.com"))
+
+        time.sleep(1.1)
+        self.assertEqual(self.cache.get("a@example.com"), {'id': 1})
+        self.assertIsNone(self.cache.get("b@example.com"))
+
+    def test_stats(self):
+        self.assertEqual(self.cache.hit_rate, 0.0)
+        self.cache.set("a", 1)
+        self.cache.set_not_found("b")
+        self.cache.get("a")
+        self.cache.get("b")
+        self.cache.get("c")
+        self.cache.get("d")
+        stats = self.cache.stats
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['negative_hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_threads(self):
+        self.cache.set("a", 1)
+
+        def lookups():
+            for _ in range(2000):
+                self.cache.get("a")
+                self.cache.get("b")
+        threads = [threading.Thread(target=lookups) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.hits, 16000)
+        self.assertEqual(self.cache.misses, 16000)
@@ -0,0 +1,65 @@
+import unittest
+import zlib
+
+from prosperworks import compression
+from prosperworks import exceptions
+from prosperworks.compression import Compression
+
+
+class TestCompression(unittest.TestCase):
+    body = b'{"name": "' + b'A' * 5000 + b'"}'
+
+    def test_threshold(self):
+        codec = Compression(threshold=len(self.body) + 1)
+        self.assertEqual(codec.encode(self.body), (self.body, None))
+
+    def test_gzip(self):
+        data, encoding = Compression(threshold=10).encode(self.body)
+        self.assertEqual(encoding, 'gzip')
+        self.assertLess(len(data), len(self.body) / 10)
+        self.assertEqual(
+            zlib.decompress(data, 16 + zlib.MAX_WBITS), self.body
+        )
+
+    def test_deflate(self):
+        codec = Compression(request_encoding='deflate', threshold=10)
+        data, encoding = codec.encode(self.body)
+        self.assertEqual(encoding, 'deflate')
+        self.assertEqual(zlib.decompress(data), self.body)
+
+    def test_no_request_encoding(self):
+        codec = Compression(request_encoding=None, threshold=0)
+        self.assertEqual(codec.encode(self.body), (self.body, None))
+
+    def test_accept(self):
+        self.assertEqual(
+            Compression(accept=['gzip', 'compress']).accept_encoding, 'gzip'
+        )
+        self.assertEqual(Compression(accept=[]).accept_encoding, 'identity')
+        self.assertEqual(
+            Compression().accept, compression.decodable_encodings()
+        )
+
+    def test_brotli_not_decodable(self):
+        saved = compression.brotli, compression._decodable
+        compression.brotli, compression._decodable = object(), None
+        try:
+            self.assertEqual(
+                compression.available_encodings(), ['br', 'gzip', 'deflate'],
+            )
+            # requests 2.11's urllib3 can't decode brotli responses
+            self.assertEqual(
+                Compression(accept=['br', 'gzip']).accept_encoding, 'gzip',
+            )
+        finally:
+            compression.brotli, compression._decodable = saved
+
+    def test_unavailable_encoding(self):
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            Compression(request_encoding='compress')
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli(self):
+        codec = Compression(request_encoding='br', threshold=10)
+        data, encoding = codec.encode(self.body)
+        self.assertEqual(compression.brotli.decompress(data), self.body)
@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+
+from prosperworks import exceptions
+from prosperworks.concurrency import AdaptiveConcurrency, endpoint_key
+from prosperworks.metrics import Metrics
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.limiter = AdaptiveConcurrency(
+            initial=4, maximum=6, latency_target=0.5, metrics=self.metrics
+        )
+
+    def request(self, endpoint='companies/1', error=None):
+        self.limiter.release(self.limiter.acquire(endpoint), error)
+
+    def test_endpoint_key(self):
+        self.assertEqual(endpoint_key('companies/12'), 'companies')
+        self.assertEqual(endpoint_key('companies/search'), 'companies/search')
+        self.assertEqual(endpoint_key('leads/3/convert'), 'leads/convert')
+
+    def test_additive_increase(self):
+        # about one more per round trip of limit requests
+        for _ in range(6):
+            self.request()
+        self.assertEqual(self.limiter.limit('companies'), 5)
+        self.assertEqual(self.metrics.get('concurrency.companies'), 5)
+        for _ in range(100):
+            self.request()
+        self.assertEqual(self.limiter.limit('companies'), 6)
+        self.assertEqual(self.limiter.limit('people'), 4)
+
+    def test_multiplicative_decrease(self):
+        tokens = [self.limiter.acquire('companies/1') for _ in range(3)]
+        for token in tokens:
+            self.limiter.release(
+                token, exceptions.ProsperWorksRateLimitExceeded(message='')
+            )
+        # requests sent before the first decrease don't count again
+        self.assertEqual(self.limiter.limit('companies'), 2)
+        self.assertEqual(self.metrics.get('concurrency.decreases'), 1)
+
+        self.request(error=exceptions.ProsperWorksInternalServerError(
+            message=''
+        ))
+        self.assertEqual(self.limiter.limit('companies'), 1)
+        self.request(error=exceptions.ProsperWorksNotFoundRequest(message=''))
+        self.assertEqual(self.limiter.limit('companies'), 1)
+
+    def test_slow_responses(self):
+        token = self.limiter.acquire('companies')
+        self.limiter.release((token[0], token[1] - 1))
+        self.assertEqual(self.limiter.limit('companies'), 2)
+
+    def test_started(self):
+        # waiting for a rate slot after acquire is not latency
+        token = self.limiter.acquire('companies')
+        time.sleep(0.6)
+        self.limiter.release(self.limiter.started(token))
+        self.assertEqual(self.limiter.limit('companies'), 4)
+        self.assertEqual(self.metrics.get('concurrency.decreases'), 0)
+
+    def test_blocks_at_limit(self):
+        tokens = [self.limiter.acquire('companies') for _ in range(4)]
+        acquired = []
+        thread = threading.Thread(
+            target=lambda: acquired.append(self.limiter.acquire('companies'))
+        )
+        thread.start()
+        time.sleep(0.1)
+        self.assertEqual(acquired, [])
+        self.limiter.release(tokens[0])
+        thread.join(1)
+        self.assertEqual(len(acquired), 1)
@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime
+
+from prosperworks import exceptions
+from prosperworks import models
+from prosperworks.custom_fields import CustomFieldRegistry, Money
+
+DEFINITIONS = [
+    {'id': 1, 'name': 'Size', 'data_type': 'Dropdown', 'options': [
+        {'id': 10, 'name': 'Small'},
+        {'id': 11, 'name': 'Large'},
+    ]},
+    {'id': 2, 'name': 'Renewal', 'data_type': 'Date'},
+    {'id': 3, 'name': 'Budget', 'data_type': 'Currency', 'currency': 'USD'},
+    {'id': 4, 'name': 'Notes', 'data_type': 'Text'},
+    {'id': 5, 'name': 'Regions', 'data_type': 'MultiSelect', 'options': [
+        {'id': 20, 'name': 'East'},
+        {'id': 21, 'name': 'West'},
+    ]},
+]
+
+
+class TestCustomFieldRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = CustomFieldRegistry(DEFINITIONS)
+
+    def test_indexes(self):
+        self.assertEqual(self.registry.id_for('Budget'), 3)
+        self.assertEqual(self.registry.name_for(2), 'Renewal')
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            self.registry.id_for('Missing')
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            self.registry.name_for(99)
+
+    def test_decode(self):
+        self.assertEqual(self.registry.decode(1, 11), 'Large')
+        self.assertEqual(self.registry.decode(2, 0), datetime(1970, 1, 1))
+        self.assertEqual(self.registry.decode(3, 10), Money(10.0, 'USD'))
+        self.assertEqual(self.registry.decode(4, 'abc'), 'abc')
+        self.assertEqual(self.registry.decode(5, [21, 20]), ['West', 'East'])
+        self.assertIsNone(self.registry.decode(2, None))
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            self.registry.decode(99, 'abc')
+
+    def test_decode_record(self):
+        values = self.registry.decode_record(
+            {'custom_fields': [
+                {'custom_field_definition_id': 1, 'value': 10},
+                {'custom_field_definition_id': 99, 'value': 'unknown'},
+            ]}
+        )
+        self.assertDictEqual(values, {'Size': 'Small'})
+
+    def test_decode_model(self):
+        company = models.Company()
+        company.populate(data={'id': 1, 'custom_fields': [
+            {'custom_field_definition_id': 1, 'value': 10},
+        ]})
+        self.assertDictEqual(
+            self.registry.decode_record(company), {'Size': 'Small'}
+        )
+
+    def test_decode_records_columnar(self):
+        records = [
+            {'custom_fields': [
+                {'custom_field_definition_id': 1, 'value': 11},
+            ]},
+            {'custom_fields': [
+                {'custom_field_definition_id': 4, 'value': 'x'},
+            ]},
+            {},
+        ]
+        columns = self.registry.decode_records(records, columnar=True)
+        self.assertEqual(columns['Size'], ['Large', None, None])
+        self.assertEqual(columns['Notes'], [None, 'x', None])
+        self.assertEqual(columns['Budget'], [None, None, None])
+
+        rows = self.registry.decode_records(records)
+        self.assertEqual(rows, [{'Size': 'Large'}, {'Notes': 'x'}, {}])
@@ -0,0 +1,122 @@
+import threading
+import time
+import unittest
+
+from prosperworks import api
+from prosperworks import deadline
+from prosperworks import exceptions
+from prosperworks import models
+from prosperworks import pool
+from prosperworks import scheduler
+
+
+class TestContext(unittest.TestCase):
+    def test_no_deadline(self):
+        self.assertIsNone(deadline.current().remaining())
+        self.assertEqual(deadline.current().timeout(5), 5)
+        deadline.check()
+
+    def test_nested(self):
+        with deadline.deadline(10) as outer:
+            with deadline.deadline(60) as inner:
+                self.assertIs(deadline.current(), inner)
+                self.assertLessEqual(inner.remaining(), 10)
+                self.assertLessEqual(inner.timeout(30), 10)
+            with deadline.deadline(1) as inner:
+                self.assertLessEqual(inner.remaining(), 1)
+            self.assertIs(deadline.current(), outer)
+
+    def test_expired(self):
+        with deadline.deadline(0.01):
+            time.sleep(0.02)
+            self.assertEqual(deadline.current().timeout(5), 0)
+            with self.assertRaises(exceptions.ProsperWorksDeadlineExceeded):
+                deadline.check()
+
+    def test_cancel(self):
+        with deadline.deadline() as outer:
+            with deadline.deadline(60):
+                outer.cancel()
+                with self.assertRaises(exceptions.ProsperWorksCancelled):
+                    deadline.check()
+
+    def test_bind(self):
+        errors = []
+
+        def work():
+            try:
+                deadline.check()
+            except exceptions.ProsperWorksCancelled as e:
+                errors.append(e)
+
+        with deadline.deadline() as context:
+            context.cancel()
+            for bind in (deadline.bind, scheduler.bind):
+                thread = threading.Thread(target=bind(work))
+                thread.start()
+                thread.join()
+            thread = threading.Thread(
+                target=scheduler.bind(work, with_deadline=False)
+            )
+            thread.start()
+            thread.join()
+        self.assertEqual(len(errors), 2)
+
+    def test_shutdown(self):
+        with deadline.deadline(60):
+            work = deadline.bind(deadline.check)
+            pool.shutdown(cancel=True)
+            with self.assertRaises(exceptions.ProsperWorksCancelled):
+                deadline.check()
+        with self.assertRaises(exceptions.ProsperWorksCancelled):
+            work()
+        # only what was in flight is cancelled
+        deadline.check()
+        with deadline.deadline(60):
+            deadline.check()
+
+
+class CancellingRequests(object):
+    """Raises ProsperWorksDeadlineExceeded for the given endpoints."""
+    def __init__(self, expired):
+        self.expired = expired
+
+    def _check(self, endpoint):
+        if endpoint in self.expired:
+            raise exceptions.ProsperWorksDeadlineExceeded()
+
+    def get(self, endpoint, params=None):
+        self._check(endpoint)
+        return {'id': int(endpoint.split('/')[1]), 'name': endpoint}
+
+    def post(self, endpoint, json=None):
+        self._check(json.get('email'))
+        return {'id': 1, 'name': json['email']}
+
+
+class TestPartialProgress(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+
+    def tearDown(self):
+        api.requests = self.requests
+
+    def test_load_many(self):
+        api.requests = CancellingRequests(['companies/3'])
+        companies = [models.Company(id, deferred=True) for id in (1, 2, 3)]
+        with self.assertRaises(exceptions.ProsperWorksDeadlineExceeded) as c:
+            models.Model.load_many(companies, workers=2)
+        self.assertEqual(
+            sorted(company.name for company in c.exception.partial),
+            ['companies/1', 'companies/2'],
+        )
+
+    def test_fetch_by_emails(self):
+        api.requests = CancellingRequests(['late@example.com'])
+        with self.assertRaises(exceptions.ProsperWorksDeadlineExceeded) as c:
+            models.Person.fetch_by_emails([
+                'deadline-a@example.com', 'late@example.com',
+            ])
+        self.assertEqual(
+            list(c.exception.partial), ['deadline-a@example.com']
+        )
@@ -0,0 +1,134 @@
+import unittest
+
+from prosperworks import api
+from prosperworks import dedupe
+from prosperworks import models
+
+
+class FakeRequests(object):
+    def __init__(self, records):
+        self.records = records
+
+    def post(self, endpoint, json=None):
+        start = (json['page_number'] - 1) * json['page_size']
+        return self.records[start:start + json['page_size']]
+
+
+COMPANIES = [
+    {'id': 1, 'name': u'Acme Inc.', 'email_domain': u'acme.com',
+     'phone_numbers': [{'number': u'+1 (303) 555-0100'}]},
+    {'id': 2, 'name': u'ACME', 'websites': [{'url': u'https://www.acme.com/'}],
+     'phone_numbers': [{'number': u'303.555.0100'}]},
+    {'id': 3, 'name': u'Acme Corporation', 'email_domain': u'acme.com'},
+    {'id': 4, 'name': u'Globex', 'email_domain': u'globex.com'},
+    {'id': 5, 'name': u'Initech LLC', 'websites': [{'url': u'initech.io'}]},
+    {'id': 6, 'name': u'Initech', 'email_domain': u'initech.com'},
+]
+
+
+class TestNormalize(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(dedupe.normalize_name(u'Acme, Inc.'), u'acme')
+        self.assertEqual(
+            dedupe.normalize_domain(u'http://www.Acme.com:80/about'),
+            u'acme.com'
+        )
+        self.assertEqual(dedupe.normalize_domain(u'jane@acme.com'),
+                         u'acme.com')
+        self.assertIsNone(dedupe.normalize_domain(u'localhost'))
+        self.assertEqual(dedupe.phone_digits(u'+1 (303) 555-0100'),
+                         u'3035550100')
+        self.assertIsNone(dedupe.phone_digits(u'12-34'))
+
+    def test_fingerprint(self):
+        print_ = dedupe.fingerprint({
+            'name': u'Jane Doe',
+            'emails': [{'email': u'Jane@Gmail.com'},
+                       {'email': u'jane@acme.com'}],
+        })
+        self.assertEqual(print_.emails,
+                         frozenset([u'jane@gmail.com', u'jane@acme.com']))
+        self.assertEqual(print_.domains, frozenset([u'acme.com']))
+
+    def test_name_similarity(self):
+        sign = dedupe.name_signature
+        self.assertEqual(dedupe.name_similarity(sign(u'acme'), sign(u'acme')),
+                         1.0)
+        self.assertLess(
+            dedupe.name_similarity(sign(u'acme'), sign(u'globex')), 0.5
+        )
+
+
+class TestDedupeIndex(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = FakeRequests(COMPANIES)
+
+    def tearDown(self):
+        api.requests = self.requests
+
+    def test_clusters(self):
+        index = dedupe.index_model(models.Company, page_size=4)
+        self.assertEqual(len(index), 6)
+        clusters = [
+            cluster for batch in index.clusters() for cluster in batch
+        ]
+        self.assertEqual(
+            sorted(cluster.ids for cluster in clusters), [[1, 2, 3], [5, 6]]
+        )
+        acme = [cluster for cluster in clusters if 1 in cluster.ids][0]
+        self.assertGreater(acme.score, 0.7)
+
+        score, reasons = index.score(1, 2)
+        self.assertEqual(reasons, ['domain', 'name', 'phone'])
+
+    def test_conflicts(self):
+        index = dedupe.DedupeIndex().add_many(
+            {'id': i, 'name': u'John Smith',
+             'emails': [{'email': u'john%d@example.com' % i}],
+             'phone_numbers': [{'number': u'303 555 01%02d' % i}]}
+            for i in range(30)
+        )
+        index.add({'id': 30, 'name': u'John Smith',
+                   'emails': [{'email': u'john0@example.com'}]})
+        self.assertEqual(index.conflicts(0, 1), ['email', 'phone'])
+        self.assertLess(index.score(0, 1)[0], index.threshold)
+        clusters = [
+            cluster for batch in index.clusters() for cluster in batch
+        ]
+        self.assertEqual([cluster.ids for cluster in clusters], [[0, 30]])
+
+    def test_no_chaining(self):
+        # 1 and 3 only link through 2, but their emails conflict
+        index = dedupe.DedupeIndex().add_many([
+            {'id': 1, 'name': u'Jane Doe',
+             'emails': [{'email': u'jane@a.com'}]},
+            {'id': 2, 'name': u'Jane Doe'},
+            {'id': 3, 'name': u'Jane Doe',
+             'emails': [{'email': u'jane@b.com'}]},
+        ])
+        clusters = [
+            cluster for batch in index.clusters() for cluster in batch
+        ]
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(len(clusters[0].ids), 2)
+        self.assertIn(2, clusters[0].ids)
+
+    def test_oversized_blocks(self):
+        index = dedupe.DedupeIndex(max_block_size=2)
+        index.add_many(
+            {'id': i, 'name': u'Person %d' % i,
+             'phone_numbers': [{'number': u'303 555 0100'}]}
+            for i in range(3)
+        )
+        self.assertIn(('phone', u'3035550100'), index.oversized)
+        self.assertNotIn(('phone', u'3035550100'), index.blocks)
+
+    def test_batches(self):
+        index = dedupe.DedupeIndex().add_many(
+            {'id': i, 'name': u'Company %d' % (i // 2),
+             'email_domain': u'c%d.com' % (i // 2)}
+            for i in range(10)
+        )
+        batches = list(index.clusters(batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
@@ -0,0 +1,215 @@
+import threading
+import time
+import unittest
+
+from prosperworks import api
+from prosperworks import exceptions
+from prosperworks.duedates import DueDateIndex, ReminderDispatcher
+from prosperworks.models import Opportunity, Task
+from prosperworks.webhooks import WebhookEvent
+
+
+def task(id, due_date=None, assignee_id=1, reminder_date=None,
+         status='Open', opportunity_id=None, date_modified=100):
+    return {
+        'id': id, 'name': u'Task %d' % id, 'assignee_id': assignee_id,
+        'due_date': due_date, 'reminder_date': reminder_date,
+        'status': status, 'date_modified': date_modified,
+        'related_resource': {'id': opportunity_id, 'type': 'opportunity'}
+        if opportunity_id else None,
+    }
+
+
+class FakeRequests(object):
+    def __init__(self, tasks=(), opportunities=None):
+        self.tasks = list(tasks)
+        self.opportunities = opportunities or {}
+        self.searches = []
+        self.gets = []
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def get(self, endpoint, params=None):
+        with self._lock:
+            self.gets.append(endpoint)
+        if self.fail:
+            raise IOError('Connection reset by peer')
+        resource, id = endpoint.split('/')
+        records = self.opportunities if resource == 'opportunities' else {
+            record['id']: record for record in self.tasks
+        }
+        if int(id) not in records:
+            raise exceptions.ProsperWorksNotFoundRequest()
+        return dict(records[int(id)])
+
+    def post_stream(self, endpoint, json=None):
+        self.searches.append(json)
+        tasks = [
+            record for record in self.tasks
+            if record['date_modified'] >= json.get('minimum_modified_date', 0)
+            and record['status'] in json.get('statuses', [record['status']])
+        ]
+        start = (json['page_number'] - 1) * json['page_size']
+        return iter(tasks[start:start + json['page_size']])
+
+
+class FakePool(object):
+    """Runs the jobs when run is called."""
+    def __init__(self):
+        self.jobs = []
+
+    def apply_async(self, func, args):
+        self.jobs.append((func, args))
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for func, args in jobs:
+            func(*args)
+
+
+class TestDueDateIndex(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = FakeRequests()
+        self.pool = FakePool()
+        self.index = DueDateIndex(pool=self.pool).add_many([
+            task(1, due_date=300, assignee_id=1),
+            task(2, due_date=100, assignee_id=2, opportunity_id=10),
+            task(3, due_date=200, assignee_id=1, opportunity_id=11),
+            task(4, due_date=50, assignee_id=1, opportunity_id=12),
+            task(5, assignee_id=1),
+            task(6, due_date=10, status='Completed'),
+        ])
+
+    def tearDown(self):
+        api.requests = self.requests
+
+    def ids(self, entries):
+        return [entry.id for entry in entries]
+
+    def test_next_due(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertNotIn(6, self.index)
+        self.assertEqual(self.ids(self.index.next_due(n=2)), [4, 2])
+        self.assertEqual(
+            self.ids(self.index.next_due(assignee_id=1, after=100)), [3, 1]
+        )
+        by_assignee = self.index.next_due_by_assignee(n=1)
+        self.assertEqual(self.ids(by_assignee[1]), [4])
+        self.assertEqual(self.ids(by_assignee[2]), [2])
+
+    def test_update(self):
+        self.index.add(task(4, due_date=400, assignee_id=2))
+        self.assertEqual(self.ids(self.index.next_due(assignee_id=1)), [3, 1])
+        self.assertEqual(self.ids(self.index.next_due(assignee_id=2)), [2, 4])
+        self.index.add(task(2, due_date=100, status='Completed'))
+        self.assertEqual(self.ids(self.index.next_due()), [3, 1, 4])
+
+    def test_overdue(self):
+        self.assertEqual(self.ids(self.index.overdue(now=200)), [4, 2])
+        self.assertEqual(
+            self.ids(self.index.overdue(now=250, assignee_id=1)), [4, 3]
+        )
+
+    def test_overdue_by_pipeline(self):
+        api.requests.opportunities = {
+            10: {'id': 10, 'pipeline_id': 7},
+            11: {'id': 11, 'pipeline_id': 8},
+            12: {'id': 12, 'pipeline_id': 7},
+        }
+        overdue = self.index.overdue_by_pipeline(now=250)
+        self.assertEqual(self.ids(overdue[7]), [4, 2])
+        self.assertEqual(self.ids(overdue[8]), [3])
+        self.index.overdue_by_pipeline(now=250)
+        self.assertEqual(len(api.requests.gets), 3)
+
+    def test_overdue_by_pipeline_deleted(self):
+        api.requests.opportunities = {
+            10: {'id': 10, 'pipeline_id': 7},
+            12: {'id': 12, 'pipeline_id': 7},
+        }
+        overdue = self.index.overdue_by_pipeline(now=250)
+        self.assertEqual(self.ids(overdue[7]), [4, 2])
+        self.assertEqual(self.ids(overdue[None]), [3])
+
+    def test_sync(self):
+        api.requests.tasks = [
+            task(1, due_date=300, date_modified=100),
+            task(2, due_date=100, date_modified=150),
+            task(3, due_date=100, status='Completed', date_modified=120),
+        ]
+        index = DueDateIndex()
+        self.assertEqual(index.sync(page_size=1), 2)
+        self.assertEqual(api.requests.searches[0]['statuses'], ['Open'])
+        self.assertEqual(index.synced_at, 150)
+        self.assertEqual(self.ids(index.next_due()), [2, 1])
+
+        api.requests.tasks[0] = task(1, status='Completed', date_modified=200)
+        index.sync()
+        self.assertEqual(
+            api.requests.searches[-1]['minimum_modified_date'], 150
+        )
+        self.assertEqual(self.ids(index.next_due()), [2])
+
+    def test_handle_event(self):
+        api.requests.tasks = [task(7, due_date=1)]
+        self.index.handle_event(WebhookEvent('new', 'task', Task, [7], None))
+        # fetched in the background
+        self.assertEqual(api.requests.gets, [])
+        self.pool.run()
+        self.assertEqual(self.ids(self.index.next_due(n=1)), [7])
+        self.index.handle_event(
+            WebhookEvent('delete', 'task', Task, [7, 4], None)
+        )
+        self.assertEqual(self.ids(self.index.next_due(n=1)), [2])
+
+        # a fetch in flight doesn't bring back a deleted task
+        api.requests.tasks = [task(8, due_date=1), task(9, due_date=2)]
+        self.index.handle_event(
+            WebhookEvent('update', 'task', Task, [8, 9], None)
+        )
+        self.index.handle_event(
+            WebhookEvent('delete', 'task', Task, [8], None)
+        )
+        api.requests.fail = True
+        self.pool.run()
+        self.assertNotIn(8, self.index)
+        self.assertNotIn(9, self.index)
+        self.assertEqual(self.index.errors[0][0], 9)
+
+        self.index.pipelines[10] = 7
+        self.index.handle_event(
+            WebhookEvent('update', 'opportunity', Opportunity, [10], None)
+        )
+        self.assertNotIn(10, self.index.pipelines)
+
+    def test_reminders(self):
+        index = DueDateIndex().add_many([
+            task(1, reminder_date=100),
+            task(2, reminder_date=50),
+            task(3, reminder_date=300),
+        ])
+        index.add(task(1, reminder_date=400))
+        self.assertEqual(index.next_reminder(), 50)
+        self.assertEqual(self.ids(index.pop_reminders(now=350)), [2, 3])
+        self.assertEqual(index.pop_reminders(now=350), [])
+        self.assertEqual(index.next_reminder(), 400)
+        index.discard(1)
+        self.assertIsNone(index.next_reminder())
+
+
+class TestReminderDispatcher(unittest.TestCase):
+    def test_dispatch(self):
+        index = DueDateIndex().add_many([task(1, reminder_date=1)])
+        sent = []
+        dispatcher = ReminderDispatcher(index, sent.append)
+        try:
+            index.add(task(2, reminder_date=time.time() + 0.1))
+            deadline = time.time() + 5
+            while not sent and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            dispatcher.close()
+        # the reminder due before the dispatcher started is skipped
+        self.assertEqual([entry.id for entry in sent], [2])
+        self.assertEqual(dispatcher.sent, 1)
@@ -0,0 +1,223 @@
+import csv
+import json
+import json as json_module
+import os
+import shutil
+import tempfile
+import unittest
+
+from prosperworks import api
+from prosperworks import cache
+from prosperworks import exceptions
+from prosperworks import export
+from prosperworks import models
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class FakeRequests(object):
+    def __init__(self, records, definitions=()):
+        self.records = records
+        self.definitions = list(definitions)
+        self.calls = []
+
+    def get(self, endpoint, params=None):
+        return self.definitions
+
+    def post(self, endpoint, json=None):
+        self.calls.append((endpoint, dict(json)))
+        start = (json['page_number'] - 1) * json['page_size']
+        return self.records.get(endpoint, [])[start:start + json['page_size']]
+
+    def post_raw(self, endpoint, json=None):
+        return json_module.dumps(self.post(endpoint, json))
+
+    def post_stream(self, endpoint, json=None):
+        return iter(self.post(endpoint, json))
+
+
+class TestFlattenRecord(unittest.TestCase):
+    def test_flatten(self):
+        row = export.flatten_record({
+            'id': 1,
+            'address': {'city': 'Denver'},
+            'tags': ['a'],
+            'custom_fields': [
+                {'custom_field_definition_id': 10, 'value': 'x'},
+            ],
+        })
+        self.assertDictEqual(row, {
+            'id': 1,
+            'address_city': 'Denver',
+            'tags': ['a'],
+            'custom_field_10': 'x',
+        })
+
+    def test_model_columns(self):
+        columns = export.model_columns(models.Company, {
+            20: 'custom_field_20',
+            10: 'custom_field_10',
+        })
+        self.assertEqual(columns[0], 'id')
+        self.assertIn('address_city', columns)
+        self.assertIn('name', columns)
+        self.assertNotIn('assignee', columns)
+        self.assertNotIn('custom_fields', columns)
+        self.assertNotIn('search', columns)
+        self.assertLess(
+            columns.index('custom_field_10'), columns.index('custom_field_20')
+        )
+
+
+class TestExporter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.requests = api.requests
+        self.api_cache = api.cache
+        api.cache = cache.Cache()
+        api.requests = FakeRequests({
+            'companies/search': [
+                {'id': i, 'name': u'Co %d' % i, 'custom_fields': [
+                    {'custom_field_definition_id': 10, 'value': i},
+                ]}
+                for i in range(5)
+            ],
+            'people/search': [{'id': 100, 'name': u'Jane'}],
+        }, definitions=[{'id': 10, 'name': 'Size'}])
+
+    def tearDown(self):
+        api.requests = self.requests
+        api.cache = self.api_cache
+        shutil.rmtree(self.directory)
+
+    def read_ndjson(self, name):
+        path = os.path.join(self.directory, name + '.ndjson')
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_ndjson(self):
+        stats = export.export_all(
+            self.directory, models=(models.Company, models.Person),
+            page_size=2,
+        )
+        self.assertEqual(stats['companies'].rows, 5)
+        self.assertEqual(stats['companies'].pages, 3)
+        self.assertEqual(stats['people'].rows, 1)
+
+        rows = self.read_ndjson('companies')
+        self.assertEqual([row['id'] for row in rows], list(range(5)))
+        self.assertEqual(rows[3]['custom_field_10'], 3)
+
+    def test_csv(self):
+        export.export_all(
+            self.directory, format='csv', models=(models.Company,),
+            page_size=2,
+        )
+        with open(os.path.join(self.directory, 'companies.csv')) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[4]['name'], 'Co 4')
+        self.assertEqual(rows[4]['custom_field_10'], '4')
+
+    def test_custom_field_names(self):
+        export.export_all(
+            self.directory, models=(models.Company,), custom_field_names=True,
+        )
+        rows = self.read_ndjson('companies')
+        self.assertEqual(rows[2]['Size'], 2)
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        path = os.path.join(self.directory, 'companies.ndjson')
+        with open(path, 'w') as f:
+            f.write('{"id": 0}\n{"id": 1}\n{"partial')
+        with open(checkpoint, 'w') as f:
+            json.dump({'companies': {
+                'page': 2, 'offset': len('{"id": 0}\n{"id": 1}\n'),
+                'rows': 2, 'done': False,
+            }}, f)
+
+        stats = export.export_all(
+            self.directory, models=(models.Company,), page_size=2,
+            checkpoint=checkpoint,
+        )
+        self.assertEqual(stats['companies'].rows, 3)
+        self.assertEqual(api.requests.calls[0][1]['page_number'], 2)
+        rows = self.read_ndjson('companies')
+        self.assertEqual([row['id'] for row in rows], list(range(5)))
+
+        # the export completed: the next one starts over
+        self.assertFalse(os.path.exists(checkpoint))
+        stats = export.export_all(
+            self.directory, models=(models.Company,), page_size=2,
+            checkpoint=checkpoint,
+        )
+        self.assertEqual(stats['companies'].rows, 5)
+        rows = self.read_ndjson('companies')
+        self.assertEqual([row['id'] for row in rows], list(range(5)))
+
+    def test_processes(self):
+        stats = export.export_all(
+            self.directory, models=(models.Company, models.Person),
+            page_size=2, processes=2,
+        )
+        self.assertEqual(stats['companies'].rows, 5)
+        rows = self.read_ndjson('companies')
+        self.assertEqual([row['id'] for row in rows], list(range(5)))
+        self.assertEqual(rows[3]['custom_field_10'], 3)
+
+    def test_stream(self):
+        stats = export.export_all(
+            self.directory, models=(models.Company, models.Person),
+            page_size=2, stream=True,
+        )
+        self.assertEqual(stats['companies'].rows, 5)
+        self.assertEqual(stats['companies'].pages, 3)
+        rows = self.read_ndjson('companies')
+        self.assertEqual([row['id'] for row in rows], list(range(5)))
+        self.assertEqual(rows[3]['custom_field_10'], 3)
+
+    def test_stream_with_processes(self):
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            export.Exporter(self.directory, processes=2, stream=True)
+
+    def test_cancelled(self):
+        post = api.requests.post
+
+        def cancelling_post(endpoint, json=None):
+            if endpoint == 'companies/search' and json['page_number'] == 2:
+                raise exceptions.ProsperWorksDeadlineExceeded()
+            return post(endpoint, json)
+        api.requests.post = cancelling_post
+
+        checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        with self.assertRaises(exceptions.ProsperWorksDeadlineExceeded) as c:
+            export.export_all(
+                self.directory, models=(models.Company, models.Person),
+                page_size=2, checkpoint=checkpoint,
+            )
+        stats = c.exception.partial
+        self.assertEqual(stats['companies'].rows, 2)
+        self.assertEqual(stats['people'].rows, 1)
+        with open(checkpoint) as f:
+            state = json.load(f)
+        self.assertEqual(state['companies']['page'], 2)
+        self.assertFalse(state['companies']['done'])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_starts_over(self):
+        path = os.path.join(self.directory, 'companies')
+        os.makedirs(path)
+        stale = os.path.join(path, 'part-00007.parquet')
+        open(stale, 'w').close()
+        export.export_all(
+            self.directory, format='parquet', models=(models.Company,),
+        )
+        self.assertEqual(os.listdir(path), ['part-00000.parquet'])
+
+    def test_invalid_format(self):
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            export.Exporter(self.directory, format='xml')
@@ -0,0 +1,62 @@
+import time
+import unittest
+
+from prosperworks import api
+from prosperworks import exceptions
+from prosperworks import models
+from prosperworks.fanout import search_many
+
+
+class FakeRequests(object):
+    delays = {
+        'leads/search': 0.5,
+    }
+
+    def post(self, endpoint, json=None):
+        time.sleep(self.delays.get(endpoint, 0.1))
+        if endpoint == 'opportunities/search':
+            raise exceptions.ProsperWorksInternalServerError()
+        return [{'id': 1, 'name': endpoint}]
+
+
+class TestSearchMany(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = FakeRequests()
+
+    def tearDown(self):
+        api.requests = self.requests
+
+    def test_concurrent(self):
+        start = time.time()
+        result = search_many([
+            (models.Person, {'tags': ['vip']}),
+            (models.Company, {'city': 'Denver'}),
+            (models.User,),
+        ])
+        self.assertLess(time.time() - start, 0.25)
+        self.assertTrue(result.complete)
+        self.assertTrue(isinstance(result['people'][0], models.Person))
+        self.assertEqual(result['companies'][0].name, 'companies/search')
+        self.assertEqual(len(result.merged()), 3)
+
+    def test_partial_results(self):
+        result = search_many({
+            'people': (models.Person, {}),
+            'leads': (models.Lead, {}, 0.2),
+            'opportunities': (models.Opportunity, {}),
+        }, timeout=1)
+        self.assertFalse(result.complete)
+        self.assertEqual(len(result['people']), 1)
+        self.assertEqual(result['leads'], [])
+        self.assertEqual(result.timed_out, {'leads'})
+        self.assertTrue(isinstance(
+            result.errors['opportunities'],
+            exceptions.ProsperWorksInternalServerError,
+        ))
+
+    def test_invalid_query(self):
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            search_many([(models.Person, {'color': 'red'})])
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            search_many([(models.Pipeline, {})])
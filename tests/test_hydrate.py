@@ -0,0 +1,84 @@
+import json
+import unittest
+
+from prosperworks import api
+from prosperworks import models
+from prosperworks.hydrate import Hydrator, pack, unpack
+from prosperworks.snapshot import Snapshot
+
+
+class FakeRequests(object):
+    def __init__(self, records):
+        self.records = records
+        self.pages = []
+
+    def post_raw(self, endpoint, body=None):
+        self.pages.append(body['page_number'])
+        # like the api, pages have 200 records at most
+        size = min(body['page_size'], 200)
+        start = (body['page_number'] - 1) * size
+        return json.dumps(self.records[start:start + size])
+
+
+class TestPack(unittest.TestCase):
+    def test_round_trip(self):
+        dicts = [{'id': 1, 'name': u'a'}, {'id': 2, 'name': u'b'}, {'id': 3}]
+        shapes, rows = pack(dicts)
+        self.assertEqual(len(shapes), 2)
+        self.assertEqual(unpack((shapes, rows)), dicts)
+
+
+class TestHydrator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.hydrator = Hydrator(processes=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.hydrator.close()
+
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = FakeRequests([
+            {'id': i, 'name': u'Co %d' % i, 'address': {'city': u'Denver'}}
+            for i in range(5)
+        ])
+
+    def tearDown(self):
+        api.requests = self.requests
+        api.snapshot = None
+
+    def test_iter_models(self):
+        api.snapshot = Snapshot()
+        pages = list(self.hydrator.iter_models(models.Company, page_size=2))
+        self.assertEqual([number for number, _ in pages], [1, 2, 3])
+        companies = [obj for _, objects in pages for obj in objects]
+        self.assertEqual([obj.id for obj in companies], list(range(5)))
+        self.assertIsInstance(companies[0], models.Company)
+        self.assertEqual(companies[0].address.city, u'Denver')
+        self.assertEqual(len(api.snapshot), 5)
+
+    def test_page_size_above_max(self):
+        api.requests.records = [{'id': i} for i in range(250)]
+        pages = list(self.hydrator.iter_records(models.Company, page_size=500))
+        self.assertEqual([len(rows) for _, rows in pages], [200, 50])
+
+    def test_iter_records(self):
+        pages = list(self.hydrator.iter_records(models.Company, page_size=5))
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(pages[0][1][4]['address_city'], u'Denver')
+
+    def test_prefetch(self):
+        hydrator = Hydrator(processes=2, prefetch=3)
+        try:
+            pages = hydrator.iter_records(models.Company, page_size=2)
+            next(pages)
+            # the next pages are decoding while the first one is used
+            self.assertEqual(api.requests.pages, [1, 2, 3])
+            self.assertEqual(
+                [number for number, _ in pages], [2, 3],
+            )
+            # one page past the last one at most
+            self.assertEqual(api.requests.pages, [1, 2, 3, 4])
+        finally:
+            hydrator.close()
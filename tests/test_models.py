@@ -0,0 +1,341 @@
+import threading
+import unittest
+
+from prosperworks import api
+from prosperworks import cache
+from prosperworks import exceptions
+from prosperworks import models
+
+
+class FakeRequests(object):
+    def __init__(self, records):
+        self.records = records
+        self.gets = []
+        self.posts = []
+        self.deletes = []
+        self._lock = threading.Lock()
+
+    def get(self, endpoint, params=None):
+        with self._lock:
+            self.gets.append(endpoint)
+        return dict(self.records[endpoint])
+
+    def post(self, endpoint, json=None):
+        with self._lock:
+            self.posts.append((endpoint, json))
+        try:
+            return dict(self.records[json['email']])
+        except KeyError:
+            raise exceptions.ProsperWorksNotFoundRequest()
+
+    def delete(self, endpoint, kwargs=None):
+        self.deletes.append(endpoint)
+        return {'id': 1, 'is_deleted': True}
+
+
+class TestDeferredModel(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = FakeRequests({
+            'companies/1': {'id': 1, 'name': 'A', 'assignee_id': 5,
+                            'interaction_count': 3},
+            'companies/2': {'id': 2, 'name': 'B'},
+            'users/5': {'id': 5, 'name': 'Jane'},
+        })
+
+    def tearDown(self):
+        api.requests = self.requests
+        api.deferred = False
+
+    def test_eager_by_default(self):
+        company = models.Company(1)
+        self.assertEqual(api.requests.gets, ['companies/1'])
+        self.assertEqual(company.name, 'A')
+
+    def test_deferred(self):
+        company = models.Company(1, deferred=True)
+        self.assertTrue(isinstance(company, models.Company))
+        self.assertEqual(company.id, 1)
+        self.assertEqual(company.id_url, 'companies/1')
+        self.assertEqual(api.requests.gets, [])
+
+        self.assertEqual(company.name, 'A')
+        self.assertIs(type(company), models.Company)
+        self.assertEqual(company.assignee_id, 5)
+        self.assertEqual(api.requests.gets, ['companies/1'])
+
+    def test_deferred_undeclared_field(self):
+        company = models.Company(1, deferred=True)
+        self.assertEqual(company.interaction_count, 3)
+        self.assertEqual(api.requests.gets, ['companies/1'])
+
+    def test_delete_without_fetching(self):
+        models.Company(1, deferred=True).delete()
+        self.assertEqual(api.requests.gets, [])
+        self.assertEqual(api.requests.deletes, ['companies/1'])
+
+    def test_lazy_property(self):
+        api.deferred = True
+        company = models.Company(1)
+        user = company.assignee
+        self.assertEqual(api.requests.gets, ['companies/1'])
+        self.assertEqual(user.name, 'Jane')
+        self.assertEqual(api.requests.gets, ['companies/1', 'users/5'])
+
+    def test_load_and_refresh(self):
+        company = models.Company(1, deferred=True).load()
+        self.assertEqual(company.name, 'A')
+        company.load()
+        self.assertEqual(len(api.requests.gets), 1)
+
+        company.name = 'Changed'
+        company.refresh()
+        self.assertEqual(company.name, 'A')
+        self.assertEqual(len(api.requests.gets), 2)
+
+    def test_load_many(self):
+        companies = [
+            models.Company(1, deferred=True),
+            models.Company(2, deferred=True),
+            models.Company(1, deferred=True),
+        ]
+        models.Model.load_many(companies, workers=2)
+        self.assertEqual(
+            sorted(api.requests.gets), ['companies/1', 'companies/2']
+        )
+        self.assertEqual(
+            [company.name for company in companies], ['A', 'B', 'A']
+        )
+        self.assertEqual(len(api.requests.gets), 2)
+
+
+class TestFetchByEmail(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        self.email_cache = api.email_cache
+        api.email_cache = cache.LookupCache()
+        api.requests = FakeRequests({
+            'jane@example.com': {'id': 1, 'name': 'Jane'},
+            'john@example.com': {'id': 2, 'name': 'John'},
+        })
+
+    def tearDown(self):
+        api.requests = self.requests
+        api.email_cache = self.email_cache
+
+    def test_fetch_by_email(self):
+        person = models.Person.fetch_by_email('jane@example.com')
+        self.assertEqual(person.name, 'Jane')
+        models.Person.fetch_by_email('Jane@Example.com ')
+        self.assertEqual(len(api.requests.posts), 1)
+
+        for i in range(2):
+            with self.assertRaises(exceptions.ProsperWorksNotFoundRequest):
+                models.Person.fetch_by_email('missing@example.com')
+        self.assertEqual(len(api.requests.posts), 2)
+
+    def test_fetch_by_emails(self):
+        people = models.Person.fetch_by_emails([
+            'jane@example.com',
+            'JANE@example.com',
+            'john@example.com',
+            'missing@example.com',
+        ], workers=2)
+        self.assertEqual(people['jane@example.com'].name, 'Jane')
+        self.assertEqual(people['JANE@example.com'].name, 'Jane')
+        self.assertEqual(people['john@example.com'].id, 2)
+        self.assertIsNone(people['missing@example.com'])
+        self.assertEqual(len(api.requests.posts), 3)
+
+        models.Person.fetch_by_emails(
+            ['john@example.com', 'missing@example.com']
+        )
+        self.assertEqual(len(api.requests.posts), 3)
+        self.assertEqual(api.email_cache.hits, 1)
+        self.assertEqual(api.email_cache.negative_hits, 1)
+
+
+class ConvertRequests(object):
+    def __init__(self):
+        self.posts = []
+        self.attempts = {}
+        self._lock = threading.Lock()
+
+    def post(self, endpoint, json=None):
+        lead_id = int(endpoint.split('/')[1])
+        with self._lock:
+            self.posts.append((endpoint, json))
+            self.attempts[lead_id] = self.attempts.get(lead_id, 0) + 1
+        if lead_id == 2 and self.attempts[lead_id] == 1:
+            raise exceptions.ProsperWorksRateLimitExceeded()
+        if lead_id == 3:
+            raise exceptions.ProsperWorksUnprocessableRequest()
+        if lead_id == 5:
+            raise exceptions.ProsperWorksInternalServerError()
+        if lead_id == 6:
+            raise IOError('Connection reset by peer')
+        return {
+            'person': {'id': lead_id * 10},
+            'company': {'id': json['details'].get('company', {}).get('id')},
+            'opportunity': None,
+        }
+
+
+class TestConvertLeads(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = ConvertRequests()
+
+    def tearDown(self):
+        api.requests = self.requests
+
+    def test_convert_details(self):
+        details = models.Lead._convert_details(
+            person={'name': 'Jane'}, company=5,
+            opportunity=models.Opportunity().populate(data={
+                'name': 'Deal', 'pipeline_id': 1, 'monetary_value': 10,
+                'assignee_id': 2,
+            }),
+        )
+        self.assertDictEqual(details, {
+            'person': {'name': 'Jane'},
+            'company': {'id': 5},
+            'opportunity': {'name': 'Deal', 'pipeline_id': 1,
+                            'monetary_value': 10, 'assignee_id': 2},
+        })
+
+    def test_convert_many(self):
+        results = models.Lead.convert_many(
+            [1, 2, 3, {'id': 4, 'company': {'id': 7}}],
+            company=6, workers=2, retry_delay=0.01,
+        )
+        self.assertEqual(
+            [result.lead_id for result in results], [1, 2, 3, 4]
+        )
+        self.assertEqual(results[0], (1, 10, 6, None, None))
+        self.assertEqual(results[1].person_id, 20)
+        self.assertEqual(api.requests.attempts[2], 2)
+        self.assertTrue(isinstance(
+            results[2].error, exceptions.ProsperWorksUnprocessableRequest
+        ))
+        self.assertEqual(api.requests.attempts[3], 1)
+        self.assertEqual(results[3].company_id, 7)
+
+    def test_convert_many_errors(self):
+        results = models.Lead.convert_many(
+            [1, 5, 6], workers=2, retry_delay=0.01,
+        )
+        self.assertEqual(results[0].person_id, 10)
+        self.assertTrue(isinstance(
+            results[1].error, exceptions.ProsperWorksInternalServerError
+        ))
+        # the lead may have been converted, it is not sent again
+        self.assertEqual(api.requests.attempts[5], 1)
+        self.assertTrue(isinstance(results[2].error, IOError))
+
+
+class TestSerialize(unittest.TestCase):
+    record = {
+        'id': 1,
+        'name': 'A',
+        'address': {'city': 'Denver', 'state': 'CO'},
+        'phone_numbers': [{'number': '555', 'category': 'work'}],
+        'tags': ['a', 'b'],
+        'custom_fields': [{'custom_field_definition_id': 2, 'value': 3}],
+        'interaction_count': 4,
+    }
+    # nested models get their (empty) id field from Model.__init__
+    serialized = dict(
+        record,
+        address={'id': None, 'city': 'Denver', 'state': 'CO'},
+        phone_numbers=[{'id': None, 'number': '555', 'category': 'work'}],
+    )
+
+    def test_plan(self):
+        plan = models.Company._serialize_plan
+        self.assertIn('address', plan.nested)
+        self.assertIn('custom_fields', plan.nested)
+        self.assertNotIn('name', plan.nested)
+        self.assertIn('assignee', plan.skip)
+        self.assertIn('contact_type', plan.skip)
+        self.assertNotIn('assignee', plan.nested)
+
+    def test_round_trip(self):
+        company = models.Company().populate(data=dict(self.record))
+        self.assertDictEqual(company.serialize(), self.serialized)
+        self.assertDictEqual(
+            company.serialize('name', 'tags'),
+            {'name': 'A', 'tags': ['a', 'b']},
+        )
+
+    def test_skip_lazy_properties(self):
+        company = models.Company().populate(data=dict(self.record))
+        company.__dict__['assignee'] = models.User()
+        company.__dict__['contact_type'] = models.ContactType()
+        self.assertDictEqual(company.serialize(), self.serialized)
+        self.assertNotIn('assignee', company.serialize('name', 'assignee'))
+
+
+class SearchRequests(object):
+    def __init__(self, records):
+        self.records = records
+        self.pages = []
+
+    def _page(self, json):
+        self.pages.append(json['page_number'])
+        # like the api, pages have 200 records at most
+        size = min(json['page_size'], 200)
+        start = (json['page_number'] - 1) * size
+        return self.records[start:start + size]
+
+    def post(self, endpoint, json=None):
+        return self._page(json)
+
+    def post_stream(self, endpoint, json=None):
+        return iter(self._page(json))
+
+
+class TestStreamedSearch(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = SearchRequests(
+            [{'id': i, 'name': u'Co %d' % i} for i in range(5)]
+        )
+
+    def tearDown(self):
+        api.requests = self.requests
+
+    def test_iter_pages(self):
+        pages = [
+            (page_number, [record['id'] for record in records])
+            for page_number, records in models.Company.iter_pages(
+                page_size=2, stream=True,
+            )
+        ]
+        self.assertEqual(pages, [(1, [0, 1]), (2, [2, 3]), (3, [4])])
+
+    def test_unread_records(self):
+        # pages are drained when the caller stops reading early
+        pages = list(models.Company.iter_pages(page_size=2, stream=True))
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(pages[0][1].count, 2)
+
+    def test_empty_last_page(self):
+        api.requests.records = api.requests.records[:4]
+        pages = list(models.Company.iter_pages(page_size=2, stream=True))
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(api.requests.pages, [1, 2, 3])
+
+    def test_page_size_above_max(self):
+        api.requests.records = [{'id': i} for i in range(250)]
+        for stream in (False, True):
+            pages = [
+                len(list(records)) for _, records in
+                models.Company.iter_pages(page_size=500, stream=stream)
+            ]
+            self.assertEqual(pages, [200, 50])
+
+    def test_search_iter(self):
+        companies = list(models.Company.search_iter(page_size=2))
+        self.assertEqual([company.id for company in companies], range(5))
+        self.assertTrue(isinstance(companies[0], models.Company))
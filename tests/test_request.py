@@ -0,0 +1,425 @@
+import json
+import threading
+import time
+import unittest
+import zlib
+
+import requests
+
+from prosperworks import deadline
+from prosperworks import exceptions
+from prosperworks import request
+from prosperworks import scheduler
+from prosperworks.breaker import CircuitBreaker
+from prosperworks.compression import Compression
+from prosperworks.concurrency import AdaptiveConcurrency
+from prosperworks.ratelimit import RateLimiter
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+    @property
+    def content(self):
+        return json.dumps(self.data).encode('utf-8')
+
+    def iter_content(self, chunk_size=1):
+        if isinstance(self.data, Exception):
+            # the connection drops while the body is read
+            yield b'[{"id": 1}, '
+            raise self.data
+        body = json.dumps(self.data).encode('utf-8')
+        for i in range(0, len(body), 4):
+            yield body[i:i + 4]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTransport(object):
+    codes = requests.codes
+
+    def __init__(self, delay=0.0, status_code=200):
+        self.delay = delay
+        self.status_code = status_code
+        self.calls = []
+        self.data = None
+        self._lock = threading.Lock()
+
+    def Session(self):
+        return self
+
+    def _call(self, method, url, kw):
+        with self._lock:
+            self.calls.append((method, url, kw))
+        time.sleep(self.delay)
+        data = self.data
+        if data is None:
+            data = {'url': url, 'message': ''}
+        return FakeResponse(self.status_code, data)
+
+    def get(self, url, headers=None, **kw):
+        return self._call('get', url, kw)
+
+    def post(self, url, headers=None, **kw):
+        return self._call('post', url, dict(kw, headers=headers))
+
+    def put(self, url, headers=None, **kw):
+        return self._call('put', url, dict(kw, headers=headers))
+
+    def delete(self, url, headers=None, **kw):
+        return self._call('delete', url, kw)
+
+
+class TransportTestCase(unittest.TestCase):
+    transport = None
+
+    def setUp(self):
+        self.requests = request.requests
+        request.requests = self.transport = FakeTransport()
+
+    def tearDown(self):
+        request.requests = self.requests
+
+    def make_request(self, **kwargs):
+        return request.Request('key', 'me@example.com', 'v1', **kwargs)
+
+    def run_threads(self, func, count):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(func()))
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+
+class TestRequest(TransportTestCase):
+    def test_not_configured(self):
+        with self.assertRaises(exceptions.NotConfiguredException):
+            request.Request(None, None, 'v1').get('users/1')
+
+    def test_metrics(self):
+        req = self.make_request()
+        req.get('users/1')
+        req.post('users/search', json={})
+        self.assertEqual(req.metrics.get('requests'), 2)
+        self.assertEqual(req.metrics.get('requests.get'), 1)
+
+    def test_lazy_transport(self):
+        req = self.make_request()
+        self.assertIsNone(req._session)
+        req.get('users/1')
+        self.assertIs(req.session, self.transport)
+
+    def test_error(self):
+        self.transport.status_code = 404
+        with self.assertRaises(exceptions.ProsperWorksNotFoundRequest):
+            self.make_request().get('users/1')
+
+    def test_concurrency_before_rate_slot(self):
+        self.transport.delay = 0.2
+        limiter = RateLimiter(max_requests=10, period=60)
+        req = self.make_request(
+            rate_limiter=limiter, concurrency=AdaptiveConcurrency(initial=1),
+        )
+        threads = [
+            threading.Thread(target=req.get, args=('companies/%d' % i,))
+            for i in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        # the second request waits for an in-flight slot without a rate slot
+        self.assertEqual(limiter.remaining, 9)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(limiter.remaining, 8)
+
+    def test_post_stream(self):
+        self.transport.data = [{'id': i} for i in range(3)]
+        records = self.make_request().post_stream('companies/search', {})
+        self.assertEqual(next(records), {'id': 0})
+        self.assertEqual(list(records), [{'id': 1}, {'id': 2}])
+        self.assertTrue(self.transport.calls[0][2]['stream'])
+
+    def test_post_stream_error(self):
+        self.transport.status_code = 500
+        with self.assertRaises(exceptions.ProsperWorksInternalServerError):
+            self.make_request().post_stream('companies/search', {})
+
+
+class TestCoalescing(TransportTestCase):
+    def test_disabled(self):
+        self.transport.delay = 0.1
+        req = self.make_request()
+        self.run_threads(lambda: req.get('companies/1'), 3)
+        self.assertEqual(len(self.transport.calls), 3)
+
+    def test_coalesce(self):
+        self.transport.delay = 0.2
+        req = self.make_request(coalesce=True)
+        results = self.run_threads(lambda: req.get('companies/1'), 5)
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result == results[0] for result in results))
+        # every caller gets its own copy
+        self.assertEqual(len(set(id(result) for result in results)), 5)
+        self.assertEqual(req.metrics.get('coalesced'), 4)
+
+        req.get('companies/1')
+        self.assertEqual(len(self.transport.calls), 2)
+
+    def test_coalesce_errors(self):
+        self.transport.delay = 0.2
+        self.transport.status_code = 500
+        req = self.make_request(coalesce=True)
+        errors = []
+
+        def get():
+            try:
+                req.get('companies/1')
+            except exceptions.ProsperWorksInternalServerError as e:
+                errors.append(e)
+        self.run_threads(get, 3)
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(len(self.transport.calls), 1)
+
+    def test_coalesce_leader_deadline(self):
+        def call(method, url, kw):
+            # the leader gives up once its deadline passed
+            if kw.get('timeout') is not None and kw['timeout'] < delay:
+                time.sleep(kw['timeout'])
+                raise requests.exceptions.Timeout()
+            return FakeTransport._call(self.transport, method, url, kw)
+        delay = self.transport.delay = 0.3
+        self.transport._call = call
+        req = self.make_request(coalesce=True)
+        errors, results = [], []
+
+        def leader():
+            try:
+                with deadline.deadline(0.1):
+                    req.get('companies/1')
+            except exceptions.ProsperWorksDeadlineExceeded as e:
+                errors.append(e)
+        thread = threading.Thread(target=leader)
+        thread.start()
+        time.sleep(0.05)
+        results.append(req.get('companies/1'))
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(results[0]['url'], req.base_url + 'companies/1')
+        self.assertEqual(len(self.transport.calls), 1)
+
+    def test_different_params(self):
+        self.transport.delay = 0.1
+        req = self.make_request(coalesce=True)
+        self.run_threads(lambda: req.get('companies/1'), 2)
+        req.get('companies/1', params={'a': 1})
+        self.assertEqual(len(self.transport.calls), 2)
+
+    def test_micro_cache(self):
+        req = self.make_request(micro_cache_window=0.2)
+        req.get('companies/1')
+        req.get('companies/1')
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertEqual(req.metrics.get('micro_cache_hits'), 1)
+
+        time.sleep(0.25)
+        req.get('companies/1')
+        self.assertEqual(len(self.transport.calls), 2)
+
+        req.put('companies/1', json={'name': 'a'})
+        req.get('companies/1')
+        self.assertEqual(len(self.transport.calls), 4)
+
+        req.post('companies/search', json={})
+        req.post('companies/search', json={})
+        self.assertEqual(len(self.transport.calls), 6)
+
+    def test_micro_cache_copies(self):
+        req = self.make_request(micro_cache_window=60)
+        req.get('companies/1')['name'] = 'changed'
+        self.assertNotIn('name', req.get('companies/1'))
+        req.get('companies/1')['name'] = 'changed'
+        self.assertNotIn('name', req.get('companies/1'))
+        self.assertEqual(len(self.transport.calls), 1)
+
+    def test_micro_cache_size(self):
+        req = self.make_request(micro_cache_window=60)
+        req._micro_cache.max_size = 3
+        for i in range(10):
+            req.get('companies/%d' % i)
+        self.assertEqual(len(req._micro_cache), 3)
+
+
+class TestBreaker(TransportTestCase):
+    def make_request(self, **kwargs):
+        return super(TestBreaker, self).make_request(
+            breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+            **kwargs
+        )
+
+    def test_fail_fast(self):
+        req = self.make_request(timeout=5)
+        self.transport.status_code = 500
+        for _ in range(2):
+            with self.assertRaises(
+                exceptions.ProsperWorksInternalServerError
+            ):
+                req.get('companies/1')
+        with self.assertRaises(exceptions.ProsperWorksCircuitOpen):
+            req.put('companies/2', json={})
+        self.assertEqual(len(self.transport.calls), 2)
+        self.transport.status_code = 200
+        req.post('companies/search', json={})
+        self.assertEqual(self.transport.calls[0][2]['timeout'], 5)
+
+    def test_serve_stale(self):
+        req = self.make_request(serve_stale=True)
+        response = req.get('companies/1')
+        self.transport.status_code = 500
+        for _ in range(2):
+            with self.assertRaises(
+                exceptions.ProsperWorksInternalServerError
+            ):
+                req.get('companies/2')
+        self.assertEqual(req.get('companies/1'), response)
+        self.assertEqual(req.metrics.get('breaker.stale'), 1)
+        with self.assertRaises(exceptions.ProsperWorksCircuitOpen):
+            req.get('companies/3')
+
+    def test_expired_waiting_for_quota(self):
+        req = self.make_request()
+        req.breaker.reset_timeout = 0
+        self.transport.status_code = 500
+        for _ in range(2):
+            with self.assertRaises(
+                exceptions.ProsperWorksInternalServerError
+            ):
+                req.get('companies/1')
+        # the half open probe never reaches the api
+        req.rate_limiter = RateLimiter(max_requests=1, period=60)
+        req.rate_limiter.try_acquire()
+        with deadline.deadline(0.1):
+            with self.assertRaises(exceptions.ProsperWorksDeadlineExceeded):
+                req.get('companies/1')
+        self.assertEqual(req.breaker.state('companies'), 'half_open')
+        self.assertEqual(len(self.transport.calls), 2)
+        # and its trial is given back
+        req.breaker.before('companies/1')
+
+    def test_stream_ends_with_body(self):
+        req = self.make_request(
+            concurrency=AdaptiveConcurrency(initial=2, latency_target=0.1),
+        )
+        limit = req.concurrency._limits
+        self.transport.data = [{'id': 1}]
+        records = req.post_stream('companies/search', {})
+        # the in-flight slot is held while the body is read
+        self.assertEqual(limit['companies/search'].in_flight, 1)
+        next(records)
+        time.sleep(0.15)
+        self.assertEqual(list(records), [])
+        self.assertEqual(limit['companies/search'].in_flight, 0)
+        # the time spent reading the body counts
+        self.assertEqual(req.concurrency.limit('companies/search'), 1)
+
+        # closed (or dropped) before reading anything
+        for _ in range(2):
+            req.post_stream('companies/search', {}).close()
+            self.assertEqual(limit['companies/search'].in_flight, 0)
+        req.post_stream('companies/search', {})
+        self.assertEqual(limit['companies/search'].in_flight, 0)
+
+        self.transport.data = IOError('Connection reset by peer')
+        for _ in range(2):
+            with self.assertRaises(IOError):
+                list(req.post_stream('companies/search', {}))
+        self.assertEqual(req.breaker.state('companies/search'), 'open')
+
+
+class TestCompression(TransportTestCase):
+    def test_disabled(self):
+        req = self.make_request()
+        req.put('companies/1', json={'name': 'A' * 2000})
+        kw = self.transport.calls[0][2]
+        self.assertNotIn('Content-Encoding', kw['headers'])
+        self.assertEqual(json.loads(kw['data']), {'name': 'A' * 2000})
+        self.assertEqual(req.metrics.get('bytes.sent'), len(kw['data']))
+        self.assertEqual(
+            req.metrics.get('bytes.received'),
+            len(json.dumps({'url': self.transport.calls[0][1],
+                            'message': ''})),
+        )
+
+    def test_compress_large_bodies(self):
+        req = self.make_request(compression=Compression(threshold=100))
+        req.put('companies/1', json={'name': 'A' * 2000})
+        req.put('companies/1', json={'name': 'A'})
+        large, small = [call[2] for call in self.transport.calls]
+
+        self.assertEqual(large['headers']['Content-Encoding'], 'gzip')
+        self.assertIn('gzip', large['headers']['Accept-Encoding'])
+        self.assertEqual(
+            json.loads(zlib.decompress(large['data'], 16 + zlib.MAX_WBITS)),
+            {'name': 'A' * 2000},
+        )
+        self.assertNotIn('Content-Encoding', small['headers'])
+        self.assertEqual(req.metrics.get('requests.compressed'), 1)
+        self.assertEqual(
+            req.metrics.get('bytes.sent'),
+            len(large['data']) + len(small['data']),
+        )
+        self.assertGreater(
+            req.metrics.get('bytes.sent_decoded'),
+            req.metrics.get('bytes.sent') * 10,
+        )
+
+    def test_stream_received(self):
+        self.transport.data = [{'id': i} for i in range(3)]
+        req = self.make_request()
+        self.assertEqual(len(list(req.post_stream('companies/search'))), 3)
+        self.assertEqual(
+            req.metrics.get('bytes.received_decoded'),
+            len(json.dumps(self.transport.data)),
+        )
+
+
+class TestDeadline(TransportTestCase):
+    def test_socket_timeout(self):
+        req = self.make_request(timeout=60)
+        with deadline.deadline(2):
+            req.get('companies/1')
+        self.assertLessEqual(self.transport.calls[0][2]['timeout'], 2)
+
+    def test_expired_before_sending(self):
+        req = self.make_request()
+        with deadline.deadline(0):
+            with self.assertRaises(exceptions.ProsperWorksDeadlineExceeded):
+                req.get('companies/1')
+        self.assertEqual(self.transport.calls, [])
+
+    def test_waiting_for_quota(self):
+        limiter = RateLimiter(max_requests=1, period=60)
+        for options in ({'rate_limiter': limiter},
+                        {'scheduler': scheduler.Scheduler(limiter)}):
+            limiter.try_acquire()
+            req = self.make_request(**options)
+            start = time.time()
+            with deadline.deadline(0.2):
+                with self.assertRaises(
+                    exceptions.ProsperWorksDeadlineExceeded
+                ):
+                    req.get('companies/1')
+            self.assertLess(time.time() - start, 1)
+            limiter = RateLimiter(max_requests=1, period=60)
@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+
+from prosperworks import exceptions
+from prosperworks import scheduler
+from prosperworks.ratelimit import RateLimiter
+
+
+class TestPriority(unittest.TestCase):
+    def test_context(self):
+        default = (scheduler.NORMAL, None)
+        self.assertEqual(scheduler.current_priority(), default)
+        with scheduler.priority(scheduler.BATCH, flow='sync'):
+            self.assertEqual(scheduler.current_priority(),
+                             (scheduler.BATCH, 'sync'))
+            bound = scheduler.bind(scheduler.current_priority)
+        self.assertEqual(scheduler.current_priority(), default)
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(bound()))
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [(scheduler.BATCH, 'sync')])
+
+    def test_invalid(self):
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            with scheduler.priority('urgent'):
+                pass
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            scheduler.Scheduler(RateLimiter(10, 60), shares={'batch': 2})
+
+
+class TestScheduler(unittest.TestCase):
+    def acquire_in_thread(self, sched, name, flow=None, order=None):
+        def run():
+            with scheduler.priority(name, flow):
+                sched.acquire()
+            if order is not None:
+                order.append(flow or name)
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_reserved_share(self):
+        sched = scheduler.Scheduler(
+            RateLimiter(10, 60), shares={scheduler.INTERACTIVE: 0.2}
+        )
+        with scheduler.priority(scheduler.BATCH):
+            for _ in range(8):
+                sched.acquire()
+        blocked = self.acquire_in_thread(sched, scheduler.BATCH)
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+        self.assertEqual(sched.waiting[scheduler.BATCH], 1)
+
+        with scheduler.priority(scheduler.INTERACTIVE):
+            sched.acquire()
+            sched.acquire()
+        self.assertEqual(sched.sent, {
+            scheduler.INTERACTIVE: 2, scheduler.NORMAL: 0,
+            scheduler.BATCH: 8,
+        })
+
+    def test_priority_order(self):
+        sched = scheduler.Scheduler(RateLimiter(1, 0.2), shares={})
+        sched.acquire()
+        order = []
+        threads = [
+            self.acquire_in_thread(sched, scheduler.BATCH, 'batch', order)
+        ]
+        time.sleep(0.05)
+        threads.append(self.acquire_in_thread(
+            sched, scheduler.INTERACTIVE, 'interactive', order
+        ))
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, ['interactive', 'batch'])
+
+    def test_round_robin(self):
+        sched = scheduler.Scheduler(RateLimiter(1, 0.1), shares={})
+        sched.acquire()
+        order = []
+        threads = []
+        for flow in ('a', 'a', 'a', 'b'):
+            threads.append(
+                self.acquire_in_thread(sched, scheduler.BATCH, flow, order)
+            )
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order[:2], ['a', 'b'])
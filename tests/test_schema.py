@@ -0,0 +1,106 @@
+import unittest
+from datetime import date, datetime
+
+from prosperworks import api
+from prosperworks import exceptions
+from prosperworks import models
+from prosperworks import schema
+
+
+class FakeRequests(object):
+    def __init__(self):
+        self.posts = []
+
+    def post(self, endpoint, json=None):
+        self.posts.append((endpoint, json))
+        return dict(json, id=1) if endpoint == 'opportunities' else []
+
+
+class TestFieldTypes(unittest.TestCase):
+    def test_name_conventions(self):
+        self.assertIs(schema.field_type('pipeline_id'), schema.INTEGER)
+        self.assertIs(schema.field_type('minimum_due_date'), schema.TIMESTAMP)
+        self.assertIsInstance(schema.field_type('pipeline_ids'), schema.ListOf)
+        self.assertIs(schema.field_type('assignee'), schema.ANY)
+
+    def test_timestamp(self):
+        self.assertEqual(schema.TIMESTAMP(datetime(2017, 1, 1)), 1483228800)
+        self.assertEqual(schema.TIMESTAMP(date(2017, 1, 1)), 1483228800)
+        self.assertEqual(schema.TIMESTAMP(1483228800.5), 1483228800)
+        with self.assertRaises(schema.Invalid):
+            schema.TIMESTAMP('yesterday')
+
+    def test_integer_list(self):
+        coerce = schema.field_type('pipeline_ids')
+        self.assertEqual(coerce((1, '2')), [1, 2])
+        with self.assertRaises(schema.Invalid):
+            coerce(1)
+        with self.assertRaises(schema.Invalid):
+            coerce([1, 'a'])
+
+    def test_date_string(self):
+        coerce = schema.field_type('close_date')
+        self.assertEqual(coerce(date(2017, 2, 3)), '02/03/2017')
+        self.assertEqual(coerce('02/03/2017'), '02/03/2017')
+        with self.assertRaises(schema.Invalid):
+            coerce('2017-02-03')
+
+    def test_nested_model(self):
+        address = models.Address()
+        address.city = u'Denver'
+        self.assertEqual(schema.NESTED(address)['city'], u'Denver')
+
+
+class TestSchema(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = FakeRequests()
+
+    def tearDown(self):
+        api.requests = self.requests
+
+    def test_build(self):
+        body = models.Opportunity._search_schema.build({
+            'minimum_close_date': datetime(2017, 1, 1),
+            'pipeline_ids': [1, 2],
+            'sort_direction': 'asc',
+        })
+        self.assertEqual(body, {
+            'minimum_close_date': 1483228800,
+            'pipeline_ids': [1, 2],
+            'sort_direction': 'asc',
+        })
+
+    def test_all_errors_reported(self):
+        with self.assertRaises(exceptions.ProsperWorksValidationError) as ctx:
+            models.Opportunity._search_schema.build({
+                'color': 'red',
+                'page_size': 'many',
+                'sort_direction': 'up',
+            })
+        self.assertEqual(len(ctx.exception.errors), 3)
+
+    def test_create_coerces(self):
+        models.Opportunity.create(
+            name=u'Deal', close_date=date(2017, 2, 3), pipeline_id='12',
+        )
+        self.assertEqual(api.requests.posts, [('opportunities', {
+            'name': u'Deal', 'close_date': '02/03/2017', 'pipeline_id': 12,
+        })])
+
+    def test_rejected_before_request(self):
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            models.Opportunity.search(minimum_close_date='last week')
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            models.Opportunity.create(pipeline_id=[1])
+        self.assertEqual(api.requests.posts, [])
+
+    def test_field_types_override(self):
+        class Thing(models.CRUDModel):
+            _create_fields = ('name', 'size')
+            _field_types = {'size': schema.Choice('S', 'M', 'L')}
+
+        self.assertEqual(Thing._create_schema.build({'size': 'M'}),
+                         {'size': 'M'})
+        with self.assertRaises(exceptions.ProsperWorksValidationError):
+            Thing._create_schema.build({'size': 'XL'})
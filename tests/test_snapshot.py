@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from prosperworks import api
+from prosperworks import models
+from prosperworks.snapshot import Snapshot, content_hash
+
+
+class FakeRequests(object):
+    def __init__(self):
+        self.puts = []
+
+    def put(self, endpoint, json=None):
+        self.puts.append((endpoint, json))
+        return dict(json, id=1)
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_content_hash(self):
+        self.assertEqual(
+            content_hash({'a': 1, 'b': [1, 2]}),
+            content_hash({'b': [1, 2], 'a': 1}),
+        )
+        self.assertNotEqual(content_hash({'a': 1}), content_hash({'a': 2}))
+
+    def test_diff(self):
+        before = Snapshot()
+        before.add_records(models.Company, [
+            {'id': 1, 'name': 'A'},
+            {'id': 2, 'name': 'B'},
+            {'id': 3, 'name': 'C'},
+        ])
+        after = Snapshot()
+        after.add_records(models.Company, [
+            {'id': 1, 'name': 'A'},
+            {'id': 2, 'name': 'B (renamed)'},
+            {'id': 4, 'name': 'D'},
+        ])
+        diff = before.diff(after)
+        self.assertEqual(diff.added, {('companies', 4)})
+        self.assertEqual(diff.changed, {('companies', 2)})
+        self.assertEqual(diff.removed, {('companies', 3)})
+
+    def test_field_groups(self):
+        groups = {'naming': ('name',), 'location': ('address',)}
+        before = Snapshot(field_groups=groups)
+        before.add('companies', 1, {'name': 'A', 'address': {'city': 'X'}})
+        after = Snapshot(field_groups=groups)
+        after.add('companies', 1, {'name': 'A', 'address': {'city': 'Y'}})
+        self.assertEqual(
+            before.changed_groups(after, ('companies', 1)), {'location'}
+        )
+
+        self.assertTrue(before.is_unchanged('companies', 1, {'name': 'A'}))
+        self.assertFalse(before.is_unchanged('companies', 1, {'name': 'B'}))
+        self.assertFalse(
+            before.is_unchanged('companies', 1, {'name': 'A', 'tags': []})
+        )
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'snapshot.json')
+            snapshot = Snapshot(field_groups={'naming': ('name',)})
+            snapshot.add('companies', 1, {'name': 'A'})
+            snapshot.save(path)
+
+            loaded = Snapshot.load(path)
+            self.assertEqual(loaded.hashes, snapshot.hashes)
+            self.assertEqual(loaded.group_hashes, snapshot.group_hashes)
+            self.assertTrue(loaded.is_unchanged('companies', 1, {'name': 'A'}))
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestSkipUnchangedUpdate(unittest.TestCase):
+    def setUp(self):
+        self.requests = api.requests
+        api.requests = FakeRequests()
+        api.snapshot = Snapshot()
+
+    def tearDown(self):
+        api.requests = self.requests
+        api.snapshot = None
+
+    def test_update(self):
+        company = models.Company().populate(data={'id': 1, 'name': 'A'})
+        company.update()
+        self.assertEqual(api.requests.puts, [])
+
+        company.name = 'B'
+        company.update()
+        self.assertEqual(len(api.requests.puts), 1)
+
+        company.update()
+        self.assertEqual(len(api.requests.puts), 1)
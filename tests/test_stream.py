@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from prosperworks import exceptions
+from prosperworks.stream import iter_json_array
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestIterJsonArray(unittest.TestCase):
+    records = [
+        {'id': 1, 'name': u'Caf\xe9', 'tags': ['a', ']', '{']},
+        12345,
+        1.5,
+        u'text, with a comma',
+        None,
+        [{'nested': [1, 2]}],
+    ]
+
+    def test_chunk_sizes(self):
+        body = json.dumps(self.records, ensure_ascii=False).encode('utf-8')
+        for size in (1, 2, 3, 7, 64, len(body)):
+            self.assertEqual(
+                list(iter_json_array(chunked(body, size))), self.records
+            )
+
+    def test_whitespace(self):
+        body = b' [\n  {"id": 1} ,\n  {"id": 2}\n ]\n'
+        self.assertEqual(
+            list(iter_json_array(chunked(body, 3))), [{'id': 1}, {'id': 2}]
+        )
+
+    def test_empty(self):
+        self.assertEqual(list(iter_json_array([b'[', b']'])), [])
+
+    def test_lazy(self):
+        def chunks():
+            yield b'[{"id": 1}, '
+            raise AssertionError(u"read past the first record")
+        self.assertEqual(next(iter_json_array(chunks())), {'id': 1})
+
+    def test_large_element(self):
+        body = json.dumps([{'text': u'x' * 100000}, 1]).encode('utf-8')
+        records = list(iter_json_array(chunked(body, 10)))
+        self.assertEqual(len(records[0]['text']), 100000)
+        self.assertEqual(records[1], 1)
+
+    def test_invalid(self):
+        for body in (b'{"id": 1}', b'[1, 2', b'[{"id": ]', b'', b'[,1]',
+                     b'[1,,2]', b'[1,]', b'[1 2]'):
+            with self.assertRaises(exceptions.ProsperWorksBadJson):
+                list(iter_json_array(chunked(body, 2)))
@@ -67,6 +67,35 @@ class TestDataClass(unittest.TestCase):
         self.assertEqual(obj.c, 3)
 
 
+class TestDataViewClass(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'a': {
+                'nested': 1,
+            },
+            'b': 2,
+        }
+        self.view = utils.DataView(self.data)
+
+    def test_attributes(self):
+        self.assertEqual(self.view.b, 2)
+        self.assertTrue(isinstance(self.view.a, utils.DataView))
+        self.assertEqual(self.view.a.nested, 1)
+        self.assertIs(self.view.a, self.view.a)
+        self.assertFalse(hasattr(self.view, 'c'))
+
+    def test_no_copy(self):
+        self.assertIs(self.view.serialize(), self.data)
+        self.assertIs(self.view.a.serialize(), self.data['a'])
+        self.data['b'] = 3
+        self.assertEqual(self.view.b, 3)
+
+    def test_read_only(self):
+        with self.assertRaises(AttributeError):
+            self.view.b = 3
+        self.assertEqual(self.data['b'], 2)
+
+
 class TestLazyProperty(unittest.TestCase):
     def setUp(self):
         class Test(object):
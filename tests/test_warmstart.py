@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from prosperworks import api
+from prosperworks import models
+from prosperworks import warmstart
+from prosperworks.cache import Cache
+
+# the module globals api.configure replaces
+API_GLOBALS = (
+    '_key', '_email', '_api_version', '_cache_life', 'requests', 'cache',
+    'email_cache', 'rate_limiter', 'scheduler', 'concurrency', 'breaker',
+)
+PIPELINES = [{'id': 1, 'name': 'Sales', 'stages': []}]
+CONTACT_TYPES = [{'id': 3, 'name': 'Customer'}]
+
+
+class FakeRequests(object):
+    def __init__(self):
+        self.calls = []
+
+    def get(self, endpoint, params=None):
+        self.calls.append(endpoint)
+        return {'pipelines': PIPELINES, 'contact_types': CONTACT_TYPES}.get(
+            endpoint, []
+        )
+
+    def post(self, endpoint, json=None):
+        self.calls.append(endpoint)
+        return [{'id': 5, 'name': 'Ann'}]
+
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'reference.json')
+        self.saved = {name: getattr(api, name) for name in API_GLOBALS}
+        self.data = dict(warmstart.data)
+        api.requests = FakeRequests()
+        api.cache = Cache()
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(api, name, value)
+        warmstart.data.clear()
+        warmstart.data.update(self.data)
+        shutil.rmtree(self.directory)
+
+    def test_save_and_load(self):
+        warmstart.save(self.path, names=('pipelines', 'contact_types',
+                                         'users'))
+        self.assertEqual(api.requests.calls,
+                         ['pipelines', 'contact_types', 'users/search'])
+
+        api.requests = FakeRequests()
+        api.cache = Cache()
+        self.assertTrue(warmstart.load(self.path))
+        self.assertEqual(warmstart.reference_data('pipelines'), PIPELINES)
+        self.assertEqual(warmstart.reference_data('users'),
+                         [{'id': 5, 'name': 'Ann'}])
+
+        person = models.Person()
+        person.populate(data={'id': 1, 'contact_type_id': 3})
+        self.assertEqual(person.contact_type.name, 'Customer')
+        self.assertEqual(api.requests.calls, [])
+
+    def test_configure_keeps_warm_data(self):
+        warmstart.save(self.path, names=('pipelines',))
+        warmstart.load(self.path)
+        api.configure('key', 'me@example.com')
+        self.assertEqual(api.cache.get('pipelines_raw'), PIPELINES)
+
+    def test_stale_or_missing_file(self):
+        self.assertFalse(warmstart.load(self.path))
+        with open(self.path, 'w') as f:
+            json.dump({'saved_at': time.time() - 100, 'data': {}}, f)
+        self.assertFalse(warmstart.load(self.path, max_age=10))
+        self.assertTrue(warmstart.load(self.path, max_age=1000))
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_requests_not_imported(self):
+        code = (
+            "import sys; import prosperworks.api, prosperworks.models; "
+            "sys.stdout.write(str('requests' in sys.modules))"
+        )
+        output = subprocess.check_output(
+            [sys.executable, '-c', code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        self.assertEqual(output, b'False')
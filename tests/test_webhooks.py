@@ -0,0 +1,171 @@
+import json
+import threading
+import unittest
+import urllib2
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from prosperworks import api
+from prosperworks import exceptions
+from prosperworks import models
+from prosperworks.cache import NOT_FOUND, LookupCache
+from prosperworks.snapshot import Snapshot
+from prosperworks.webhooks import WebhookReceiver
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class FakeRequests(object):
+    def __init__(self):
+        self.invalidated = []
+        self.gets = []
+
+    def invalidate(self, endpoint=None):
+        self.invalidated.append(endpoint)
+
+    def get(self, endpoint, params=None):
+        self.gets.append(endpoint)
+        return {'id': int(endpoint.split('/')[1]), 'name': endpoint}
+
+
+class FakePool(object):
+    """Runs the work right away."""
+    def apply_async(self, func, args):
+        func(*args)
+
+
+class TestWebhookReceiver(unittest.TestCase):
+    def setUp(self):
+        self.saved = api.requests, api.email_cache, api.snapshot
+        api.requests = FakeRequests()
+        api.email_cache = LookupCache()
+        api.snapshot = Snapshot()
+        self.events = []
+        self.app = WebhookReceiver(
+            secret={'secret': 's3cret'}, listeners=[self.events.append]
+        )
+        self.server = make_server(
+            '127.0.0.1', 0, self.app, handler_class=QuietHandler
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        api.requests, api.email_cache, api.snapshot = self.saved
+
+    def post(self, body):
+        url = 'http://127.0.0.1:%d/' % self.server.server_port
+        data = body if isinstance(body, str) else json.dumps(body)
+        try:
+            response = urllib2.urlopen(urllib2.Request(
+                url, data, {'Content-Type': 'application/json'}
+            ))
+        except urllib2.HTTPError as e:
+            return e.code, json.loads(e.read())
+        return response.getcode(), json.loads(response.read())
+
+    def test_update(self):
+        api.snapshot.add(models.Person, 7, {'id': 7, 'name': 'Jane'})
+        api.email_cache.set('jane@example.com', {'id': 7})
+        api.email_cache.set('john@example.com', {'id': 8})
+        api.email_cache.set_not_found('ann@example.com')
+        self.assertIn(('people', 7), api.snapshot)
+
+        status, body = self.post({
+            'event': 'update', 'type': 'person', 'ids': [7],
+            'updated_attributes': {'name': ['Jane', 'Janet']},
+            'secret': 's3cret',
+        })
+        self.assertEqual(status, 200)
+        self.assertEqual(body['ids'], [7])
+        self.assertEqual(api.requests.invalidated, ['people/7'])
+        self.assertNotIn(('people', 7), api.snapshot)
+        self.assertIsNone(api.email_cache.get('jane@example.com'))
+        self.assertEqual(api.email_cache.get('john@example.com'), {'id': 8})
+        self.assertIsNotNone(api.email_cache.get('ann@example.com'))
+        self.assertEqual(self.events[0].model, models.Person)
+        self.assertEqual(self.app.received, 1)
+
+    def test_new_person_drops_misses(self):
+        api.email_cache.set_not_found('jane@example.com')
+        api.email_cache.set_not_found('ann@example.com')
+        self.post({
+            'event': 'new', 'type': 'person', 'id': 9,
+            'updated_attributes': {'emails': [
+                {'email': 'Jane@example.com ', 'category': 'work'},
+            ]},
+            'secret': 's3cret',
+        })
+        self.assertIsNone(api.email_cache.get('jane@example.com'))
+        # only the misses of the new person's emails are dropped
+        self.assertIs(api.email_cache.get('ann@example.com'), NOT_FOUND)
+
+        api.email_cache.set_not_found('jane@example.com')
+        self.post({
+            'event': 'update', 'type': 'person', 'id': 9,
+            'updated_attributes': {'emails': [
+                [], [{'email': 'jane@example.com', 'category': 'work'}],
+            ]},
+            'secret': 's3cret',
+        })
+        self.assertIsNone(api.email_cache.get('jane@example.com'))
+        self.assertIs(api.email_cache.get('ann@example.com'), NOT_FOUND)
+
+        # without its emails, every miss may be the new person
+        self.post({'event': 'new', 'type': 'person', 'id': 10,
+                   'secret': 's3cret'})
+        self.assertIsNone(api.email_cache.get('ann@example.com'))
+        # no request is sent
+        self.assertEqual(api.requests.gets, [])
+
+    def test_secret_required(self):
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            WebhookReceiver()
+
+    def test_refused(self):
+        status, _ = self.post({'event': 'delete', 'type': 'company',
+                               'ids': [1]})
+        self.assertEqual(status, 403)
+        status, _ = self.post({'event': 'delete', 'type': 'company',
+                               'ids': [1], 'secret': 's3cre'})
+        self.assertEqual(status, 403)
+        status, _ = self.post('not json')
+        self.assertEqual(status, 400)
+        status, body = self.post({'event': 'update', 'type': 'pipeline',
+                                  'ids': [1], 'secret': 's3cret'})
+        self.assertEqual(status, 400)
+        self.assertIn('pipeline', body['error'])
+        self.assertEqual(api.requests.invalidated, [])
+        self.assertEqual(self.events, [])
+
+    def test_refetch(self):
+        fetched = []
+
+        self.app.refetch = True
+        self.app.pool = FakePool()
+        self.app.refetched.append(fetched.append)
+        self.post({'event': 'update', 'type': 'opportunity', 'ids': [1, 2],
+                   'secret': 's3cret'})
+        self.post({'event': 'delete', 'type': 'opportunity', 'ids': [3],
+                   'secret': 's3cret'})
+        self.assertEqual(
+            api.requests.gets, ['opportunities/1', 'opportunities/2']
+        )
+        self.assertEqual(
+            [opportunity.name for opportunity in fetched],
+            ['opportunities/1', 'opportunities/2'],
+        )
+        self.assertIn(('opportunities', 1), api.snapshot)
+
+    def test_refetch_deferred(self):
+        deferred, api.deferred = api.deferred, True
+        try:
+            self.app._fetch(models.Company, 4)
+        finally:
+            api.deferred = deferred
+        self.assertEqual(api.requests.gets, ['companies/4'])
@@ -0,0 +1,94 @@
+import unittest
+
+from prosperworks import api
+from prosperworks import cache
+
+try:
+    import numpy
+    from prosperworks.workload import WorkloadFrame
+except ImportError:
+    numpy = None
+
+USERS = [{'id': 5, 'name': u'Jane'}, {'id': 6, 'name': u'John'}]
+RECORDS = {
+    'companies': [{'id': 1, 'assignee_id': 5}, {'id': 2, 'assignee_id': 6},
+                  {'id': 3}],
+    'people': [{'id': 1, 'assignee_id': 5}, {'id': 2, 'assignee_id': 5}],
+    'leads': [{'id': 1, 'assignee_id': 6, 'status': 'New'}],
+    'opportunities': [
+        {'id': 1, 'assignee_id': 5, 'status': 'Open', 'monetary_value': 100},
+        {'id': 2, 'assignee_id': 5, 'status': 'Won', 'monetary_value': 500},
+        {'id': 3, 'assignee_id': 6, 'status': 'Open', 'monetary_value': 40},
+        {'id': 4, 'assignee_id': 5, 'status': 'Open',
+         'monetary_value': None},
+    ],
+    'tasks': [
+        {'id': 1, 'assignee_id': 5, 'status': 'Open', 'due_date': 100},
+        {'id': 2, 'assignee_id': 5, 'status': 'Open', 'due_date': 300},
+        {'id': 3, 'assignee_id': 5, 'status': 'Completed', 'due_date': 50},
+        {'id': 4, 'assignee_id': 6, 'status': 'Open', 'due_date': None},
+    ],
+    'projects': [{'id': 1, 'assignee_id': 7, 'status': 'Open'}],
+}
+
+
+class FakeRequests(object):
+    def __init__(self, records):
+        self.records = records
+        self.searches = []
+
+    def post_stream(self, endpoint, json=None):
+        self.searches.append(endpoint)
+        start = (json['page_number'] - 1) * json['page_size']
+        records = self.records[endpoint.split('/')[0]]
+        return iter(records[start:start + json['page_size']])
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestWorkloadFrame(unittest.TestCase):
+    def test_by_assignee(self):
+        workloads = WorkloadFrame.from_records(
+            RECORDS, users=USERS
+        ).by_assignee(now=200)
+        self.assertEqual(sorted(workloads), [None, 5, 6, 7])
+
+        jane = workloads[5]
+        self.assertEqual(jane.name, u'Jane')
+        self.assertEqual(
+            (jane.companies, jane.people, jane.leads, jane.opportunities,
+             jane.tasks, jane.projects), (1, 2, 0, 3, 3, 0)
+        )
+        self.assertEqual(jane.open_opportunities, 2)
+        self.assertEqual(jane.open_value, 100.0)
+        self.assertEqual(jane.open_tasks, 2)
+        self.assertEqual(jane.overdue_tasks, 1)
+
+        self.assertEqual(workloads[6].open_value, 40.0)
+        self.assertEqual(workloads[6].overdue_tasks, 0)
+        self.assertEqual(workloads[7].open_projects, 1)
+        self.assertIsNone(workloads[7].name)
+        self.assertEqual(workloads[None].companies, 1)
+
+    def test_missing_models(self):
+        workloads = WorkloadFrame.from_records(
+            {'companies': RECORDS['companies']}, users=USERS
+        ).by_assignee()
+        self.assertEqual(workloads[5].companies, 1)
+        self.assertEqual(workloads[5].open_value, 0.0)
+
+    def test_load(self):
+        requests, api_cache = api.requests, api.cache
+        api.requests = fake = FakeRequests(RECORDS)
+        api.cache = cache.Cache()
+        api.cache.set('users_raw', USERS)
+        try:
+            frame = WorkloadFrame.load(page_size=2)
+        finally:
+            api.requests, api.cache = requests, api_cache
+        # one pass per model: full pages of 2 then a short one
+        self.assertEqual(fake.searches.count('people/search'), 2)
+        self.assertEqual(fake.searches.count('projects/search'), 1)
+        workloads = frame.by_assignee(now=200)
+        self.assertEqual(workloads[5].people, 2)
+        self.assertEqual(workloads[5].overdue_tasks, 1)
+        self.assertEqual(workloads[6].name, u'John')
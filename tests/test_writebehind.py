@@ -0,0 +1,174 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from prosperworks import api
+from prosperworks import deadline
+from prosperworks import exceptions
+from prosperworks import models
+from prosperworks.writebehind import WriteBehindQueue
+
+
+class FakeRequests(object):
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.reject = set()
+        self.puts = []
+        self._lock = threading.Lock()
+
+    def put(self, endpoint, json=None):
+        deadline.check()
+        if endpoint in self.fail:
+            raise exceptions.ProsperWorksInternalServerError()
+        if endpoint in self.reject:
+            raise exceptions.ProsperWorksUnprocessableRequest()
+        with self._lock:
+            self.puts.append((endpoint, json))
+        return json
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = os.path.join(self.directory, 'writes.journal')
+        self.requests = api.requests
+        api.requests = FakeRequests()
+
+    def tearDown(self):
+        api.requests = self.requests
+        shutil.rmtree(self.directory)
+
+    def test_coalescing(self):
+        queue = WriteBehindQueue(flush_interval=60)
+        opportunity = models.Opportunity().populate(data={'id': 1})
+        queue.update(opportunity, pipeline_stage_id=1)
+        queue.update(opportunity, pipeline_stage_id=2, monetary_value=10)
+        queue.update(models.Opportunity, 2, tags=['a'])
+        self.assertEqual(opportunity.pipeline_stage_id, 2)
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(api.requests.puts, [])
+
+        queue.close()
+        self.assertEqual(sorted(api.requests.puts), [
+            ('opportunities/1', {'pipeline_stage_id': 2,
+                                 'monetary_value': 10}),
+            ('opportunities/2', {'tags': ['a']}),
+        ])
+        self.assertEqual(queue.sent, 2)
+        self.assertEqual(queue.merged, 1)
+
+    def test_size_trigger(self):
+        queue = WriteBehindQueue(max_pending=2, flush_interval=60)
+        queue.update('opportunities', 1, name='a')
+        queue.update('opportunities', 2, name='b')
+        for i in range(50):
+            if len(api.requests.puts) == 2:
+                break
+            time.sleep(0.02)
+        self.assertEqual(len(api.requests.puts), 2)
+        queue.close()
+
+    def test_time_trigger(self):
+        queue = WriteBehindQueue(flush_interval=0.1)
+        queue.update('opportunities', 1, name='a')
+        time.sleep(0.5)
+        self.assertEqual(len(api.requests.puts), 1)
+        queue.close()
+
+    def test_invalid_field(self):
+        queue = WriteBehindQueue()
+        with self.assertRaises(exceptions.ProsperWorksApplicationException):
+            queue.update(models.Opportunity, 1, color='red')
+        queue.close()
+
+    def test_journal_replay(self):
+        with open(self.journal, 'w') as f:
+            f.write(json.dumps({
+                'model': 'opportunities', 'id': 1, 'fields': {'name': 'a'},
+            }) + '\n')
+            f.write(json.dumps({
+                'model': 'opportunities', 'id': 1, 'fields': {'name': 'b'},
+            }) + '\n')
+            f.write('{"model": "oppor')
+
+        queue = WriteBehindQueue(journal=self.journal, flush_interval=60)
+        self.assertEqual(len(queue), 1)
+        queue.close()
+        self.assertEqual(
+            api.requests.puts, [('opportunities/1', {'name': 'b'})]
+        )
+        with open(self.journal) as f:
+            self.assertEqual(f.read(), '')
+
+    def test_failed_writes_stay_journaled(self):
+        api.requests.fail.add('opportunities/1')
+        queue = WriteBehindQueue(journal=self.journal, flush_interval=60)
+        queue.update('opportunities', 1, name='a')
+        queue.update('opportunities', 2, name='b')
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.errors[0][0], ('opportunities', 1))
+        queue.close()
+
+        with open(self.journal) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(entries, [
+            {'model': 'opportunities', 'id': 1, 'fields': {'name': 'a'}},
+        ])
+
+    def test_torn_line_truncated(self):
+        with open(self.journal, 'w') as f:
+            f.write(json.dumps({
+                'model': 'opportunities', 'id': 1, 'fields': {'name': 'a'},
+            }) + '\n')
+            f.write('{"model": "oppor')
+
+        api.requests.fail.add('opportunities/1')
+        api.requests.fail.add('opportunities/2')
+        queue = WriteBehindQueue(journal=self.journal, flush_interval=60)
+        queue.update('opportunities', 2, name='b')
+        with open(self.journal) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(entries, [
+            {'model': 'opportunities', 'id': 1, 'fields': {'name': 'a'}},
+            {'model': 'opportunities', 'id': 2, 'fields': {'name': 'b'}},
+        ])
+        queue.close()
+
+    def test_rejected_writes_dropped(self):
+        api.requests.reject.add('opportunities/1')
+        queue = WriteBehindQueue(journal=self.journal, flush_interval=60)
+        queue.update('opportunities', 1, name='a')
+        self.assertEqual(queue.flush(), 0)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.dropped, 1)
+        self.assertIsInstance(
+            queue.errors[0][1], exceptions.ProsperWorksUnprocessableRequest
+        )
+        queue.close()
+
+    def test_outlives_deadline(self):
+        with deadline.deadline(0.01):
+            queue = WriteBehindQueue(flush_interval=60)
+            time.sleep(0.02)
+        queue.update('opportunities', 1, name='a')
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(list(queue.errors), [])
+        queue.close()
+
+    def test_max_attempts(self):
+        api.requests.fail.add('opportunities/1')
+        queue = WriteBehindQueue(
+            flush_interval=60, max_attempts=3, max_errors=2,
+        )
+        queue.update('opportunities', 1, name='a')
+        for _ in range(3):
+            queue.flush()
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(len(queue.errors), 2)
+        queue.close()